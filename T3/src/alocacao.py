@@ -0,0 +1,143 @@
+# arquivo: alocacao.py
+# Melhor bloco de assentos vizinhos para compras em grupo
+
+import threading
+from typing import List, Tuple, Optional, NamedTuple
+from datetime import date
+
+import checkout
+import disponibilidade
+from checkout import IngressoIndisponivelError
+
+# Blocos tentados antes de desistir (quando outro processo vende no meio)
+TENTATIVAS_ALOCACAO = 5
+# Reserva em memória enquanto o checkout do bloco está em andamento
+TEMPO_RESERVA_GRUPO = 30.0
+
+# Busca + reserva do bloco acontecem juntas (só operações em memória), para
+# que duas compras em grupo deste processo nunca escolham blocos sobrepostos.
+_lock_alocacao = threading.Lock()
+
+
+class BlocoAssentos(NamedTuple):
+    """N assentos vizinhos na mesma fileira de um setor."""
+    id_setor: int
+    fileira: str
+    assentos: List[Tuple[int, str, int]]  # (id_assento, numero, id_ingresso)
+
+
+def _inicios_de_blocos(livres: int, contiguos: int, n: int) -> int:
+    """
+    Bitmap das posições onde começa um bloco de N assentos livres e vizinhos:
+    o bit i fica ligado se i..i+n-1 estão livres e cada par (j, j+1) é contíguo.
+    """
+    inicios = livres
+    for k in range(1, n):
+        inicios &= (livres >> k) & (contiguos >> (k - 1))
+    return inicios
+
+def _melhor_bloco(mapa: disponibilidade.MapaSetor, n: int) -> Optional[BlocoAssentos]:
+    """
+    Melhor bloco de um setor: a primeira fileira (ordem natural, da frente
+    para o fundo) que tenha N lugares juntos e, nela, o bloco mais central.
+    """
+    if n > len(mapa.assentos):
+        return None
+    inicios = _inicios_de_blocos(mapa.livres(), mapa.contiguos, n)
+    if not inicios:
+        return None
+
+    for fileira, ini, fim in mapa.fileiras:
+        tamanho = fim - ini
+        if tamanho < n:
+            continue
+        da_fileira = (inicios >> ini) & ((1 << (tamanho - n + 1)) - 1)
+        if not da_fileira:
+            continue
+
+        centro = (tamanho - n) / 2
+        melhor = None
+        while da_fileira:
+            deslocamento = (da_fileira & -da_fileira).bit_length() - 1
+            if melhor is None or abs(deslocamento - centro) < abs(melhor - centro):
+                melhor = deslocamento
+            da_fileira &= da_fileira - 1
+
+        posicoes = range(ini + melhor, ini + melhor + n)
+        return BlocoAssentos(
+            mapa.id_setor,
+            fileira,
+            [(mapa.assentos[p][0], mapa.assentos[p][2], mapa.ingressos[p]) for p in posicoes],
+        )
+    return None
+
+def encontrar_bloco(id_evento: int, n: int,
+                    setores: Optional[List[int]] = None) -> Optional[BlocoAssentos]:
+    """
+    Procura o melhor bloco de N assentos livres e vizinhos de um evento.
+    'setores' é a ordem de preferência (padrão: todos, por id_setor);
+    o primeiro setor da lista que tiver um bloco vence.
+    Usa apenas o mapa em memória (disponibilidade.py), sem consultas por assento.
+    """
+    if n <= 0:
+        raise ValueError("Quantidade de assentos deve ser um número positivo.")
+    mapas = disponibilidade.servico.mapas_evento(id_evento)
+    for id_setor in (setores if setores is not None else sorted(mapas)):
+        mapa = mapas.get(id_setor)
+        if mapa is None:
+            continue
+        bloco = _melhor_bloco(mapa, n)
+        if bloco is not None:
+            return bloco
+    return None
+
+def _reservar_bloco(id_evento: int, n: int,
+                    setores: Optional[List[int]]) -> Optional[BlocoAssentos]:
+    """Encontra e reserva (em memória) um bloco, atomicamente neste processo."""
+    with _lock_alocacao:
+        bloco = encontrar_bloco(id_evento, n, setores)
+        if bloco is None:
+            return None
+        mapa = disponibilidade.servico.mapa(id_evento, bloco.id_setor)
+        if not mapa.reservar([a[0] for a in bloco.assentos], TEMPO_RESERVA_GRUPO):
+            return None
+        return bloco
+
+def alocar_grupo(id_evento: int, id_comprador: int, n: int,
+                 setores: Optional[List[int]] = None,
+                 data: Optional[date] = None) -> Tuple[BlocoAssentos, List[int]]:
+    """
+    Vende ao comprador o melhor bloco de N assentos vizinhos do evento.
+    Retorna (bloco, ids das vendas).
+
+    O bloco é reservado em memória e vendido com checkout.realizar_checkout,
+    que trava os ingressos no banco (SKIP LOCKED) e confere se ainda estão à
+    venda. Se outro processo tiver vendido algum deles, o mapa do evento é
+    recarregado e outro bloco é tentado, até TENTATIVAS_ALOCACAO vezes.
+
+    Lança IngressoIndisponivelError se não houver N assentos juntos.
+    """
+    for _ in range(TENTATIVAS_ALOCACAO):
+        bloco = _reservar_bloco(id_evento, n, setores)
+        if bloco is None:
+            raise IngressoIndisponivelError(f"Não há {n} assentos juntos disponíveis.")
+
+        mapa = disponibilidade.servico.mapa(id_evento, bloco.id_setor)
+        ids_assento = [a[0] for a in bloco.assentos]
+        try:
+            vendas = checkout.realizar_checkout(
+                id_comprador, [(id_ingresso, 1) for _, _, id_ingresso in bloco.assentos], data
+            )
+        except IngressoIndisponivelError:
+            # Vendido/travado por outro processo: o mapa está desatualizado
+            mapa.liberar(ids_assento)
+            disponibilidade.servico.invalidar(id_evento)
+            continue
+        except Exception:
+            mapa.liberar(ids_assento)
+            raise
+        return bloco, vendas
+
+    raise IngressoIndisponivelError(
+        f"Não foi possível garantir {n} assentos juntos após {TENTATIVAS_ALOCACAO} tentativas."
+    )
@@ -0,0 +1,321 @@
+# arquivo: cache.py
+# Cache em memória (read-through) para as leituras de dados de referência
+
+import json
+import time
+import select
+import threading
+import functools
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import psycopg2
+
+import db
+
+# Validade de uma entrada e número máximo de entradas (LRU)
+TTL_REFERENCIA = 300.0
+MAX_ENTRADAS = 1024
+
+# Invalidação entre processos (LISTEN/NOTIFY, veja cache_notificar em schema.sql)
+CANAL_INVALIDACAO = "tikevents_cache"
+TTL_COM_ESCUTA = 3600.0     # Validade usada enquanto o ouvinte está conectado
+ESCUTA_INTERVALO = 5.0      # Segundos entre checagens do pedido de parada
+ESCUTA_RECONEXAO_MAX = 30.0 # Espera máxima entre tentativas de reconexão
+ESCUTA_TESTE = 30.0         # Segundos sem avisos até testar a conexão (SELECT 1)
+# TCP keepalive da conexão do ouvinte: uma conexão que caiu sem aviso (rede,
+# failover) é fechada pelo sistema em ~1 min em vez de ficar "escutando"
+KEEPALIVE_OCIOSO = 30       # segundos sem tráfego até o primeiro teste
+KEEPALIVE_INTERVALO = 10    # segundos entre testes sem resposta
+KEEPALIVE_TENTATIVAS = 3    # testes sem resposta até desistir
+KEEPALIVE_TIMEOUT_MS = 30000  # dados sem confirmação (ex: o SELECT 1) até desistir
+
+
+class CacheLRU:
+    """
+    Cache com validade (TTL) e limite de tamanho (remove a entrada usada há
+    mais tempo). Cada entrada é marcada com as tabelas de onde veio, para
+    que invalidar("local") descarte tudo que foi lido de Local. Entradas
+    que dependem de uma única linha (ex: get_local(7)) são marcadas com o
+    par (tabela, chave) no lugar da tabela, e invalidar_chaves(("local", 7))
+    descarta só essas e as que dependem da tabela inteira (listas).
+
+    Uma leitura que começou antes de uma invalidação da mesma tabela (de
+    qualquer chave) não é guardada (contador de geração por tabela), então
+    um valor antigo não volta para o cache depois da escrita.
+    """
+
+    def __init__(self, ttl: float = TTL_REFERENCIA, maximo: int = MAX_ENTRADAS):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._entradas: "OrderedDict[Hashable, Tuple[float, Tuple[str, ...], Tuple[Tuple[str, Hashable], ...], Any]]" = OrderedDict()
+        self._geracao: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.expiradas = 0
+        self.removidas_lru = 0
+        self.invalidacoes = 0
+
+    def obter(self, chave: Hashable, tabelas: Tuple[str, ...], carregar: Callable[[], Any],
+              linhas: Tuple[Tuple[str, Hashable], ...] = ()) -> Any:
+        """
+        Retorna o valor em cache ou chama carregar() e guarda o resultado.
+        'tabelas' são as tabelas lidas por inteiro; 'linhas', os pares
+        (tabela, chave) das tabelas de onde só uma linha foi lida.
+        """
+        agora = time.monotonic()
+        dependencias = tabelas + tuple(t for t, _ in linhas)
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                if entrada[0] > agora:
+                    self._entradas.move_to_end(chave)
+                    self.acertos += 1
+                    return entrada[3]
+                del self._entradas[chave]
+                self.expiradas += 1
+            self.faltas += 1
+            geracoes = tuple(self._geracao.get(t, 0) for t in dependencias)
+
+        valor = carregar()
+
+        with self._lock:
+            if geracoes == tuple(self._geracao.get(t, 0) for t in dependencias):
+                self._entradas[chave] = (time.monotonic() + self.ttl, tabelas, linhas, valor)
+                self._entradas.move_to_end(chave)
+                while len(self._entradas) > self.maximo:
+                    self._entradas.popitem(last=False)
+                    self.removidas_lru += 1
+        return valor
+
+    def invalidar(self, *tabelas: str):
+        """Descarta as entradas lidas de qualquer uma das tabelas."""
+        alvo = set(tabelas)
+        with self._lock:
+            for tabela in alvo:
+                self._geracao[tabela] = self._geracao.get(tabela, 0) + 1
+            for chave in [k for k, e in self._entradas.items()
+                          if alvo.intersection(e[1]) or any(t in alvo for t, _ in e[2])]:
+                del self._entradas[chave]
+            self.invalidacoes += 1
+
+    def invalidar_chaves(self, *pares: Tuple[str, Hashable]):
+        """
+        Descarta as entradas lidas das linhas (tabela, chave) informadas e
+        as que leram alguma dessas tabelas por inteiro.
+        """
+        alvo = set(pares)
+        tabelas = {t for t, _ in alvo}
+        with self._lock:
+            for tabela in tabelas:
+                self._geracao[tabela] = self._geracao.get(tabela, 0) + 1
+            for chave in [k for k, e in self._entradas.items()
+                          if tabelas.intersection(e[1]) or alvo.intersection(e[2])]:
+                del self._entradas[chave]
+            self.invalidacoes += 1
+
+    def limpar(self):
+        """Esvazia o cache."""
+        with self._lock:
+            for tabela in {t for e in self._entradas.values()
+                           for t in e[1] + tuple(t for t, _ in e[2])}:
+                self._geracao[tabela] = self._geracao.get(tabela, 0) + 1
+            self._entradas.clear()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Contadores de uso do cache."""
+        with self._lock:
+            total = self.acertos + self.faltas
+            return {
+                "entradas": len(self._entradas),
+                "maximo": self.maximo,
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "taxa_acerto": (self.acertos / total) if total else 0.0,
+                "expiradas": self.expiradas,
+                "removidas_lru": self.removidas_lru,
+                "invalidacoes": self.invalidacoes,
+            }
+
+
+cache_referencia = CacheLRU()
+
+def em_cache(*tabelas: str, chave: Optional[str] = None):
+    """
+    Decorador para funções read_* de dados de referência.
+    'tabelas' são as tabelas lidas pela função (usadas na invalidação).
+    Se o primeiro argumento da função é a chave avisada pelos triggers de
+    uma das tabelas (ex: get_local(local_id) em "local"), informe essa
+    tabela em 'chave': um aviso de outra linha dela não descarta a entrada.
+
+    Dentro de uma unidade de trabalho (db.transacao) o cache é ignorado:
+    a transação pode enxergar escritas próprias ainda não confirmadas.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            if db.transacao_atual() is not None:
+                return funcao(*args, **kwargs)
+            if chave is not None and args:
+                inteiras = tuple(t for t in tabelas if t != chave)
+                linhas = ((chave, args[0]),)
+            else:
+                inteiras, linhas = tabelas, ()
+            valor = cache_referencia.obter(
+                (funcao.__module__, funcao.__name__, args, tuple(sorted(kwargs.items()))),
+                inteiras, lambda: funcao(*args, **kwargs), linhas)
+            # Cópia rasa: quem chama pode alterar a lista sem estragar o cache
+            return list(valor) if isinstance(valor, list) else valor
+        return envoltorio
+    return decorador
+
+def invalidar(*tabelas: str):
+    """Invalida as leituras das tabelas depois que a escrita for confirmada."""
+    db.ao_confirmar(lambda: cache_referencia.invalidar(*tabelas))
+
+def estatisticas() -> Dict[str, Any]:
+    """Contadores do cache de dados de referência (e do ouvinte, se ativo)."""
+    dados = cache_referencia.estatisticas()
+    ouvinte = _ouvinte
+    dados["escuta_conectada"] = ouvinte is not None and ouvinte.conectado.is_set()
+    dados["avisos_recebidos"] = ouvinte.avisos if ouvinte is not None else 0
+    return dados
+
+
+# --- Invalidação entre processos ---
+
+def _ler_aviso(payload: str) -> Optional[Tuple[str, Optional[Hashable]]]:
+    """
+    Extrai (tabela, chave) do aviso {"tabela": ..., "chave": ...}; a chave é
+    None se ausente (ou não for um valor simples). None se o aviso é inválido.
+    """
+    try:
+        dados = json.loads(payload)
+        tabela, chave = dados.get("tabela"), dados.get("chave")
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(tabela, str):
+        return None
+    return tabela, (chave if isinstance(chave, (int, str)) else None)
+
+class OuvinteInvalidacao(threading.Thread):
+    """
+    Thread que escuta o canal CANAL_INVALIDACAO em uma conexão própria
+    (autocommit, fora do pool) e invalida as linhas avisadas pelos
+    triggers de schema.sql, inclusive as alteradas por outros processos
+    (a tabela inteira, se o aviso vier sem chave).
+
+    Enquanto conectado, o cache usa TTL_COM_ESCUTA; ao conectar e ao perder
+    a conexão o cache é esvaziado (avisos podem ter sido perdidos) e a
+    validade volta ao valor original até a reconexão. Uma conexão que
+    morre sem aviso é detectada pelo TCP keepalive e por um SELECT 1 depois
+    de ESCUTA_TESTE segundos sem avisos.
+    """
+
+    def __init__(self, cache: CacheLRU, dsn: str, ttl: float = TTL_COM_ESCUTA):
+        super().__init__(name="cache-invalidacao", daemon=True)
+        self.cache = cache
+        self.dsn = dsn
+        self.ttl = ttl
+        self.conectado = threading.Event()
+        self.avisos = 0
+        self.reconexoes = 0
+        self._ttl_original = cache.ttl
+        self._parar = threading.Event()
+
+    def parar(self, espera: Optional[float] = None):
+        """Pede a parada da thread e espera ela terminar."""
+        self._parar.set()
+        self.join(espera if espera is not None else ESCUTA_INTERVALO + 1)
+
+    def run(self):
+        espera = 1.0
+        while not self._parar.is_set():
+            try:
+                conn = psycopg2.connect(self.dsn, keepalives=1,
+                                        keepalives_idle=KEEPALIVE_OCIOSO,
+                                        keepalives_interval=KEEPALIVE_INTERVALO,
+                                        keepalives_count=KEEPALIVE_TENTATIVAS,
+                                        tcp_user_timeout=KEEPALIVE_TIMEOUT_MS)
+            except psycopg2.Error:
+                self._parar.wait(espera)
+                espera = min(espera * 2, ESCUTA_RECONEXAO_MAX)
+                continue
+            espera = 1.0
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CANAL_INVALIDACAO};")
+                self.cache.limpar()
+                self.cache.ttl = self.ttl
+                self.conectado.set()
+                self._escutar(conn)
+            except psycopg2.Error:
+                self.reconexoes += 1
+            finally:
+                self.conectado.clear()
+                self.cache.ttl = self._ttl_original
+                self.cache.limpar()
+                conn.close()
+
+    def _escutar(self, conn):
+        """Recebe os avisos até o pedido de parada ou erro na conexão."""
+        ultimo = time.monotonic()
+        while not self._parar.is_set():
+            if select.select([conn], [], [], ESCUTA_INTERVALO) == ([], [], []):
+                if time.monotonic() - ultimo < ESCUTA_TESTE:
+                    continue
+                # Sem avisos há um tempo: um comando de teste confirma que a
+                # conexão está viva (se não estiver, psycopg2.Error e run()
+                # volta à validade curta e reconecta)
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1;")
+            else:
+                conn.poll()
+            ultimo = time.monotonic()
+            tabelas = set()
+            pares = set()
+            desconhecido = False
+            while conn.notifies:
+                aviso = conn.notifies.pop(0)
+                self.avisos += 1
+                lido = _ler_aviso(aviso.payload)
+                if lido is None:
+                    desconhecido = True
+                elif lido[1] is None:
+                    tabelas.add(lido[0])
+                else:
+                    pares.add(lido)
+            if desconhecido:
+                self.cache.limpar()
+                continue
+            pares = {p for p in pares if p[0] not in tabelas}
+            if tabelas:
+                self.cache.invalidar(*tabelas)
+            if pares:
+                self.cache.invalidar_chaves(*pares)
+
+
+_ouvinte: Optional[OuvinteInvalidacao] = None
+_ouvinte_lock = threading.Lock()
+
+def iniciar_escuta(ttl: float = TTL_COM_ESCUTA) -> OuvinteInvalidacao:
+    """
+    Inicia (uma vez por processo) o ouvinte de invalidações, usando a mesma
+    DSN do pool de conexões. Chamadas repetidas retornam o ouvinte atual.
+    """
+    global _ouvinte
+    with _ouvinte_lock:
+        if _ouvinte is None or not _ouvinte.is_alive():
+            _ouvinte = OuvinteInvalidacao(cache_referencia, db.get_pool().dsn, ttl)
+            _ouvinte.start()
+        return _ouvinte
+
+def parar_escuta():
+    """Para o ouvinte de invalidações (se estiver rodando)."""
+    global _ouvinte
+    with _ouvinte_lock:
+        if _ouvinte is not None:
+            _ouvinte.parar()
+            _ouvinte = None
@@ -0,0 +1,215 @@
+# arquivo: checkout.py
+# Checkout atômico de ingressos (sem venda duplicada / acima da capacidade)
+
+import time
+import random
+from contextlib import contextmanager
+from typing import List, Tuple, Iterable, Optional
+from datetime import date
+
+import psycopg2.extensions
+from psycopg2 import errors
+
+import db
+import disponibilidade
+import metricas
+from db import get_conn
+
+# Tentativas em caso de conflito de serialização/deadlock/lock_timeout
+TENTATIVAS_MAX = 5
+ESPERA_BASE = 0.02   # segundos (dobra a cada tentativa)
+ESPERA_MAX = 0.5     # teto da espera entre tentativas
+# Tempo máximo esperando um lock (ingresso ou fatias do resumo de vendas)
+TEMPO_MAX_LOCK = "2s"
+
+ERROS_TRANSITORIOS = (
+    errors.SerializationFailure,
+    errors.DeadlockDetected,
+    errors.LockNotAvailable,
+)
+
+
+class IngressoIndisponivelError(ValueError):
+    """O ingresso pedido já foi vendido, está em outro checkout ou esgotou."""
+
+
+def _espera(tentativa: int) -> float:
+    """Backoff exponencial com 'full jitter'."""
+    return random.uniform(0, min(ESPERA_MAX, ESPERA_BASE * (2 ** tentativa)))
+
+def _normalizar_itens(itens: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Soma quantidades repetidas do mesmo ingresso e ordena por id_ingresso."""
+    total = {}
+    for id_ingresso, quantidade in itens:
+        if quantidade is None or quantidade <= 0:
+            raise ValueError("Quantidade deve ser um número positivo.")
+        total[id_ingresso] = total.get(id_ingresso, 0) + quantidade
+    if not total:
+        raise ValueError("O checkout precisa de pelo menos um ingresso.")
+    return sorted(total.items())
+
+@contextmanager
+def _lock_timeout(conn, valor: str):
+    """
+    lock_timeout = 'valor' só durante o bloco, na transação atual. O valor
+    anterior é restaurado na saída, para não valer para o resto de uma
+    unidade de trabalho (db.transacao) externa ao checkout.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT current_setting('lock_timeout');")
+        anterior = cur.fetchone()[0]
+        cur.execute("SELECT set_config('lock_timeout', %s, true);", (valor,))
+    try:
+        yield
+    finally:
+        # Transação abortada: o ROLLBACK que vem a seguir já desfaz o ajuste
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+            with conn.cursor() as cur:
+                cur.execute("SELECT set_config('lock_timeout', %s, true);", (anterior,))
+
+def _checkout(id_comprador: int, itens: List[Tuple[int, int]], data: date) -> List[int]:
+    """Executa o checkout dentro da transação atual (veja realizar_checkout)."""
+    ids_ingresso = [id_ingresso for id_ingresso, _ in itens]
+
+    with get_conn() as conn, _lock_timeout(conn, TEMPO_MAX_LOCK):
+        with conn.cursor() as cur:
+            # 1. Dados dos ingressos pedidos (sem lock ainda)
+            cur.execute("""
+                SELECT i.id_ingresso, i.id_evento, i.id_assento
+                FROM Ingresso i
+                WHERE i.id_ingresso = ANY(%s)
+                ORDER BY i.id_ingresso;
+            """, (ids_ingresso,))
+            info = {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+            faltando = [i for i in ids_ingresso if i not in info]
+            if faltando:
+                raise ValueError(f"Ingresso(s) inexistente(s): {faltando}")
+
+            numerados = [i for i, _ in itens if info[i][1] is not None]
+
+            for id_ingresso, quantidade in itens:
+                if id_ingresso in numerados and quantidade != 1:
+                    raise ValueError(
+                        f"Ingresso {id_ingresso} é de assento marcado; quantidade deve ser 1."
+                    )
+
+            # 2. Assentos marcados: cada ingresso é sua própria "unidade de
+            #    estoque", travada em ordem crescente de id_ingresso (dois
+            #    checkouts nunca se bloqueiam em ordem cruzada). SKIP LOCKED
+            #    faz com que quem chega enquanto outro comprador fecha o mesmo
+            #    assento desista na hora, em vez de formar fila atrás do lock.
+            if numerados:
+                cur.execute("""
+                    SELECT id_ingresso FROM Ingresso
+                    WHERE id_ingresso = ANY(%s)
+                    ORDER BY id_ingresso
+                    FOR NO KEY UPDATE SKIP LOCKED;
+                """, (numerados,))
+                travados = {row[0] for row in cur.fetchall()}
+                ocupados = [i for i in numerados if i not in travados]
+                if ocupados:
+                    raise IngressoIndisponivelError(
+                        f"Ingresso(s) em processo de venda por outro comprador: {ocupados}"
+                    )
+
+                # Com o lock em mãos, uma venda já confirmada é visível aqui
+                # (READ COMMITTED usa um snapshot novo por comando).
+                cur.execute("SELECT DISTINCT id_ingresso FROM Venda WHERE id_ingresso = ANY(%s);",
+                            (numerados,))
+                vendidos = sorted(row[0] for row in cur.fetchall())
+                if vendidos:
+                    raise IngressoIndisponivelError(f"Ingresso(s) já vendido(s): {vendidos}")
+
+            # 3. Registra todas as vendas na mesma transação, em um único
+            #    INSERT na ordem (id_evento, id_ingresso). O trigger do resumo
+            #    roda uma vez para o comando inteiro e atualiza as fatias dos
+            #    eventos em ordem crescente de id_evento, a mesma para todo
+            #    checkout (um INSERT por item travaria as fatias na ordem dos
+            #    ingressos e dois carrinhos poderiam se bloquear em cruz).
+            #
+            #    Capacidade do local: conferida pelo próprio trigger, com um
+            #    UPDATE condicional na fatia do resumo desta sessão (veja
+            #    Evento_Vendas_Resumo.cota em schema.sql). Compradores do
+            #    mesmo evento não fazem fila na linha do Evento; só quando a
+            #    cota da fatia acaba as fatias do evento são travadas para
+            #    repartir o que sobra.
+            try:
+                cur.execute("""
+                    INSERT INTO Venda (data, quantidade, id_ingresso, id_comprador)
+                    SELECT %s, v.quantidade, v.id_ingresso, %s
+                    FROM unnest(%s::int[], %s::int[], %s::int[]) AS v(id_evento, id_ingresso, quantidade)
+                    ORDER BY v.id_evento, v.id_ingresso
+                    RETURNING id_ingresso, id_venda;
+                """, (data, id_comprador,
+                      [info[i][0] for i, _ in itens], ids_ingresso, [q for _, q in itens]))
+            except errors.CheckViolation as e:
+                if e.diag.constraint_name != "evento_capacidade":
+                    raise
+                raise IngressoIndisponivelError(e.diag.message_primary) from e
+            except errors.UniqueViolation as e:
+                # Rede de segurança do banco (uq_venda_ingresso_numerado) para
+                # um assento vendido fora do checkout depois da checagem acima
+                if e.diag.constraint_name != "uq_venda_ingresso_numerado":
+                    raise
+                raise IngressoIndisponivelError(f"Ingresso(s) já vendido(s): {numerados}") from e
+            vendas = dict(cur.fetchall())
+
+    for id_ingresso in ids_ingresso:
+        disponibilidade.registrar_venda(id_ingresso)
+    metricas.registrar_vendas(len(itens), sum(q for _, q in itens))
+    return [vendas[id_ingresso] for id_ingresso in ids_ingresso]
+
+def realizar_checkout(id_comprador: int,
+                      itens: Iterable[Tuple[int, int]],
+                      data: Optional[date] = None) -> List[int]:
+    """
+    Vende um ou mais ingressos para um comprador de forma atômica.
+    'itens' é uma lista de (id_ingresso, quantidade).
+    Retorna os IDs das vendas criadas, na ordem crescente de id_ingresso.
+
+    - Ingresso de assento marcado: só pode ser vendido uma vez (quantidade 1).
+    - Capacidade: o total de ingressos vendidos do evento (pista e
+      assentos) não pode passar da capacidade do local; quem confere é o
+      trigger do resumo de vendas, no INSERT das vendas.
+
+    Roda em READ COMMITTED com locks explícitos; conflitos transitórios
+    (serialização, deadlock, lock_timeout) são repetidos até TENTATIVAS_MAX
+    vezes com backoff aleatório. Se já existir uma unidade de trabalho
+    (db.transacao) ativa, o checkout participa dela e não é repetido.
+
+    Lança IngressoIndisponivelError (subclasse de ValueError) se algum
+    ingresso não puder ser vendido; nesse caso nada é gravado.
+    """
+    inicio = time.perf_counter()
+    resultado = "erro"
+    try:
+        ids = _realizar_checkout(id_comprador, itens, data)
+        resultado = "ok"
+        return ids
+    except IngressoIndisponivelError:
+        resultado = "indisponivel"
+        raise
+    except ValueError:
+        resultado = "invalido"
+        raise
+    finally:
+        metricas.checkout_duracao.observar(time.perf_counter() - inicio, resultado=resultado)
+
+def _realizar_checkout(id_comprador: int,
+                       itens: Iterable[Tuple[int, int]],
+                       data: Optional[date]) -> List[int]:
+    itens = _normalizar_itens(itens)
+    data = data or date.today()
+
+    if db.transacao_atual() is not None:
+        return _checkout(id_comprador, itens, data)
+
+    for tentativa in range(1, TENTATIVAS_MAX + 1):
+        try:
+            with db.transacao(isolamento="READ COMMITTED"):
+                return _checkout(id_comprador, itens, data)
+        except ERROS_TRANSITORIOS:
+            if tentativa == TENTATIVAS_MAX:
+                raise
+            metricas.checkout_repeticoes.inc()
+            time.sleep(_espera(tentativa))
@@ -1,7 +1,13 @@
 """Script para criação e manipulação de tabela Artista em PostgreSQL."""
 
-from typing import List, Tuple, Optional
-from db import get_conn, DDL
+from typing import List, Tuple, Optional, Dict, Iterable
+from db import get_conn, executar_preparado, DDL
+import cache
+
+# buscar_artistas: busca aproximada no nome (pg_trgm), "radio" encontra
+# "Radiohead"
+LIMITE_BUSCA = 20
+MIN_TERMO_BUSCA = 3   # Termos menores casariam com boa parte da tabela
 
 def init_schema():
     """Inicializa o esquema do banco."""
@@ -14,19 +20,76 @@ def create_artista(nome: str, genero: Optional[str] = None) -> int:
     """Insere um novo artista. Retorna o ID criado."""
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO Artista (nome, genero) VALUES (%s, %s) RETURNING id_artista;",
+            executar_preparado(
+                cur, "artista_inserir",
+                "INSERT INTO Artista (nome, genero) VALUES ($1, $2) RETURNING id_artista;",
                 (nome, genero)
             )
             artista_id = cur.fetchone()[0]
         conn.commit()
+    cache.invalidar("artista")
     return artista_id
 
+@cache.em_cache("artista")
 def read_artistas() -> List[Tuple]:
     """Retorna todos os artistas cadastrados."""
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT id_artista, nome, genero FROM Artista ORDER BY nome;")
+            executar_preparado(cur, "artistas_listar",
+                               "SELECT id_artista, nome, genero FROM Artista ORDER BY nome;")
+            return cur.fetchall()
+
+# --- Leitura por chave ---
+
+@cache.em_cache("artista", chave="artista")
+def get_artista(artista_id: int) -> Optional[Tuple]:
+    """Retorna o artista (id_artista, nome, genero) com esse ID, ou None se não existir."""
+    sql = "SELECT id_artista, nome, genero FROM Artista WHERE id_artista = $1;"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "artista_por_id", sql, (artista_id,))
+            return cur.fetchone()
+
+def get_artista_many(ids: Iterable[int]) -> Dict[int, Tuple]:
+    """
+    Retorna {id_artista: linha} dos artistas com esses IDs, em uma única consulta
+    (mesmas colunas de get_artista). IDs inexistentes ficam de fora.
+    """
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    sql = "SELECT id_artista, nome, genero FROM Artista WHERE id_artista = ANY($1::int[]);"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "artistas_por_ids", sql, (ids,))
+            return {row[0]: row for row in cur.fetchall()}
+
+def existe_artista(artista_id: int) -> bool:
+    """Indica se existe um artista com esse ID."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "artista_existe",
+                               "SELECT EXISTS (SELECT 1 FROM Artista WHERE id_artista = $1);", (artista_id,))
+            return cur.fetchone()[0]
+
+def buscar_artistas(termo: str, limite: int = LIMITE_BUSCA) -> List[Tuple]:
+    """
+    Busca aproximada por nome. Retorna (id_artista, nome, genero, similaridade),
+    do mais para o menos parecido.
+    """
+    termo = (termo or "").strip()
+    if len(termo) < MIN_TERMO_BUSCA:
+        raise ValueError(f"O termo de busca precisa de pelo menos {MIN_TERMO_BUSCA} caracteres.")
+    sql = """
+        SELECT id_artista, nome, genero, word_similarity($1, nome) AS similaridade
+        FROM Artista
+        WHERE $1 <% nome
+        ORDER BY similaridade DESC, nome, id_artista
+        LIMIT $2;
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "artistas_buscar", sql, (termo, limite))
             return cur.fetchall()
 
 def update_artista(artista_id: int, novo_nome: Optional[str] = None, 
@@ -56,16 +119,21 @@ def update_artista(artista_id: int, novo_nome: Optional[str] = None,
             )
             rows = cur.rowcount
         conn.commit()
-    
+    if rows:
+        cache.invalidar("artista")
     return rows
 
 def delete_artista(artista_id: int) -> int:
     """Remove um artista. Retorna linhas afetadas."""
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("DELETE FROM Artista WHERE id_artista = %s;", (artista_id,))
+            executar_preparado(cur, "artista_deletar",
+                               "DELETE FROM Artista WHERE id_artista = $1;", (artista_id,))
             rows = cur.rowcount
         conn.commit()
+    if rows:
+        # Associações do artista saem junto (CASCADE)
+        cache.invalidar("artista", "evento_artista")
     return rows
 
 # Programa de teste
@@ -1,8 +1,8 @@
 # arquivo: crud_assento.py
 
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Dict, Iterable
 # Importa a função de conexão do arquivo db.py
-from db import get_conn 
+from db import get_conn, executar_preparado
 
 def create_assento(id_setor: int, fileira: str, numero: str) -> int:
     """
@@ -12,11 +12,11 @@ def create_assento(id_setor: int, fileira: str, numero: str) -> int:
     
     Nota: Falhará se a combinação (id_setor, fileira, numero) já existir.
     """
-    sql = "INSERT INTO Assento (id_setor, fileira, numero) VALUES (%s, %s, %s) RETURNING id_assento;"
+    sql = "INSERT INTO Assento (id_setor, fileira, numero) VALUES ($1, $2, $3) RETURNING id_assento;"
     
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, (id_setor, fileira, numero))
+            executar_preparado(cur, "assento_inserir", sql, (id_setor, fileira, numero))
             assento_id = cur.fetchone()[0]
         conn.commit()
     return assento_id
@@ -25,13 +25,48 @@ def read_assentos_por_setor(setor_id: int) -> List[Tuple]:
     """
     Retorna todos os assentos (id, fileira, numero) de um setor específico.
     """
-    sql = "SELECT id_assento, fileira, numero FROM Assento WHERE id_setor = %s ORDER BY fileira, numero;"
+    sql = "SELECT id_assento, fileira, numero FROM Assento WHERE id_setor = $1 ORDER BY fileira, numero;"
     
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, (setor_id,))
+            executar_preparado(cur, "assentos_por_setor", sql, (setor_id,))
             return cur.fetchall()
 
+# --- Leitura por chave ---
+
+def get_assento(assento_id: int) -> Optional[Tuple]:
+    """
+    Retorna o assento (id_assento, id_setor, fileira, numero)
+    com esse ID, ou None se não existir.
+    """
+    sql = "SELECT id_assento, id_setor, fileira, numero FROM Assento WHERE id_assento = $1;"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "assento_por_id", sql, (assento_id,))
+            return cur.fetchone()
+
+def get_assento_many(ids: Iterable[int]) -> Dict[int, Tuple]:
+    """
+    Retorna {id_assento: linha} dos assentos com esses IDs, em uma única consulta
+    (mesmas colunas de get_assento). IDs inexistentes ficam de fora.
+    """
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    sql = "SELECT id_assento, id_setor, fileira, numero FROM Assento WHERE id_assento = ANY($1::int[]);"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "assentos_por_ids", sql, (ids,))
+            return {row[0]: row for row in cur.fetchall()}
+
+def existe_assento(assento_id: int) -> bool:
+    """Indica se existe um assento com esse ID."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "assento_existe",
+                               "SELECT EXISTS (SELECT 1 FROM Assento WHERE id_assento = $1);", (assento_id,))
+            return cur.fetchone()[0]
+
 def update_assento(assento_id: int, 
                    fileira: Optional[str] = None, 
                    numero: Optional[str] = None,
@@ -82,7 +117,8 @@ def delete_assento(assento_id: int) -> int:
     """
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("DELETE FROM Assento WHERE id_assento = %s;", (assento_id,))
+            executar_preparado(cur, "assento_deletar",
+                               "DELETE FROM Assento WHERE id_assento = $1;", (assento_id,))
             rows = cur.rowcount
         conn.commit()
     return rows
\ No newline at end of file
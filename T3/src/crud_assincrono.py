@@ -0,0 +1,201 @@
+# arquivo: crud_assincrono.py
+# Versões assíncronas (asyncio) das funções dos módulos crud_*
+
+import asyncio
+import inspect
+import itertools
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import db
+import checkout as _checkout
+import disponibilidade as _disponibilidade
+import crud_local as _crud_local
+import crud_setor as _crud_setor
+import crud_assento as _crud_assento
+import crud_artista as _crud_artista
+import crud_comprador as _crud_comprador
+import crud_evento as _crud_evento
+import crud_evento_artista as _crud_evento_artista
+import crud_ingresso as _crud_ingresso
+import crud_venda as _crud_venda
+
+# Linhas trazidas por ida à thread nas funções stream_* (iteração assíncrona)
+TAMANHO_LOTE_STREAM = 500
+
+# Uso (dentro de uma corrotina):
+#
+#   from crud_assincrono import crud_evento, disponibilidade
+#   evento = await crud_evento.get_evento(7)
+#   contagens = await contagens_eventos([7, 8, 9])
+#   async for venda in crud_venda.stream_vendas_por_evento(7): ...
+#
+# Cada chamada roda a função síncrona original em uma thread de um
+# executor com tantas threads quanto o limite do pool de conexões, então o
+# loop de eventos nunca bloqueia. Quem limita as conexões é um semáforo por
+# loop, do mesmo tamanho: cada chamada ocupa uma vaga enquanto roda, e cada
+# 'async for' de uma stream_* ocupa uma vaga do começo ao fim da iteração
+# (a conexão fica emprestada mesmo entre um lote e outro, sem thread
+# nenhuma). Com todas as vagas ocupadas, as chamadas seguintes esperam no
+# semáforo (e não no pool, onde acabariam em PoolError) -- inclusive as
+# feitas dentro de um 'async for' quando há tantas iterações abertas quanto
+# vagas. Cache, comandos preparados, instrumentação e métricas continuam
+# valendo.
+#
+# Cada chamada é uma transação própria. Para várias operações na mesma
+# transação, use em_transacao() com uma função síncrona. Cancelar a
+# corrotina não interrompe o comando que já está rodando na thread.
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# Vagas de conexão (asyncio.Semaphore) por loop de eventos, com _total_vagas
+# vagas cada (None = limite atual do pool)
+_vagas: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+_total_vagas: Optional[int] = None
+
+def _obter_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(db.get_pool().maximo,
+                                               thread_name_prefix="crud-assincrono")
+    return _executor
+
+def _vagas_do_loop() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    vagas = _vagas.get(loop)
+    if vagas is None:
+        vagas = _vagas[loop] = asyncio.Semaphore(_total_vagas or db.get_pool().maximo)
+    return vagas
+
+def configurar(trabalhadores: Optional[int] = None):
+    """
+    Recria o executor com 'trabalhadores' threads e o semáforo de conexões
+    com o mesmo número de vagas (padrão: o limite atual do pool). Chame
+    depois de db.configurar_pool().
+    """
+    global _executor, _vagas, _total_vagas
+    trabalhadores = trabalhadores or db.get_pool().maximo
+    if trabalhadores <= 0:
+        raise ValueError("Trabalhadores deve ser um número positivo.")
+    with _executor_lock:
+        antigo = _executor
+        _executor = ThreadPoolExecutor(trabalhadores, thread_name_prefix="crud-assincrono")
+        _vagas = weakref.WeakKeyDictionary()
+        _total_vagas = trabalhadores
+    if antigo is not None:
+        antigo.shutdown(wait=False)
+
+def encerrar():
+    """Espera as chamadas em andamento e encerra o executor."""
+    global _executor
+    with _executor_lock:
+        antigo, _executor = _executor, None
+    if antigo is not None:
+        antigo.shutdown(wait=True)
+
+async def _no_executor(funcao: Callable, *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_obter_executor(), functools.partial(funcao, *args, **kwargs))
+
+async def executar(funcao: Callable, *args, **kwargs) -> Any:
+    """
+    Roda uma função síncrona qualquer da camada de dados no executor,
+    ocupando uma vaga de conexão enquanto ela roda.
+    """
+    async with _vagas_do_loop():
+        return await _no_executor(funcao, *args, **kwargs)
+
+def _com_transacao(funcao: Callable, isolamento: Optional[str], args, kwargs):
+    with db.transacao(isolamento=isolamento):
+        return funcao(*args, **kwargs)
+
+async def em_transacao(funcao: Callable, *args, isolamento: Optional[str] = None, **kwargs) -> Any:
+    """
+    Roda 'funcao' (síncrona) dentro de uma unidade de trabalho, em uma
+    única thread: todas as chamadas crud_* feitas por ela usam a mesma
+    conexão e são confirmadas juntas.
+    """
+    return await executar(_com_transacao, funcao, isolamento, args, kwargs)
+
+
+def _assincrona(funcao: Callable):
+    @functools.wraps(funcao)
+    async def envoltorio(*args, **kwargs):
+        return await executar(funcao, *args, **kwargs)
+    return envoltorio
+
+def _proximos(gerador, quantidade: int) -> list:
+    return list(itertools.islice(gerador, quantidade))
+
+def _iteracao_assincrona(funcao: Callable):
+    """
+    Versão 'async for' de uma função stream_*: as linhas vêm em lotes de
+    TAMANHO_LOTE_STREAM, cada lote lido em uma thread do executor. A
+    conexão fica emprestada até o fim da iteração (ou até aclose()), e a
+    iteração ocupa uma vaga de conexão durante todo esse tempo.
+    """
+    @functools.wraps(funcao)
+    async def envoltorio(*args, **kwargs):
+        async with _vagas_do_loop():
+            gerador = funcao(*args, **kwargs)
+            try:
+                while True:
+                    lote = await _no_executor(_proximos, gerador, TAMANHO_LOTE_STREAM)
+                    if not lote:
+                        return
+                    for linha in lote:
+                        yield linha
+            finally:
+                await _no_executor(gerador.close)
+    return envoltorio
+
+
+class ModuloAssincrono:
+    """
+    Espelho assíncrono de um módulo: cada função pública do módulo vira uma
+    corrotina com a mesma assinatura (funções geradoras viram 'async for').
+    """
+
+    def __init__(self, modulo):
+        self.__name__ = modulo.__name__
+        for nome, funcao in vars(modulo).items():
+            if nome.startswith("_") or not inspect.isfunction(funcao):
+                continue
+            if inspect.unwrap(funcao).__module__ != modulo.__name__:
+                continue  # funções importadas de outros módulos (ex: get_conn)
+            if inspect.isgeneratorfunction(inspect.unwrap(funcao)):
+                setattr(self, nome, _iteracao_assincrona(funcao))
+            else:
+                setattr(self, nome, _assincrona(funcao))
+
+    def __repr__(self):
+        return f"<ModuloAssincrono {self.__name__}>"
+
+
+crud_local = ModuloAssincrono(_crud_local)
+crud_setor = ModuloAssincrono(_crud_setor)
+crud_assento = ModuloAssincrono(_crud_assento)
+crud_artista = ModuloAssincrono(_crud_artista)
+crud_comprador = ModuloAssincrono(_crud_comprador)
+crud_evento = ModuloAssincrono(_crud_evento)
+crud_evento_artista = ModuloAssincrono(_crud_evento_artista)
+crud_ingresso = ModuloAssincrono(_crud_ingresso)
+crud_venda = ModuloAssincrono(_crud_venda)
+checkout = ModuloAssincrono(_checkout)
+disponibilidade = ModuloAssincrono(_disponibilidade)
+
+
+async def contagens_eventos(ids_evento: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    """
+    Contagens de disponibilidade (disponibilidade.contagens) de vários
+    eventos ao mesmo tempo. Retorna {id_evento: contagens}.
+    """
+    ids = list(dict.fromkeys(ids_evento))
+    resultados = await asyncio.gather(*(disponibilidade.contagens(i) for i in ids))
+    return dict(zip(ids, resultados))
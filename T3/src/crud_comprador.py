@@ -1,8 +1,13 @@
 # arquivo: crud_comprador.py
 
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Dict, Iterable
 # Importa a função de conexão do arquivo db.py
-from db import get_conn 
+from db import get_conn, executar_preparado
+
+# buscar_compradores: busca aproximada (pg_trgm) por nome ou email, para
+# achar o cadastro com o que o comprador lembra de um ou de outro
+LIMITE_BUSCA = 20
+MIN_TERMO_BUSCA = 3   # Termos menores casariam com boa parte da tabela
 
 def create_comprador(nome: str, email: str) -> int:
     """
@@ -10,13 +15,14 @@ def create_comprador(nome: str, email: str) -> int:
     Nome e email são obrigatórios.
     Retorna o ID do comprador criado.
     
-    Nota: O email é UNIQUE, a função falhará se o email já existir.
+    Nota: O email é UNIQUE sem diferenciar maiúsculas/minúsculas, a função
+    falhará se o email já existir (mesmo com outra capitalização).
     """
-    sql = "INSERT INTO Comprador (nome, email) VALUES (%s, %s) RETURNING id_comprador;"
+    sql = "INSERT INTO Comprador (nome, email) VALUES ($1, $2) RETURNING id_comprador;"
     
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, (nome, email))
+            executar_preparado(cur, "comprador_inserir", sql, (nome, email))
             comprador_id = cur.fetchone()[0]
         conn.commit()
     return comprador_id
@@ -25,9 +31,75 @@ def read_compradores() -> List[Tuple]:
     """Retorna todos os compradores cadastrados, ordenados por nome."""
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT id_comprador, nome, email FROM Comprador ORDER BY nome;")
+            executar_preparado(cur, "compradores_listar",
+                               "SELECT id_comprador, nome, email FROM Comprador ORDER BY nome;")
             return cur.fetchall()
 
+def buscar_compradores(termo: str, limite: int = LIMITE_BUSCA) -> List[Tuple]:
+    """
+    Busca aproximada por nome ou email. Retorna
+    (id_comprador, nome, email, similaridade), do mais para o menos parecido.
+    """
+    termo = (termo or "").strip()
+    if len(termo) < MIN_TERMO_BUSCA:
+        raise ValueError(f"O termo de busca precisa de pelo menos {MIN_TERMO_BUSCA} caracteres.")
+    sql = """
+        SELECT id_comprador, nome, email,
+               GREATEST(word_similarity($1, nome), word_similarity($1, email)) AS similaridade
+        FROM Comprador
+        WHERE $1 <% nome OR $1 <% email
+        ORDER BY similaridade DESC, nome, id_comprador
+        LIMIT $2;
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "compradores_buscar", sql, (termo, limite))
+            return cur.fetchall()
+
+# --- Leitura por chave ---
+
+def get_comprador_por_email(email: str) -> Optional[Tuple]:
+    """
+    Retorna o comprador (id_comprador, nome, email) com esse email, sem
+    diferenciar maiúsculas/minúsculas, ou None se não existir.
+    """
+    sql = "SELECT id_comprador, nome, email FROM Comprador WHERE lower(email) = lower($1);"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "comprador_por_email", sql, (email.strip(),))
+            return cur.fetchone()
+
+
+def get_comprador(comprador_id: int) -> Optional[Tuple]:
+    """Retorna o comprador (id_comprador, nome, email) com esse ID, ou None se não existir."""
+    sql = "SELECT id_comprador, nome, email FROM Comprador WHERE id_comprador = $1;"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "comprador_por_id", sql, (comprador_id,))
+            return cur.fetchone()
+
+def get_comprador_many(ids: Iterable[int]) -> Dict[int, Tuple]:
+    """
+    Retorna {id_comprador: linha} dos compradores com esses IDs, em uma única consulta
+    (mesmas colunas de get_comprador). IDs inexistentes ficam de fora.
+    """
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    sql = "SELECT id_comprador, nome, email FROM Comprador WHERE id_comprador = ANY($1::int[]);"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "compradores_por_ids", sql, (ids,))
+            return {row[0]: row for row in cur.fetchall()}
+
+def existe_comprador(comprador_id: int) -> bool:
+    """Indica se existe um comprador com esse ID."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "comprador_existe",
+                               "SELECT EXISTS (SELECT 1 FROM Comprador WHERE id_comprador = $1);", (comprador_id,))
+            return cur.fetchone()[0]
+
 def update_comprador(comprador_id: int, 
                      nome: Optional[str] = None, 
                      email: Optional[str] = None) -> int:
@@ -35,7 +107,8 @@ def update_comprador(comprador_id: int,
     Atualiza dados de um comprador. Retorna o número de linhas afetadas.
     Pelo menos um dos campos (nome, email) deve ser fornecido.
     
-    Nota: A atualização falhará se o novo email já pertencer a outro comprador.
+    Nota: A atualização falhará se o novo email (com qualquer capitalização)
+    já pertencer a outro comprador.
     """
     updates = []
     params = []
@@ -72,7 +145,8 @@ def delete_comprador(comprador_id: int) -> int:
     """
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("DELETE FROM Comprador WHERE id_comprador = %s;", (comprador_id,))
+            executar_preparado(cur, "comprador_deletar",
+                               "DELETE FROM Comprador WHERE id_comprador = $1;", (comprador_id,))
             rows = cur.rowcount
         conn.commit()
     return rows
\ No newline at end of file
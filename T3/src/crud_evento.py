@@ -1,10 +1,29 @@
 # arquivo: crud_evento.py
 
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Dict, Iterable, NamedTuple
 # Importa os tipos date e time para os campos do evento
 from datetime import date, time
+from decimal import Decimal
 # Importa a função de conexão do arquivo db.py
-from db import get_conn 
+from db import get_conn, executar_preparado
+import cache
+
+# Eventos por página em read_eventos_detalhados
+TAMANHO_PAGINA = 50
+
+class EventoDetalhado(NamedTuple):
+    """Evento com local, lineup e faixa de preço (read_eventos_detalhados)."""
+    id_evento: int
+    nome: str
+    data: date
+    horario: Optional[time]
+    descricao: Optional[str]
+    id_local: int
+    nome_local: str
+    artistas: List[Tuple[int, str, Optional[str]]]  # (id_artista, nome, genero)
+    preco_min: Optional[Decimal]   # None se o evento não tem ingressos
+    preco_max: Optional[Decimal]
+    ingressos: int
 
 def create_evento(nome: str, data: date, id_local: int, 
                   horario: Optional[time] = None, 
@@ -19,18 +38,20 @@ def create_evento(nome: str, data: date, id_local: int,
     """
     sql = """
         INSERT INTO Evento (nome, data, horario, descricao, id_local) 
-        VALUES (%s, %s, %s, %s, %s) 
+        VALUES ($1, $2, $3, $4, $5) 
         RETURNING id_evento;
     """
     params = (nome, data, horario, descricao, id_local)
     
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, params)
+            executar_preparado(cur, "evento_inserir", sql, params)
             evento_id = cur.fetchone()[0]
         conn.commit()
+    cache.invalidar("evento")
     return evento_id
 
+@cache.em_cache("evento")
 def read_todos_eventos() -> List[Tuple]:
     """
     Retorna todos os eventos cadastrados (id, nome, data, horario, id_local), 
@@ -43,9 +64,10 @@ def read_todos_eventos() -> List[Tuple]:
     """
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql)
+            executar_preparado(cur, "eventos_listar", sql)
             return cur.fetchall()
 
+@cache.em_cache("evento")
 def read_eventos_por_local(local_id: int) -> List[Tuple]:
     """
     Retorna todos os eventos de um local específico, ordenados por data.
@@ -53,14 +75,184 @@ def read_eventos_por_local(local_id: int) -> List[Tuple]:
     sql = """
         SELECT id_evento, nome, data, horario, descricao 
         FROM Evento 
-        WHERE id_local = %s 
+        WHERE id_local = $1 
         ORDER BY data, horario;
     """
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, (local_id,))
+            executar_preparado(cur, "eventos_por_local", sql, (local_id,))
             return cur.fetchall()
 
+# Listagem completa em uma única consulta (sem N+1).
+#
+# A página de eventos é escolhida primeiro (CTE) e só então cada evento
+# recebe o lineup (json_agg) e a faixa de preço, em subconsultas LATERAL
+# que usam os índices por id_evento; juntar artistas e ingressos direto
+# multiplicaria as linhas (artistas x ingressos).
+#
+# Ordem e paginação por (data, horario, id_evento); eventos sem horário
+# vêm por último no dia (horario nulo é tratado como 24:00). O "cursor" da
+# próxima página é (ultimo.data, ultimo.horario, ultimo.id_evento).
+
+_SQL_EVENTOS_DETALHADOS = """
+    WITH pagina AS (
+        SELECT e.id_evento, e.nome, e.data, e.horario, e.descricao, e.id_local
+        FROM Evento e
+        WHERE TRUE {filtro}
+        ORDER BY e.data, COALESCE(e.horario, TIME '24:00'), e.id_evento
+        LIMIT %s
+    )
+    SELECT
+        p.id_evento, p.nome, p.data, p.horario, p.descricao, p.id_local,
+        l.nome AS nome_local,
+        COALESCE(lineup.artistas, '[]'::json),
+        precos.minimo,
+        precos.maximo,
+        precos.quantidade
+    FROM pagina p
+    JOIN Local l ON l.id_local = p.id_local
+    CROSS JOIN LATERAL (
+        SELECT json_agg(json_build_array(a.id_artista, a.nome, a.genero)
+                        ORDER BY a.nome) AS artistas
+        FROM Evento_Artista ea
+        JOIN Artista a ON a.id_artista = ea.id_artista
+        WHERE ea.id_evento = p.id_evento
+    ) lineup
+    CROSS JOIN LATERAL (
+        SELECT MIN(i.preco) AS minimo, MAX(i.preco) AS maximo, COUNT(*) AS quantidade
+        FROM Ingresso i
+        WHERE i.id_evento = p.id_evento
+    ) precos
+    ORDER BY p.data, COALESCE(p.horario, TIME '24:00'), p.id_evento;
+"""
+
+def read_eventos_detalhados(data_inicio: Optional[date] = None,
+                            data_fim: Optional[date] = None,
+                            apos: Optional[Tuple[date, Optional[time], int]] = None,
+                            limite: int = TAMANHO_PAGINA) -> List[EventoDetalhado]:
+    """
+    Página de eventos com nome do local, lineup e preço mínimo/máximo,
+    em uma única consulta. 'data_inicio'/'data_fim' filtram por data
+    (inclusive); 'apos' é o cursor da página anterior (veja acima).
+    """
+    if limite <= 0:
+        raise ValueError("Limite deve ser um número positivo.")
+    filtro = []
+    params = []
+    if data_inicio is not None:
+        filtro.append("AND e.data >= %s")
+        params.append(data_inicio)
+    if data_fim is not None:
+        filtro.append("AND e.data <= %s")
+        params.append(data_fim)
+    if apos is not None:
+        filtro.append("AND (e.data, COALESCE(e.horario, TIME '24:00'), e.id_evento)"
+                      " > (%s, COALESCE(%s::time, TIME '24:00'), %s)")
+        params.extend(apos)
+    params.append(limite)
+
+    sql = _SQL_EVENTOS_DETALHADOS.format(filtro=" ".join(filtro))
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            linhas = cur.fetchall()
+    return [
+        EventoDetalhado(*linha[:7], [tuple(a) for a in linha[7]], *linha[8:])
+        for linha in linhas
+    ]
+
+# Busca textual (coluna Evento.busca, mantida por triggers em schema.sql).
+#
+# O termo aceita a sintaxe de websearch_to_tsquery: palavras soltas (E),
+# "frase exata", OR e -exclusão. Resultados do mais para o menos relevante;
+# a próxima página recebe em 'apos' o (relevancia, id_evento) do último.
+
+_SQL_BUSCA_EVENTOS = """
+    SELECT id_evento, nome, data, horario, nome_local, relevancia
+    FROM (
+        SELECT e.id_evento, e.nome, e.data, e.horario, l.nome AS nome_local,
+               ts_rank(e.busca, consulta) AS relevancia
+        FROM Evento e
+        JOIN Local l ON l.id_local = e.id_local,
+             websearch_to_tsquery('portuguese', %s) AS consulta
+        WHERE e.busca @@ consulta {filtro}
+    ) resultado
+    {apos}
+    ORDER BY relevancia DESC, id_evento DESC
+    LIMIT %s;
+"""
+
+def buscar_eventos(termo: str,
+                   data_inicio: Optional[date] = None,
+                   data_fim: Optional[date] = None,
+                   apos: Optional[Tuple[float, int]] = None,
+                   limite: int = TAMANHO_PAGINA) -> List[Tuple]:
+    """
+    Busca eventos pelo nome, descrição, artistas e nome do local.
+    Retorna (id_evento, nome, data, horario, nome_local, relevancia),
+    ordenados por relevância. 'data_inicio'/'data_fim' filtram por data.
+    """
+    if not termo or not termo.strip():
+        raise ValueError("Informe um termo de busca.")
+    if limite <= 0:
+        raise ValueError("Limite deve ser um número positivo.")
+    filtro = []
+    params = [termo]
+    if data_inicio is not None:
+        filtro.append("AND e.data >= %s")
+        params.append(data_inicio)
+    if data_fim is not None:
+        filtro.append("AND e.data <= %s")
+        params.append(data_fim)
+    condicao_apos = ""
+    if apos is not None:
+        # ::real para comparar com o mesmo valor que ts_rank devolveu
+        condicao_apos = "WHERE (relevancia, id_evento) < (%s::real, %s)"
+        params.extend(apos)
+    params.append(limite)
+
+    sql = _SQL_BUSCA_EVENTOS.format(filtro=" ".join(filtro), apos=condicao_apos)
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchall()
+
+# --- Leitura por chave ---
+
+@cache.em_cache("evento", chave="evento")
+def get_evento(evento_id: int) -> Optional[Tuple]:
+    """
+    Retorna o evento (id_evento, nome, data, horario, descricao, id_local)
+    com esse ID, ou None se não existir.
+    """
+    sql = "SELECT id_evento, nome, data, horario, descricao, id_local FROM Evento WHERE id_evento = $1;"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "evento_por_id", sql, (evento_id,))
+            return cur.fetchone()
+
+def get_evento_many(ids: Iterable[int]) -> Dict[int, Tuple]:
+    """
+    Retorna {id_evento: linha} dos eventos com esses IDs, em uma única consulta
+    (mesmas colunas de get_evento). IDs inexistentes ficam de fora.
+    """
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    sql = "SELECT id_evento, nome, data, horario, descricao, id_local FROM Evento WHERE id_evento = ANY($1::int[]);"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "eventos_por_ids", sql, (ids,))
+            return {row[0]: row for row in cur.fetchall()}
+
+def existe_evento(evento_id: int) -> bool:
+    """Indica se existe um evento com esse ID."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "evento_existe",
+                               "SELECT EXISTS (SELECT 1 FROM Evento WHERE id_evento = $1);", (evento_id,))
+            return cur.fetchone()[0]
+
 def update_evento(evento_id: int, 
                   nome: Optional[str] = None, 
                   data: Optional[date] = None,
@@ -101,6 +293,8 @@ def update_evento(evento_id: int,
             cur.execute(sql, params)
             rows = cur.rowcount
         conn.commit()
+    if rows:
+        cache.invalidar("evento")
     return rows
 
 def delete_evento(evento_id: int) -> int:
@@ -112,7 +306,10 @@ def delete_evento(evento_id: int) -> int:
     """
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("DELETE FROM Evento WHERE id_evento = %s;", (evento_id,))
+            executar_preparado(cur, "evento_deletar",
+                               "DELETE FROM Evento WHERE id_evento = $1;", (evento_id,))
             rows = cur.rowcount
         conn.commit()
+    if rows:
+        cache.invalidar("evento", "evento_artista")
     return rows
\ No newline at end of file
@@ -1,8 +1,15 @@
 # arquivo: crud_evento_artista.py
 
-from typing import List, Tuple
+from typing import List, Tuple, Iterable, NamedTuple
 # Importa a função de conexão do arquivo db.py
-from db import get_conn 
+from db import get_conn, executar_preparado
+import cache
+
+class AlteracaoLineup(NamedTuple):
+    """IDs de artistas incluídos e retirados do lineup (em ordem crescente)."""
+    adicionados: List[int]
+    removidos: List[int]
+
 
 def associar_artista_evento(id_evento: int, id_artista: int) -> int:
     """
@@ -12,15 +19,17 @@ def associar_artista_evento(id_evento: int, id_artista: int) -> int:
     Nota: Falhará se a associação já existir (PK violation) 
     ou se o evento/artista não existir (FK violation).
     """
-    sql = "INSERT INTO Evento_Artista (id_evento, id_artista) VALUES (%s, %s);"
+    sql = "INSERT INTO Evento_Artista (id_evento, id_artista) VALUES ($1, $2);"
     
     with get_conn() as conn:
         with conn.cursor() as cur:
             # Em caso de erro (ex: duplicado), a exceção será 
             # propagada e deve ser tratada pelo 'main.py'
-            cur.execute(sql, (id_evento, id_artista))
+            executar_preparado(cur, "evento_artista_inserir", sql, (id_evento, id_artista))
             rows = cur.rowcount
         conn.commit()
+    if rows:
+        cache.invalidar("evento_artista")
     return rows
 
 def desassociar_artista_evento(id_evento: int, id_artista: int) -> int:
@@ -28,15 +37,114 @@ def desassociar_artista_evento(id_evento: int, id_artista: int) -> int:
     Desassocia um artista de um evento (remove o registro da tabela N:N).
     Retorna o número de linhas afetadas.
     """
-    sql = "DELETE FROM Evento_Artista WHERE id_evento = %s AND id_artista = %s;"
+    sql = "DELETE FROM Evento_Artista WHERE id_evento = $1 AND id_artista = $2;"
     
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, (id_evento, id_artista))
+            executar_preparado(cur, "evento_artista_deletar", sql, (id_evento, id_artista))
             rows = cur.rowcount
         conn.commit()
+    if rows:
+        cache.invalidar("evento_artista")
     return rows
 
+# --- Lineup em lote ---
+#
+# Um único comando por chamada: o evento é lido em uma CTE, e a inclusão
+# (ON CONFLICT DO NOTHING) e a remoção em lote são CTEs do mesmo comando.
+# Na troca de lineup, a linha do evento é travada antes, em um comando
+# separado: em READ COMMITTED o snapshot de um comando é tirado antes de
+# ele esperar por um lock, então um lock na própria CTE não faria a troca
+# enxergar o lineup gravado por outra troca que terminou durante a espera.
+# Evento inexistente -> ValueError.
+
+def _aplicar_lineup(id_evento: int, sql: str, nome: str, ids: List[int],
+                    travar: bool = False) -> AlteracaoLineup:
+    """Executa o comando de lineup (travando o evento antes, se pedido) e separa as linhas retornadas."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            if travar:
+                executar_preparado(cur, "evento_lineup_travar",
+                                   "SELECT 1 FROM Evento WHERE id_evento = $1 FOR NO KEY UPDATE;",
+                                   (id_evento,))
+            executar_preparado(cur, nome, sql, (id_evento, ids))
+            linhas = cur.fetchall()
+        conn.commit()
+    if not any(tipo == "evento" for tipo, _ in linhas):
+        raise ValueError(f"Evento {id_evento} não encontrado.")
+    alteracao = AlteracaoLineup(
+        sorted(i for tipo, i in linhas if tipo == "adicionado"),
+        sorted(i for tipo, i in linhas if tipo == "removido"),
+    )
+    if alteracao.adicionados or alteracao.removidos:
+        cache.invalidar("evento_artista")
+    return alteracao
+
+def associar_artistas_evento(id_evento: int, ids_artista: Iterable[int]) -> AlteracaoLineup:
+    """
+    Associa vários artistas a um evento de uma vez. Artistas que já estão
+    no lineup são ignorados (não é erro). 'removidos' vem sempre vazio.
+
+    Nota: Falhará (FK violation) se algum artista não existir.
+    """
+    sql = """
+        WITH evento AS (
+            SELECT id_evento FROM Evento WHERE id_evento = $1
+        ),
+        adicionados AS (
+            INSERT INTO Evento_Artista (id_evento, id_artista)
+            SELECT e.id_evento, a.id_artista
+            FROM evento e
+            CROSS JOIN (SELECT DISTINCT unnest($2::int[]) AS id_artista) a
+            ORDER BY a.id_artista
+            ON CONFLICT DO NOTHING
+            RETURNING id_artista
+        )
+        SELECT 'evento', id_evento FROM evento
+        UNION ALL
+        SELECT 'adicionado', id_artista FROM adicionados;
+    """
+    return _aplicar_lineup(id_evento, sql, "evento_artistas_associar", sorted(set(ids_artista)))
+
+def substituir_lineup(id_evento: int, ids_artista: Iterable[int]) -> AlteracaoLineup:
+    """
+    Faz o lineup do evento ser exatamente 'ids_artista': inclui os que
+    faltam e remove os que sobram, em um único comando. A linha do evento é
+    travada antes do comando, na mesma transação, para que duas trocas
+    simultâneas do mesmo lineup se serializem (a segunda vê a primeira).
+
+    Nota: Falhará (FK violation) se algum artista não existir.
+    """
+    sql = """
+        WITH evento AS (
+            SELECT id_evento FROM Evento WHERE id_evento = $1
+        ),
+        removidos AS (
+            DELETE FROM Evento_Artista ea
+            USING evento e
+            WHERE ea.id_evento = e.id_evento
+              AND ea.id_artista <> ALL($2::int[])
+            RETURNING ea.id_artista
+        ),
+        adicionados AS (
+            INSERT INTO Evento_Artista (id_evento, id_artista)
+            SELECT e.id_evento, a.id_artista
+            FROM evento e
+            CROSS JOIN (SELECT DISTINCT unnest($2::int[]) AS id_artista) a
+            ORDER BY a.id_artista
+            ON CONFLICT DO NOTHING
+            RETURNING id_artista
+        )
+        SELECT 'evento', id_evento FROM evento
+        UNION ALL
+        SELECT 'adicionado', id_artista FROM adicionados
+        UNION ALL
+        SELECT 'removido', id_artista FROM removidos;
+    """
+    return _aplicar_lineup(id_evento, sql, "evento_lineup_substituir", sorted(set(ids_artista)),
+                           travar=True)
+
+@cache.em_cache("evento_artista", "artista", chave="evento_artista")
 def read_artistas_por_evento(id_evento: int) -> List[Tuple]:
     """
     Retorna todos os artistas (id, nome, genero) associados a um evento específico.
@@ -46,14 +154,15 @@ def read_artistas_por_evento(id_evento: int) -> List[Tuple]:
         SELECT a.id_artista, a.nome, a.genero 
         FROM Artista a
         JOIN Evento_Artista ea ON a.id_artista = ea.id_artista
-        WHERE ea.id_evento = %s
+        WHERE ea.id_evento = $1
         ORDER BY a.nome;
     """
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, (id_evento,))
+            executar_preparado(cur, "artistas_por_evento", sql, (id_evento,))
             return cur.fetchall()
 
+@cache.em_cache("evento_artista", "evento")
 def read_eventos_por_artista(id_artista: int) -> List[Tuple]:
     """
     Retorna todos os eventos (id, nome, data) aos quais um artista específico
@@ -64,10 +173,10 @@ def read_eventos_por_artista(id_artista: int) -> List[Tuple]:
         SELECT e.id_evento, e.nome, e.data 
         FROM Evento e
         JOIN Evento_Artista ea ON e.id_evento = ea.id_evento
-        WHERE ea.id_artista = %s
+        WHERE ea.id_artista = $1
         ORDER BY e.data;
     """
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, (id_artista,))
+            executar_preparado(cur, "eventos_por_artista", sql, (id_artista,))
             return cur.fetchall()
\ No newline at end of file
@@ -1,71 +1,171 @@
 # arquivo: crud_ingresso.py
 
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, NamedTuple, Dict, Iterable
 # Importa o tipo Decimal para lidar com o preco (NUMERIC)
 from decimal import Decimal
 # Importa a função de conexão do arquivo db.py
-from db import get_conn 
+from db import get_conn, executar_preparado
+# Mapa de assentos em memória (invalidado quando os ingressos mudam)
+import disponibilidade
 
 # --- Funções de Criação (Transacionais) ---
 
+class IngressoCriado(NamedTuple):
+    """Ingresso recém-criado, como gravado no banco."""
+    id_ingresso: int
+    id_evento: int
+    preco: Decimal
+    id_assento: Optional[int]
+    tipo: str                  # "VIP" ou "PADRAO"
+    beneficios: Optional[str]  # Sempre None para ingressos Padrão
+
 def create_ingresso_vip(id_evento: int, preco: Decimal, 
                       id_assento: Optional[int], 
-                      beneficios: Optional[str]) -> int:
+                      beneficios: Optional[str]) -> IngressoCriado:
     """
     Cria um INGRESSO VIP.
     Insere na superclasse 'Ingresso' e na subclasse 'Ingresso_VIP'
-    dentro de uma única transação.
-    Retorna o ID do novo ingresso criado.
+    em um único comando (CTE com INSERT ... RETURNING), ou seja, uma
+    única ida ao servidor. Retorna o IngressoCriado.
     """
-    # A
-    sql_ingresso = """
-        INSERT INTO Ingresso (id_evento, preco, id_assento) 
-        VALUES (%s, %s, %s) 
-        RETURNING id_ingresso;
+    sql = """
+        WITH novo AS (
+            INSERT INTO Ingresso (id_evento, preco, id_assento) 
+            VALUES ($1, $2, $3) 
+            RETURNING id_ingresso, id_evento, preco, id_assento
+        ), vip AS (
+            INSERT INTO Ingresso_VIP (id_ingresso, beneficios)
+            SELECT id_ingresso, $4 FROM novo
+            RETURNING beneficios
+        )
+        SELECT novo.id_ingresso, novo.id_evento, novo.preco, novo.id_assento,
+               'VIP', vip.beneficios
+        FROM novo, vip;
     """
-    sql_vip = "INSERT INTO Ingresso_VIP (id_ingresso, beneficios) VALUES (%s, %s);"
     
     # O bloco 'with get_conn() as conn' gerencia a transação.
-    # Se qualquer comando falhar, o rollback é automático.
+    # Se o comando falhar, o rollback é automático.
     with get_conn() as conn:
         with conn.cursor() as cur:
-            # 1. Insere na tabela 'Ingresso' (superclasse)
-            cur.execute(sql_ingresso, (id_evento, preco, id_assento))
-            # 2. Obtém o ID do ingresso recém-criado
-            id_ingresso = cur.fetchone()[0]
-            
-            # 3. Insere na tabela 'Ingresso_VIP' (subclasse)
-            cur.execute(sql_vip, (id_ingresso, beneficios))
-            
+            executar_preparado(cur, "ingresso_vip_criar", sql,
+                               (id_evento, preco, id_assento, beneficios))
+            ingresso = IngressoCriado(*cur.fetchone())
         conn.commit() # Comita a transação
-    return id_ingresso
+    if id_assento is not None:
+        disponibilidade.invalidar_evento(id_evento)
+    return ingresso
 
 def create_ingresso_padrao(id_evento: int, preco: Decimal, 
-                         id_assento: Optional[int]) -> int:
+                         id_assento: Optional[int]) -> IngressoCriado:
     """
     Cria um INGRESSO PADRÃO.
     Insere na superclasse 'Ingresso' e na subclasse 'Ingresso_Padrao'
-    dentro de uma única transação.
-    Retorna o ID do novo ingresso criado.
+    em um único comando (CTE com INSERT ... RETURNING).
+    Retorna o IngressoCriado.
     """
-    sql_ingresso = """
-        INSERT INTO Ingresso (id_evento, preco, id_assento) 
-        VALUES (%s, %s, %s) 
-        RETURNING id_ingresso;
+    sql = """
+        WITH novo AS (
+            INSERT INTO Ingresso (id_evento, preco, id_assento) 
+            VALUES ($1, $2, $3) 
+            RETURNING id_ingresso, id_evento, preco, id_assento
+        ), padrao AS (
+            INSERT INTO Ingresso_Padrao (id_ingresso)
+            SELECT id_ingresso FROM novo
+        )
+        SELECT id_ingresso, id_evento, preco, id_assento, 'PADRAO', NULL::text
+        FROM novo;
     """
-    sql_padrao = "INSERT INTO Ingresso_Padrao (id_ingresso) VALUES (%s);"
     
     with get_conn() as conn:
         with conn.cursor() as cur:
-            # 1. Insere na tabela 'Ingresso'
-            cur.execute(sql_ingresso, (id_evento, preco, id_assento))
-            id_ingresso = cur.fetchone()[0]
-            
-            # 2. Insere na tabela 'Ingresso_Padrao'
-            cur.execute(sql_padrao, (id_ingresso,))
-            
+            executar_preparado(cur, "ingresso_padrao_criar", sql,
+                               (id_evento, preco, id_assento))
+            ingresso = IngressoCriado(*cur.fetchone())
         conn.commit() # Comita a transação
-    return id_ingresso
+    if id_assento is not None:
+        disponibilidade.invalidar_evento(id_evento)
+    return ingresso
+
+# --- Geração em Massa (um ingresso por assento) ---
+
+TIPOS_INGRESSO = ("VIP", "PADRAO")
+
+# Só assentos de setores do local onde o evento acontece; ON CONFLICT
+# cobre ingressos criados em paralelo para o mesmo assento. Um comando
+# preparado por tipo, que só muda a inserção na subclasse.
+_SQL_INGRESSOS_EM_MASSA = """
+    WITH novos AS (
+        INSERT INTO Ingresso (id_evento, preco, id_assento)
+        SELECT e.id_evento, $1::numeric, a.id_assento
+        FROM Evento e
+        JOIN Setor s ON s.id_local = e.id_local
+        JOIN Assento a ON a.id_setor = s.id_setor
+        WHERE e.id_evento = $2
+          AND ($3::int IS NULL OR s.id_setor = $3::int)
+          AND NOT EXISTS (
+              SELECT 1 FROM Ingresso i
+              WHERE i.id_evento = e.id_evento AND i.id_assento = a.id_assento
+          )
+        ORDER BY a.id_assento
+        ON CONFLICT ON CONSTRAINT uq_evento_assento DO NOTHING
+        RETURNING id_ingresso
+    )
+    {subclasse}
+"""
+_SQL_INGRESSOS_EM_MASSA_VIP = _SQL_INGRESSOS_EM_MASSA.format(
+    subclasse="INSERT INTO Ingresso_VIP (id_ingresso, beneficios) SELECT id_ingresso, $4::text FROM novos;")
+_SQL_INGRESSOS_EM_MASSA_PADRAO = _SQL_INGRESSOS_EM_MASSA.format(
+    subclasse="INSERT INTO Ingresso_Padrao (id_ingresso) SELECT id_ingresso FROM novos;")
+
+def _create_ingressos_em_massa(id_evento: int, preco: Decimal, tipo: str,
+                               beneficios: Optional[str],
+                               id_setor: Optional[int]) -> int:
+    """
+    Cria, em um único comando, um ingresso para cada assento do local do
+    evento (ou só do setor 'id_setor') que ainda não tenha ingresso para
+    esse evento, mais a linha correspondente na subclasse.
+    Retorna o número de ingressos criados.
+    """
+    tipo = tipo.upper()
+    if tipo not in TIPOS_INGRESSO:
+        raise ValueError(f"Tipo de ingresso inválido: {tipo} (use VIP ou PADRAO).")
+    if preco is None or preco < 0:
+        raise ValueError("Preço não pode ser negativo.")
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            if tipo == "VIP":
+                executar_preparado(cur, "ingressos_vip_em_massa", _SQL_INGRESSOS_EM_MASSA_VIP,
+                                   (preco, id_evento, id_setor, beneficios))
+            else:
+                executar_preparado(cur, "ingressos_padrao_em_massa", _SQL_INGRESSOS_EM_MASSA_PADRAO,
+                                   (preco, id_evento, id_setor))
+            criados = cur.rowcount
+        conn.commit()
+    if criados:
+        disponibilidade.invalidar_evento(id_evento)
+    return criados
+
+def create_ingressos_setor(id_evento: int, id_setor: int, preco: Decimal,
+                           tipo: str = "PADRAO",
+                           beneficios: Optional[str] = None) -> int:
+    """
+    Cria ingressos (VIP ou PADRAO, mesmo preço) para todos os assentos de
+    um setor que ainda não têm ingresso para o evento.
+    O setor precisa pertencer ao local do evento; caso contrário nada é criado.
+    Retorna o número de ingressos criados.
+    """
+    return _create_ingressos_em_massa(id_evento, preco, tipo, beneficios, id_setor)
+
+def create_ingressos_local(id_evento: int, preco: Decimal,
+                           tipo: str = "PADRAO",
+                           beneficios: Optional[str] = None) -> int:
+    """
+    Cria ingressos (VIP ou PADRAO, mesmo preço) para todos os assentos de
+    todos os setores do local do evento que ainda não têm ingresso.
+    Retorna o número de ingressos criados.
+    """
+    return _create_ingressos_em_massa(id_evento, preco, tipo, beneficios, None)
 
 # --- Funções de Leitura ---
 
@@ -85,14 +185,61 @@ def read_ingressos_por_evento(id_evento: int) -> List[Tuple]:
         FROM Ingresso i
         LEFT JOIN Ingresso_VIP vip ON i.id_ingresso = vip.id_ingresso
         LEFT JOIN Ingresso_Padrao padrao ON i.id_ingresso = padrao.id_ingresso
-        WHERE i.id_evento = %s
+        WHERE i.id_evento = $1
         ORDER BY i.id_ingresso;
     """
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, (id_evento,))
+            executar_preparado(cur, "ingressos_por_evento", sql, (id_evento,))
             return cur.fetchall()
 
+# --- Leitura por chave ---
+
+# Mesmas colunas de IngressoCriado
+_SQL_INGRESSO = """
+    SELECT i.id_ingresso, i.id_evento, i.preco, i.id_assento,
+           CASE WHEN vip.id_ingresso IS NOT NULL THEN 'VIP'
+                WHEN padrao.id_ingresso IS NOT NULL THEN 'PADRAO'
+           END,
+           vip.beneficios
+    FROM Ingresso i
+    LEFT JOIN Ingresso_VIP vip ON i.id_ingresso = vip.id_ingresso
+    LEFT JOIN Ingresso_Padrao padrao ON i.id_ingresso = padrao.id_ingresso
+    WHERE {filtro};
+"""
+
+def get_ingresso(id_ingresso: int) -> Optional[IngressoCriado]:
+    """Retorna o ingresso (no formato de IngressoCriado) ou None se não existir."""
+    sql = _SQL_INGRESSO.format(filtro="i.id_ingresso = $1")
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "ingresso_por_id", sql, (id_ingresso,))
+            row = cur.fetchone()
+    return IngressoCriado._make(row) if row else None
+
+def get_ingresso_many(ids: Iterable[int]) -> Dict[int, IngressoCriado]:
+    """
+    Retorna {id_ingresso: IngressoCriado} dos ingressos com esses IDs, em uma
+    única consulta. IDs inexistentes ficam de fora.
+    """
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    sql = _SQL_INGRESSO.format(filtro="i.id_ingresso = ANY($1::int[])")
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "ingressos_por_ids", sql, (ids,))
+            return {row[0]: IngressoCriado._make(row) for row in cur.fetchall()}
+
+def existe_ingresso(id_ingresso: int) -> bool:
+    """Indica se existe um ingresso com esse ID."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "ingresso_existe",
+                               "SELECT EXISTS (SELECT 1 FROM Ingresso WHERE id_ingresso = $1);",
+                               (id_ingresso,))
+            return cur.fetchone()[0]
+
 # --- Funções de Atualização ---
 
 def update_ingresso_comum(id_ingresso: int, 
@@ -115,23 +262,27 @@ def update_ingresso_comum(id_ingresso: int,
         return 0
     
     params.append(id_ingresso)
-    sql = f"UPDATE Ingresso SET {', '.join(updates)} WHERE id_ingresso = %s;"
+    sql = f"UPDATE Ingresso SET {', '.join(updates)} WHERE id_ingresso = %s RETURNING id_evento;"
     
     with get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(sql, params)
+            alterados = cur.fetchall()
             rows = cur.rowcount
         conn.commit()
+    if id_assento is not None:
+        for (id_evento,) in alterados:
+            disponibilidade.invalidar_evento(id_evento)
     return rows
 
 def update_ingresso_vip_beneficios(id_ingresso: int, beneficios: str) -> int:
     """
     Atualiza os benefícios de um ingresso VIP (na tabela Ingresso_VIP).
     """
-    sql = "UPDATE Ingresso_VIP SET beneficios = %s WHERE id_ingresso = %s;"
+    sql = "UPDATE Ingresso_VIP SET beneficios = $1 WHERE id_ingresso = $2;"
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, (beneficios, id_ingresso))
+            executar_preparado(cur, "ingresso_vip_atualizar", sql, (beneficios, id_ingresso))
             rows = cur.rowcount
         conn.commit()
     return rows
@@ -150,7 +301,12 @@ def delete_ingresso(id_ingresso: int) -> int:
     """
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("DELETE FROM Ingresso WHERE id_ingresso = %s;", (id_ingresso,))
+            executar_preparado(cur, "ingresso_deletar",
+                               "DELETE FROM Ingresso WHERE id_ingresso = $1 RETURNING id_evento;",
+                               (id_ingresso,))
+            removidos = cur.fetchall()
             rows = cur.rowcount
         conn.commit()
+    for (id_evento,) in removidos:
+        disponibilidade.invalidar_evento(id_evento)
     return rows
\ No newline at end of file
@@ -1,8 +1,9 @@
 # arquivo: crud_local.py
 
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Dict, Iterable
 # Importa a função de conexão do arquivo db.py
-from db import get_conn 
+from db import get_conn, executar_preparado
+import cache
 
 def create_local(nome: str, capacidade: int, endereco: Optional[str] = None) -> int:
     """
@@ -14,22 +15,61 @@ def create_local(nome: str, capacidade: int, endereco: Optional[str] = None) ->
     if capacidade <= 0:
         raise ValueError("Capacidade deve ser um número positivo.")
         
-    sql = "INSERT INTO Local (nome, endereco, capacidade) VALUES (%s, %s, %s) RETURNING id_local;"
+    sql = "INSERT INTO Local (nome, endereco, capacidade) VALUES ($1, $2, $3) RETURNING id_local;"
     
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, (nome, endereco, capacidade))
+            executar_preparado(cur, "local_inserir", sql, (nome, endereco, capacidade))
             local_id = cur.fetchone()[0]
         conn.commit()
+    cache.invalidar("local")
     return local_id
 
+@cache.em_cache("local")
 def read_locais() -> List[Tuple]:
     """Retorna todos os locais cadastrados, ordenados por nome."""
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT id_local, nome, endereco, capacidade FROM Local ORDER BY nome;")
+            executar_preparado(cur, "locais_listar",
+                               "SELECT id_local, nome, endereco, capacidade FROM Local ORDER BY nome;")
             return cur.fetchall()
 
+# --- Leitura por chave ---
+
+@cache.em_cache("local", chave="local")
+def get_local(local_id: int) -> Optional[Tuple]:
+    """
+    Retorna o local (id_local, nome, endereco, capacidade)
+    com esse ID, ou None se não existir.
+    """
+    sql = "SELECT id_local, nome, endereco, capacidade FROM Local WHERE id_local = $1;"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "local_por_id", sql, (local_id,))
+            return cur.fetchone()
+
+def get_local_many(ids: Iterable[int]) -> Dict[int, Tuple]:
+    """
+    Retorna {id_local: linha} dos locais com esses IDs, em uma única consulta
+    (mesmas colunas de get_local). IDs inexistentes ficam de fora.
+    """
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    sql = "SELECT id_local, nome, endereco, capacidade FROM Local WHERE id_local = ANY($1::int[]);"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "locais_por_ids", sql, (ids,))
+            return {row[0]: row for row in cur.fetchall()}
+
+def existe_local(local_id: int) -> bool:
+    """Indica se existe um local com esse ID."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "local_existe",
+                               "SELECT EXISTS (SELECT 1 FROM Local WHERE id_local = $1);", (local_id,))
+            return cur.fetchone()[0]
+
 def update_local(local_id: int, 
                  nome: Optional[str] = None, 
                  endereco: Optional[str] = None, 
@@ -68,7 +108,8 @@ def update_local(local_id: int,
             cur.execute(sql, params)
             rows = cur.rowcount
         conn.commit()
-    
+    if rows:
+        cache.invalidar("local")
     return rows
 
 def delete_local(local_id: int) -> int:
@@ -79,7 +120,11 @@ def delete_local(local_id: int) -> int:
     """
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("DELETE FROM Local WHERE id_local = %s;", (local_id,))
+            executar_preparado(cur, "local_deletar",
+                               "DELETE FROM Local WHERE id_local = $1;", (local_id,))
             rows = cur.rowcount
         conn.commit()
+    if rows:
+        # Setores (e assentos) do local saem junto (CASCADE)
+        cache.invalidar("local", "setor")
     return rows
\ No newline at end of file
@@ -1,8 +1,9 @@
 # arquivo: crud_setor.py
 
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Dict, Iterable
 # Importa a função de conexão do arquivo db.py
-from db import get_conn 
+from db import get_conn, executar_preparado
+import cache
 
 def create_setor(nome: str, id_local: int) -> int:
     """
@@ -12,35 +13,72 @@ def create_setor(nome: str, id_local: int) -> int:
     
     Nota: Falhará se o 'nome' já existir para esse 'id_local' (restrição UNIQUE).
     """
-    sql = "INSERT INTO Setor (nome, id_local) VALUES (%s, %s) RETURNING id_setor;"
+    sql = "INSERT INTO Setor (nome, id_local) VALUES ($1, $2) RETURNING id_setor;"
     
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, (nome, id_local))
+            executar_preparado(cur, "setor_inserir", sql, (nome, id_local))
             setor_id = cur.fetchone()[0]
         conn.commit()
+    cache.invalidar("setor")
     return setor_id
 
+@cache.em_cache("setor", chave="setor")
 def read_setores_por_local(local_id: int) -> List[Tuple]:
     """
     Retorna todos os setores (id_setor, nome) de um local específico.
     Esta será a função mais comum para listar setores.
     """
-    sql = "SELECT id_setor, nome FROM Setor WHERE id_local = %s ORDER BY nome;"
+    sql = "SELECT id_setor, nome FROM Setor WHERE id_local = $1 ORDER BY nome;"
     
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, (local_id,))
+            executar_preparado(cur, "setores_por_local", sql, (local_id,))
             return cur.fetchall()
 
+@cache.em_cache("setor")
 def read_todos_setores() -> List[Tuple]:
     """Retorna TODOS os setores de TODOS os locais."""
     with get_conn() as conn:
         with conn.cursor() as cur:
             # Inclui o id_local para saber a qual local o setor pertence
-            cur.execute("SELECT id_setor, nome, id_local FROM Setor ORDER BY id_local, nome;")
+            executar_preparado(cur, "setores_listar",
+                               "SELECT id_setor, nome, id_local FROM Setor ORDER BY id_local, nome;")
             return cur.fetchall()
 
+# --- Leitura por chave ---
+
+@cache.em_cache("setor")
+def get_setor(setor_id: int) -> Optional[Tuple]:
+    """Retorna o setor (id_setor, nome, id_local) com esse ID, ou None se não existir."""
+    sql = "SELECT id_setor, nome, id_local FROM Setor WHERE id_setor = $1;"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "setor_por_id", sql, (setor_id,))
+            return cur.fetchone()
+
+def get_setor_many(ids: Iterable[int]) -> Dict[int, Tuple]:
+    """
+    Retorna {id_setor: linha} dos setores com esses IDs, em uma única consulta
+    (mesmas colunas de get_setor). IDs inexistentes ficam de fora.
+    """
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    sql = "SELECT id_setor, nome, id_local FROM Setor WHERE id_setor = ANY($1::int[]);"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "setores_por_ids", sql, (ids,))
+            return {row[0]: row for row in cur.fetchall()}
+
+def existe_setor(setor_id: int) -> bool:
+    """Indica se existe um setor com esse ID."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "setor_existe",
+                               "SELECT EXISTS (SELECT 1 FROM Setor WHERE id_setor = $1);", (setor_id,))
+            return cur.fetchone()[0]
+
 def update_setor(setor_id: int, 
                  nome: Optional[str] = None, 
                  id_local: Optional[int] = None) -> int:
@@ -73,7 +111,8 @@ def update_setor(setor_id: int,
             cur.execute(sql, params)
             rows = cur.rowcount
         conn.commit()
-    
+    if rows:
+        cache.invalidar("setor")
     return rows
 
 def delete_setor(setor_id: int) -> int:
@@ -84,7 +123,10 @@ def delete_setor(setor_id: int) -> int:
     """
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("DELETE FROM Setor WHERE id_setor = %s;", (setor_id,))
+            executar_preparado(cur, "setor_deletar",
+                               "DELETE FROM Setor WHERE id_setor = $1;", (setor_id,))
             rows = cur.rowcount
         conn.commit()
+    if rows:
+        cache.invalidar("setor")
     return rows
\ No newline at end of file
@@ -1,9 +1,29 @@
 # arquivo: crud_venda.py
 
-from typing import List, Tuple, Optional
+import uuid
+from typing import List, Tuple, Optional, Iterable, Iterator, NamedTuple, Dict
 from datetime import date
+from psycopg2.extras import execute_values
 # Importa a função de conexão do arquivo db.py
-from db import get_conn 
+from db import get_conn, executar_preparado
+# Mapa de assentos em memória, atualizado após cada venda/cancelamento
+import disponibilidade
+import metricas
+
+# Linhas por INSERT multi-linha em create_vendas_batch
+TAMANHO_LOTE_VENDAS = 1000
+# Linhas por página (leituras paginadas) e por ida ao servidor (cursores nomeados)
+TAMANHO_PAGINA = 50
+ITERSIZE_PADRAO = 2000
+
+class ResultadoLoteVendas(NamedTuple):
+    """
+    Resultado de create_vendas_batch.
+    'ids' segue a ordem da entrada (None nas linhas rejeitadas);
+    'falhas' lista (posição na entrada, motivo) de cada linha rejeitada.
+    """
+    ids: List[Optional[int]]
+    falhas: List[Tuple[int, str]]
 
 def create_venda(data: date, quantidade: int, id_ingresso: int, id_comprador: int) -> int:
     """
@@ -11,26 +31,140 @@ def create_venda(data: date, quantidade: int, id_ingresso: int, id_comprador: in
     Requer 'data' da transação, 'quantidade', 'id_ingresso' e 'id_comprador'.
     Retorna o ID da venda criada.
     
-    Nota: Falhará se 'quantidade' <= 0 (CHECK constraint) ou
-    se o ingresso/comprador não existir (FK constraint).
+    Nota: Falhará se 'quantidade' <= 0 (CHECK constraint), se o
+    ingresso/comprador não existir (FK constraint), se a venda passar da
+    capacidade do local do evento (check_violation 'evento_capacidade',
+    levantado pelo trigger do resumo de vendas) ou se o ingresso for de
+    assento marcado e já tiver venda ou 'quantidade' != 1 (índice único
+    uq_venda_ingresso_numerado / CHECK ck_venda_numerado_quantidade).
     """
     if quantidade <= 0:
         raise ValueError("Quantidade deve ser um número positivo.")
         
     sql = """
         INSERT INTO Venda (data, quantidade, id_ingresso, id_comprador) 
-        VALUES (%s, %s, %s, %s) 
+        VALUES ($1, $2, $3, $4) 
         RETURNING id_venda;
     """
     params = (data, quantidade, id_ingresso, id_comprador)
     
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, params)
+            executar_preparado(cur, "venda_inserir", sql, params)
             venda_id = cur.fetchone()[0]
         conn.commit()
+    disponibilidade.registrar_venda(id_ingresso)
+    metricas.registrar_vendas(1, quantidade)
     return venda_id
 
+def create_vendas_batch(vendas: Iterable[Tuple[date, int, int, int]],
+                        tamanho_lote: int = TAMANHO_LOTE_VENDAS) -> ResultadoLoteVendas:
+    """
+    Registra várias vendas de uma vez (ex: lote enviado por revendedor).
+    Cada item segue a ordem de create_venda: (data, quantidade, id_ingresso, id_comprador).
+
+    Todas as linhas válidas são inseridas em uma única transação, com
+    INSERTs multi-linha de até 'tamanho_lote' vendas. Linhas com
+    quantidade <= 0, com ingresso/comprador inexistente ou com assento
+    marcado já vendido (antes ou em outra linha do lote) ou com quantidade
+    != 1 são rejeitadas individualmente (sem abortar o lote) e aparecem em
+    'falhas'. Um lote que passe da capacidade do local de algum evento, ou
+    que perca um assento para uma venda concorrente depois da checagem,
+    falha inteiro (check_violation 'evento_capacidade' / unique violation
+    uq_venda_ingresso_numerado), sem gravar nenhuma venda.
+    """
+    if tamanho_lote <= 0:
+        raise ValueError("Tamanho do lote deve ser um número positivo.")
+
+    vendas = list(vendas)
+    ids: List[Optional[int]] = [None] * len(vendas)
+    falhas: List[Tuple[int, str]] = []
+
+    # 1. Validação local (equivalente ao CHECK quantidade > 0)
+    candidatas = []
+    for pos, venda in enumerate(vendas):
+        if len(venda) != 4:
+            falhas.append((pos, "Venda deve ter (data, quantidade, id_ingresso, id_comprador)."))
+        elif venda[1] is None or venda[1] <= 0:
+            falhas.append((pos, "Quantidade deve ser um número positivo."))
+        else:
+            candidatas.append(pos)
+
+    if not candidatas:
+        return ResultadoLoteVendas(ids, falhas)
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            # 2. Validação das FKs em uma consulta por tabela
+            ids_ingresso = list({vendas[pos][2] for pos in candidatas})
+            ids_comprador = list({vendas[pos][3] for pos in candidatas})
+            cur.execute("SELECT id_ingresso, id_assento IS NOT NULL FROM Ingresso "
+                        "WHERE id_ingresso = ANY(%s);", (ids_ingresso,))
+            ingressos = dict(cur.fetchall())
+            cur.execute("SELECT id_comprador FROM Comprador WHERE id_comprador = ANY(%s);",
+                        (ids_comprador,))
+            compradores = {row[0] for row in cur.fetchall()}
+
+            # Assentos marcados já vendidos (mesma regra do índice único
+            # uq_venda_ingresso_numerado, checada aqui linha a linha)
+            numerados = [i for i, numerado in ingressos.items() if numerado]
+            cur.execute("SELECT DISTINCT id_ingresso FROM Venda "
+                        "WHERE id_ingresso = ANY(%s) AND numerado;", (numerados,))
+            vendidos = {row[0] for row in cur.fetchall()}
+
+            validas = []
+            for pos in candidatas:
+                _, quantidade, id_ingresso, id_comprador = vendas[pos]
+                if id_ingresso not in ingressos:
+                    falhas.append((pos, f"Ingresso {id_ingresso} não existe."))
+                elif id_comprador not in compradores:
+                    falhas.append((pos, f"Comprador {id_comprador} não existe."))
+                elif ingressos[id_ingresso] and quantidade != 1:
+                    falhas.append((pos, f"Ingresso {id_ingresso} é de assento marcado; "
+                                        "quantidade deve ser 1."))
+                elif ingressos[id_ingresso] and id_ingresso in vendidos:
+                    falhas.append((pos, f"Ingresso {id_ingresso} já vendido."))
+                else:
+                    if ingressos[id_ingresso]:
+                        vendidos.add(id_ingresso)
+                    validas.append(pos)
+
+            # 3. Inserção em blocos. Cada linha recebe seu id_venda da
+            # sequência antes do INSERT, junto com a posição na entrada;
+            # o resultado volta como (pos, id_venda), sem depender da ordem
+            # em que a sequência atribui os ids.
+            sql = """
+                WITH entrada AS (
+                    SELECT nextval(pg_get_serial_sequence('venda', 'id_venda')) AS id_venda, v.*
+                    FROM (VALUES %s) AS v(pos, data, quantidade, id_ingresso, id_comprador)
+                ), inseridas AS (
+                    INSERT INTO Venda (id_venda, data, quantidade, id_ingresso, id_comprador)
+                    SELECT id_venda, data, quantidade, id_ingresso, id_comprador
+                    FROM entrada
+                    RETURNING id_venda
+                )
+                SELECT e.pos, e.id_venda
+                FROM entrada e
+                JOIN inseridas i ON i.id_venda = e.id_venda;
+            """
+            template = "(%s, %s::date, %s::int, %s::int, %s::int)"
+            for inicio in range(0, len(validas), tamanho_lote):
+                bloco = validas[inicio:inicio + tamanho_lote]
+                linhas = [(pos,) + tuple(vendas[pos]) for pos in bloco]
+                novos = execute_values(cur, sql, linhas, template=template,
+                                       page_size=len(linhas), fetch=True)
+                for pos, id_venda in novos:
+                    ids[pos] = id_venda
+        conn.commit()
+
+    for pos in validas:
+        disponibilidade.registrar_venda(vendas[pos][2])
+    if validas:
+        metricas.registrar_vendas(len(validas), sum(vendas[pos][1] for pos in validas))
+
+    falhas.sort()
+    return ResultadoLoteVendas(ids, falhas)
+
 def read_vendas_por_comprador(id_comprador: int) -> List[Tuple]:
     """
     Retorna o histórico de vendas de um comprador específico.
@@ -49,12 +183,12 @@ def read_vendas_por_comprador(id_comprador: int) -> List[Tuple]:
         FROM Venda v
         JOIN Ingresso i ON v.id_ingresso = i.id_ingresso
         JOIN Evento e ON i.id_evento = e.id_evento
-        WHERE v.id_comprador = %s
+        WHERE v.id_comprador = $1
         ORDER BY v.data DESC;
     """
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql, (id_comprador,))
+            executar_preparado(cur, "vendas_por_comprador", sql, (id_comprador,))
             return cur.fetchall()
 
 def read_vendas_por_evento(id_evento: int) -> List[Tuple]:
@@ -75,14 +209,237 @@ def read_vendas_por_evento(id_evento: int) -> List[Tuple]:
         FROM Venda v
         JOIN Ingresso i ON v.id_ingresso = i.id_ingresso
         JOIN Comprador c ON v.id_comprador = c.id_comprador
-        WHERE i.id_evento = %s
+        WHERE v.id_evento = $1
         ORDER BY v.data;
     """
     with get_conn() as conn:
         with conn.cursor() as cur:
+            executar_preparado(cur, "vendas_por_evento", sql, (id_evento,))
+            return cur.fetchall()
+
+# --- Leituras paginadas (keyset) e em streaming ---
+#
+# As variantes paginadas recebem o "cursor" da página anterior em 'apos':
+# a tupla (data, id_venda) da última linha recebida, ou seja,
+# (ultima[1], ultima[0]). Cada página custa o mesmo, qualquer que seja a
+# posição no histórico (não há OFFSET): as vendas são lidas já na ordem
+# dos índices (id_comprador, data, id_venda) e (id_evento, data, id_venda),
+# este último sobre a cópia do id_evento do ingresso guardada em Venda.
+
+_SQL_VENDAS_COMPRADOR = """
+    SELECT 
+        v.id_venda, 
+        v.data, 
+        e.nome AS nome_evento, 
+        i.preco,
+        v.quantidade,
+        (i.preco * v.quantidade) AS total
+    FROM Venda v
+    JOIN Ingresso i ON v.id_ingresso = i.id_ingresso
+    JOIN Evento e ON i.id_evento = e.id_evento
+    WHERE v.id_comprador = {comprador} {filtro}
+    ORDER BY v.data DESC, v.id_venda DESC
+    {limite};
+"""
+
+_SQL_VENDAS_EVENTO = """
+    SELECT 
+        v.id_venda, 
+        v.data, 
+        c.nome AS nome_comprador, 
+        c.email AS email_comprador,
+        i.id_ingresso,
+        i.preco,
+        v.quantidade
+    FROM Venda v
+    JOIN Ingresso i ON v.id_ingresso = i.id_ingresso
+    JOIN Comprador c ON v.id_comprador = c.id_comprador
+    WHERE v.id_evento = {evento} {filtro}
+    ORDER BY v.data, v.id_venda
+    {limite};
+"""
+
+def read_vendas_por_comprador_paginado(id_comprador: int,
+                                       apos: Optional[Tuple[date, int]] = None,
+                                       limite: int = TAMANHO_PAGINA) -> List[Tuple]:
+    """
+    Página do histórico de um comprador (mesmas colunas de
+    read_vendas_por_comprador), da venda mais recente para a mais antiga.
+    """
+    if limite <= 0:
+        raise ValueError("Limite deve ser um número positivo.")
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            if apos is None:
+                sql = _SQL_VENDAS_COMPRADOR.format(comprador="$1", filtro="", limite="LIMIT $2")
+                executar_preparado(cur, "vendas_por_comprador_inicio", sql,
+                                   (id_comprador, limite))
+            else:
+                sql = _SQL_VENDAS_COMPRADOR.format(
+                    comprador="$1", filtro="AND (v.data, v.id_venda) < ($2, $3)",
+                    limite="LIMIT $4")
+                executar_preparado(cur, "vendas_por_comprador_pagina", sql,
+                                   (id_comprador, apos[0], apos[1], limite))
+            return cur.fetchall()
+
+def read_vendas_por_evento_paginado(id_evento: int,
+                                    apos: Optional[Tuple[date, int]] = None,
+                                    limite: int = TAMANHO_PAGINA) -> List[Tuple]:
+    """
+    Página das vendas de um evento (mesmas colunas de
+    read_vendas_por_evento), em ordem crescente de (data, id_venda).
+    """
+    if limite <= 0:
+        raise ValueError("Limite deve ser um número positivo.")
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            if apos is None:
+                sql = _SQL_VENDAS_EVENTO.format(evento="$1", filtro="", limite="LIMIT $2")
+                executar_preparado(cur, "vendas_por_evento_inicio", sql,
+                                   (id_evento, limite))
+            else:
+                sql = _SQL_VENDAS_EVENTO.format(
+                    evento="$1", filtro="AND (v.data, v.id_venda) > ($2, $3)",
+                    limite="LIMIT $4")
+                executar_preparado(cur, "vendas_por_evento_pagina", sql,
+                                   (id_evento, apos[0], apos[1], limite))
+            return cur.fetchall()
+
+def stream_vendas_por_evento(id_evento: int,
+                             itersize: int = ITERSIZE_PADRAO) -> Iterator[Tuple]:
+    """
+    Percorre todas as vendas de um evento sem carregá-las de uma vez:
+    usa um cursor nomeado (server-side) que traz 'itersize' linhas por vez.
+    A conexão fica emprestada até o gerador terminar (ou ser fechado).
+    """
+    if itersize <= 0:
+        raise ValueError("itersize deve ser um número positivo.")
+    sql = _SQL_VENDAS_EVENTO.format(evento="%s", filtro="", limite="")
+    with get_conn() as conn:
+        with conn.cursor(name=f"vendas_evento_{uuid.uuid4().hex}") as cur:
+            cur.itersize = itersize
             cur.execute(sql, (id_evento,))
+            yield from cur
+
+def stream_vendas_por_comprador(id_comprador: int,
+                                itersize: int = ITERSIZE_PADRAO) -> Iterator[Tuple]:
+    """
+    Percorre todo o histórico de um comprador com um cursor nomeado
+    (server-side), trazendo 'itersize' linhas por vez.
+    """
+    if itersize <= 0:
+        raise ValueError("itersize deve ser um número positivo.")
+    sql = _SQL_VENDAS_COMPRADOR.format(comprador="%s", filtro="", limite="")
+    with get_conn() as conn:
+        with conn.cursor(name=f"vendas_comprador_{uuid.uuid4().hex}") as cur:
+            cur.itersize = itersize
+            cur.execute(sql, (id_comprador,))
+            yield from cur
+
+# --- Resumo de vendas por evento (tabela Evento_Vendas_Resumo) ---
+#
+# A tabela é mantida pelos triggers de Venda/Ingresso (ver schema.sql),
+# então create_venda, create_vendas_batch, update_venda e delete_venda já
+# a atualizam na mesma transação, e também barram vendas acima da
+# capacidade do local. Cada evento tem até 8 linhas (fatias),
+# somadas nas leituras abaixo, que não varrem as vendas. A data da última
+# venda vem de idx_venda_evento_data (MAX(data) do evento, uma descida no
+# índice), para que remover uma venda só mexa na fatia da sessão.
+
+def read_resumo_evento(id_evento: int) -> Tuple:
+    """
+    Retorna (ingressos_vendidos, receita_bruta, ultima_venda) de um evento.
+    Eventos sem nenhuma venda retornam (0, 0, None).
+    """
+    sql = """
+        SELECT COALESCE(SUM(ingressos_vendidos), 0),
+               COALESCE(SUM(receita_bruta), 0),
+               (SELECT MAX(data) FROM Venda WHERE id_evento = $1)
+        FROM Evento_Vendas_Resumo
+        WHERE id_evento = $1;
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "resumo_evento", sql, (id_evento,))
+            return cur.fetchone()
+
+def read_resumo_eventos() -> List[Tuple]:
+    """
+    Retorna o resumo de todos os eventos, ordenado por data do evento:
+    (id_evento, nome, data, ingressos_vendidos, receita_bruta, ultima_venda).
+    """
+    sql = """
+        SELECT 
+            e.id_evento, 
+            e.nome, 
+            e.data,
+            COALESCE(r.ingressos_vendidos, 0),
+            COALESCE(r.receita_bruta, 0),
+            (SELECT MAX(v.data) FROM Venda v WHERE v.id_evento = e.id_evento)
+        FROM Evento e
+        LEFT JOIN (
+            SELECT id_evento,
+                   SUM(ingressos_vendidos) AS ingressos_vendidos,
+                   SUM(receita_bruta) AS receita_bruta
+            FROM Evento_Vendas_Resumo
+            GROUP BY id_evento
+        ) r ON r.id_evento = e.id_evento
+        ORDER BY e.data, e.id_evento;
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "resumo_eventos", sql)
             return cur.fetchall()
 
+def reconciliar_resumo_vendas() -> int:
+    """
+    Reconstrói Evento_Vendas_Resumo do zero a partir de Venda/Ingresso
+    (ex: depois de uma carga feita com os triggers desabilitados; é o que
+    migracao_dados.sql roda para preencher o resumo de um banco existente).
+    Retorna o número de eventos com vendas.
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT resumo_vendas_reconstruir();")
+            eventos = cur.fetchone()[0]
+        conn.commit()
+    return eventos
+
+# --- Leitura por chave ---
+
+def get_venda(id_venda: int) -> Optional[Tuple]:
+    """
+    Retorna a venda (id_venda, data, quantidade, id_ingresso, id_comprador)
+    com esse ID, ou None se não existir.
+    """
+    sql = "SELECT id_venda, data, quantidade, id_ingresso, id_comprador FROM Venda WHERE id_venda = $1;"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "venda_por_id", sql, (id_venda,))
+            return cur.fetchone()
+
+def get_venda_many(ids: Iterable[int]) -> Dict[int, Tuple]:
+    """
+    Retorna {id_venda: linha} das vendas com esses IDs, em uma única consulta
+    (mesmas colunas de get_venda). IDs inexistentes ficam de fora.
+    """
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    sql = "SELECT id_venda, data, quantidade, id_ingresso, id_comprador FROM Venda WHERE id_venda = ANY($1::int[]);"
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "vendas_por_ids", sql, (ids,))
+            return {row[0]: row for row in cur.fetchall()}
+
+def existe_venda(id_venda: int) -> bool:
+    """Indica se existe uma venda com esse ID."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            executar_preparado(cur, "venda_existe",
+                               "SELECT EXISTS (SELECT 1 FROM Venda WHERE id_venda = $1);", (id_venda,))
+            return cur.fetchone()[0]
+
 def update_venda(id_venda: int, 
                  data: Optional[date] = None, 
                  quantidade: Optional[int] = None,
@@ -91,6 +448,9 @@ def update_venda(id_venda: int,
     """
     Atualiza dados de uma venda (ex: corrigir quantidade ou data).
     Retorna o número de linhas afetadas.
+
+    Nota: As mesmas regras de create_venda valem aqui (capacidade do local
+    e assento marcado vendido uma única vez), conferidas pelo banco.
     """
     updates = []
     params = []
@@ -121,6 +481,9 @@ def update_venda(id_venda: int,
             cur.execute(sql, params)
             rows = cur.rowcount
         conn.commit()
+    if rows and id_ingresso is not None:
+        # A venda mudou de ingresso: os mapas de assentos precisam ser recarregados
+        disponibilidade.invalidar_evento()
     return rows
 
 def delete_venda(id_venda: int) -> int:
@@ -130,7 +493,12 @@ def delete_venda(id_venda: int) -> int:
     """
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("DELETE FROM Venda WHERE id_venda = %s;", (id_venda,))
+            executar_preparado(cur, "venda_deletar",
+                               "DELETE FROM Venda WHERE id_venda = $1 RETURNING id_ingresso;",
+                               (id_venda,))
+            removidas = cur.fetchall()
             rows = cur.rowcount
         conn.commit()
+    for (id_ingresso,) in removidas:
+        disponibilidade.registrar_cancelamento(id_ingresso)
     return rows
\ No newline at end of file
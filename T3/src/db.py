@@ -1,12 +1,28 @@
 # arquivo: prototipo_tikevents.py
 # Requisitos: pip install psycopg2-binary
 
-import psycopg2
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import List, Tuple, Optional
 
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import PoolError
+
+import instrumentacao
+
 # Configuração da conexão
 DSN = "dbname=tikevents user=dev password=devpass host=localhost port=5432"
 
+# Configuração do pool de conexões
+POOL_MIN = 1            # Conexões abertas assim que o pool é criado
+POOL_MAX = 10           # Limite de conexões simultâneas com o banco
+POOL_ESPERA = 5.0       # Segundos que get_conn() espera por uma conexão livre
+POOL_VERIFICAR_APOS = 30.0  # Conexões ociosas há mais tempo são testadas com SELECT 1
+
 # DDL para criar tabela se não existir
 DDL = """
 CREATE TABLE IF NOT EXISTS Artista (
@@ -16,6 +32,472 @@ CREATE TABLE IF NOT EXISTS Artista (
 );
 """
 
+
+class ConexaoTikEvents(psycopg2.extensions.connection):
+    """
+    Conexão que guarda os nomes dos comandos já preparados (PREPARE) nela.
+    Seus cursores passam pela instrumentação (instrumentacao.py).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.preparados = set()
+        self.cursor_factory = instrumentacao.CursorInstrumentado
+
+
+class PoolConexoes:
+    """
+    Pool de conexões thread-safe com tamanho mínimo/máximo.
+
+    - adquirir() reaproveita uma conexão livre; se todas estiverem em uso
+      e o limite foi atingido, espera no máximo 'espera' segundos e então
+      lança PoolError.
+    - Conexões ociosas há mais de 'verificar_apos' segundos passam por um
+      teste (SELECT 1) antes de serem entregues; conexões quebradas são
+      descartadas e substituídas.
+    """
+
+    def __init__(self, dsn: str, minimo: int = POOL_MIN, maximo: int = POOL_MAX,
+                 espera: float = POOL_ESPERA,
+                 verificar_apos: float = POOL_VERIFICAR_APOS):
+        if minimo < 0 or maximo < 1 or minimo > maximo:
+            raise ValueError("Tamanho do pool inválido (0 <= minimo <= maximo, maximo >= 1).")
+        self.dsn = dsn
+        self.minimo = minimo
+        self.maximo = maximo
+        self.espera = espera
+        self.verificar_apos = verificar_apos
+
+        self._cond = threading.Condition()
+        self._livres = deque()   # (conexao, instante em que foi devolvida)
+        self._total = 0          # conexões abertas (livres + em uso)
+        self._fechado = False
+        self._stats = {
+            "criadas": 0,
+            "descartadas": 0,
+            "checkouts": 0,
+            "esperas": 0,
+            "timeouts": 0,
+        }
+
+        for _ in range(minimo):
+            self._livres.append((self._conectar(), time.monotonic()))
+            self._total += 1
+
+    def _conectar(self):
+        conn = psycopg2.connect(self.dsn, connection_factory=ConexaoTikEvents)
+        with self._cond:
+            self._stats["criadas"] += 1
+        return conn
+
+    def _saudavel(self, conn, ociosa_desde: float) -> bool:
+        """Verifica se a conexão ainda pode ser usada."""
+        if conn.closed:
+            return False
+        if time.monotonic() - ociosa_desde < self.verificar_apos:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _descartar(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        self._stats["descartadas"] += 1
+
+    def adquirir(self, timeout: Optional[float] = None):
+        """Retira uma conexão do pool (esperando até 'timeout' segundos)."""
+        limite = time.monotonic() + (self.espera if timeout is None else timeout)
+        with self._cond:
+            esperou = False
+            while True:
+                if self._fechado:
+                    raise PoolError("O pool de conexões foi fechado.")
+                if self._livres:
+                    conn, ociosa_desde = self._livres.pop()
+                    break
+                if self._total < self.maximo:
+                    # Reserva a vaga antes de abrir a conexão fora do lock
+                    self._total += 1
+                    conn = None
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolError(
+                        f"Nenhuma conexão livre após {self.espera if timeout is None else timeout}s "
+                        f"(máximo de {self.maximo} conexões em uso)."
+                    )
+                if not esperou:
+                    self._stats["esperas"] += 1
+                    esperou = True
+                self._cond.wait(restante)
+
+        if conn is None:
+            try:
+                conn = self._conectar()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+        elif not self._saudavel(conn, ociosa_desde):
+            with self._cond:
+                self._descartar(conn)
+            try:
+                conn = self._conectar()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+
+        with self._cond:
+            self._stats["checkouts"] += 1
+        return conn
+
+    def devolver(self, conn, descartar: bool = False):
+        """Devolve uma conexão ao pool, desfazendo transações pendentes."""
+        if not descartar and not conn.closed:
+            status = conn.info.transaction_status
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                descartar = True
+            elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    descartar = True
+        descartar = descartar or conn.closed
+
+        with self._cond:
+            if descartar or self._fechado:
+                self._descartar(conn)
+                self._total -= 1
+            else:
+                self._livres.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def estatisticas(self) -> dict:
+        """Retorna um retrato do uso do pool."""
+        with self._cond:
+            livres = len(self._livres)
+            return {
+                "minimo": self.minimo,
+                "maximo": self.maximo,
+                "abertas": self._total,
+                "livres": livres,
+                "em_uso": self._total - livres,
+                **self._stats,
+            }
+
+    def fechar(self):
+        """Fecha todas as conexões livres; as em uso são fechadas ao voltar."""
+        with self._cond:
+            self._fechado = True
+            while self._livres:
+                conn, _ = self._livres.pop()
+                self._descartar(conn)
+                self._total -= 1
+            self._cond.notify_all()
+
+
+_pool: Optional[PoolConexoes] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> PoolConexoes:
+    """Retorna o pool global, criando-o na primeira chamada."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolConexoes(DSN)
+    return _pool
+
+def configurar_pool(minimo: int = POOL_MIN, maximo: int = POOL_MAX,
+                    espera: float = POOL_ESPERA,
+                    verificar_apos: float = POOL_VERIFICAR_APOS,
+                    dsn: Optional[str] = None) -> PoolConexoes:
+    """(Re)cria o pool global com outros parâmetros."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.fechar()
+        _pool = PoolConexoes(dsn or DSN, minimo, maximo, espera, verificar_apos)
+    return _pool
+
+def estatisticas_pool() -> dict:
+    """Retorna as estatísticas do pool global."""
+    return get_pool().estatisticas()
+
+def pool_aberto() -> bool:
+    """Indica se o pool global já foi criado (sem criá-lo)."""
+    return _pool is not None
+
+def fechar_pool():
+    """Fecha o pool global (ex: ao encerrar a aplicação)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.fechar()
+            _pool = None
+
+# --- Registro de comandos preparados ---
+
+class RegistroComandos:
+    """
+    Registro de comandos SQL nomeados.
+
+    Cada comando é preparado (PREPARE) uma única vez por conexão do pool;
+    as chamadas seguintes apenas executam (EXECUTE) o plano já preparado.
+    O SQL usa os parâmetros posicionais do PostgreSQL ($1, $2, ...).
+    """
+
+    def __init__(self):
+        self._comandos = {}
+        self._lock = threading.Lock()
+        self.acertos = 0   # EXECUTE de um comando já preparado na conexão
+        self.faltas = 0    # PREPARE necessário (primeiro uso na conexão)
+
+    def executar(self, cur, nome: str, sql: str, params: Tuple = ()):
+        """Prepara 'sql' como 'nome' na conexão do cursor (se preciso) e o executa."""
+        with self._lock:
+            registrado = self._comandos.setdefault(nome, sql)
+        if registrado != sql:
+            raise ValueError(f"Comando '{nome}' já registrado com outro SQL.")
+
+        conn = cur.connection
+        preparados = conn.preparados
+        if nome in preparados:
+            with self._lock:
+                self.acertos += 1
+        else:
+            cur.execute(f"PREPARE {nome} AS {sql}")
+            preparados.add(nome)
+            with self._lock:
+                self.faltas += 1
+
+        if params:
+            marcadores = ", ".join(["%s"] * len(params))
+            cur.execute(f"EXECUTE {nome} ({marcadores});", tuple(params))
+        else:
+            cur.execute(f"EXECUTE {nome};")
+
+    def sql(self, nome: str) -> Optional[str]:
+        """SQL registrado para o comando 'nome' (ou None)."""
+        with self._lock:
+            return self._comandos.get(nome)
+
+    def estatisticas(self) -> dict:
+        """Retorna os contadores de acertos/faltas do registro."""
+        with self._lock:
+            total = self.acertos + self.faltas
+            return {
+                "comandos": len(self._comandos),
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "taxa_acerto": (self.acertos / total) if total else 0.0,
+            }
+
+
+comandos = RegistroComandos()
+
+def executar_preparado(cur, nome: str, sql: str, params: Tuple = ()):
+    """Atalho para comandos.executar(); veja RegistroComandos."""
+    comandos.executar(cur, nome, sql, params)
+
+def estatisticas_preparados() -> dict:
+    """Retorna os contadores do registro de comandos preparados."""
+    return comandos.estatisticas()
+
+
+# --- Unidade de trabalho (várias chamadas CRUD em uma só transação) ---
+
+# Transações encerradas por get_conn()/transacao() (commit ou rollback)
+_transacoes = {"commits": 0, "rollbacks": 0}
+_transacoes_lock = threading.Lock()
+
+def _contar_transacao(resultado: str):
+    with _transacoes_lock:
+        _transacoes[resultado] += 1
+
+def estatisticas_transacoes() -> dict:
+    """Retorna quantas transações foram confirmadas e desfeitas."""
+    with _transacoes_lock:
+        return dict(_transacoes)
+
+ISOLAMENTOS = ("READ COMMITTED", "REPEATABLE READ", "SERIALIZABLE")
+
+class _ConexaoCompartilhada:
+    """
+    Conexão entregue por get_conn() dentro de uma unidade de trabalho.
+    Repassa tudo para a conexão real, mas ignora commit()/rollback():
+    quem confirma ou desfaz é o bloco 'with transacao()'.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class Transacao:
+    """Unidade de trabalho: uma conexão e uma transação para vários CRUDs."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.conexao_compartilhada = _ConexaoCompartilhada(conn)
+        self._apos_commit = []
+
+    def apos_commit(self, funcao):
+        """Agenda 'funcao' para rodar depois do commit (descartada no rollback)."""
+        self._apos_commit.append(funcao)
+
+
+_transacao_atual: ContextVar[Optional[Transacao]] = ContextVar(
+    "tikevents_transacao", default=None
+)
+
+def transacao_atual() -> Optional[Transacao]:
+    """Retorna a unidade de trabalho ativa no contexto atual (ou None)."""
+    return _transacao_atual.get()
+
+def ao_confirmar(funcao):
+    """
+    Executa 'funcao' quando os dados gravados estiverem confirmados: logo
+    após o commit da unidade de trabalho atual ou, fora de uma, na hora.
+    Usado para atualizar caches em memória só depois do commit.
+    """
+    atual = _transacao_atual.get()
+    if atual is None:
+        funcao()
+    else:
+        atual.apos_commit(funcao)
+
+@contextmanager
+def transacao(isolamento: Optional[str] = None, somente_leitura: bool = False,
+              snapshot: Optional[str] = None):
+    """
+    Abre uma unidade de trabalho.
+
+    Todas as funções crud_* chamadas dentro do bloco usam a mesma conexão
+    e a mesma transação, confirmada uma única vez ao final (ou desfeita
+    se o bloco lançar exceção). Exemplo:
+
+        with db.transacao():
+            id_comprador = crud_comprador.create_comprador(nome, email)
+            crud_venda.create_venda(hoje, 1, id_ingresso, id_comprador)
+
+    Blocos aninhados reaproveitam a transação mais externa.
+
+    Com 'snapshot' (id retornado por exportar_snapshot() em outra
+    transação ainda aberta), a transação enxerga exatamente os mesmos
+    dados daquela; exige REPEATABLE READ ou SERIALIZABLE (o padrão passa
+    a ser REPEATABLE READ).
+    """
+    atual = _transacao_atual.get()
+    if atual is not None:
+        if snapshot is not None:
+            raise ValueError("Não é possível importar um snapshot em uma transação já aberta.")
+        yield atual
+        return
+
+    if snapshot is not None and isolamento is None:
+        isolamento = "REPEATABLE READ"
+    if isolamento is not None and isolamento.upper() not in ISOLAMENTOS:
+        raise ValueError(f"Nível de isolamento inválido: {isolamento}")
+    if snapshot is not None and isolamento.upper() == "READ COMMITTED":
+        raise ValueError("Importar um snapshot exige REPEATABLE READ ou SERIALIZABLE.")
+
+    pool = get_pool()
+    conn = pool.adquirir()
+    uow = Transacao(conn)
+    token = _transacao_atual.set(uow)
+    descartar = False
+    try:
+        if isolamento is not None or somente_leitura:
+            modos = []
+            if isolamento is not None:
+                modos.append(f"ISOLATION LEVEL {isolamento.upper()}")
+            if somente_leitura:
+                modos.append("READ ONLY")
+            with conn.cursor() as cur:
+                cur.execute(f"SET TRANSACTION {', '.join(modos)};")
+                if snapshot is not None:
+                    cur.execute("SET TRANSACTION SNAPSHOT %s;", (snapshot,))
+        yield uow
+        conn.commit()
+        _contar_transacao("commits")
+    except BaseException:
+        _contar_transacao("rollbacks")
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                descartar = True
+        raise
+    finally:
+        _transacao_atual.reset(token)
+        pool.devolver(conn, descartar)
+
+    for funcao in uow._apos_commit:
+        funcao()
+
+def exportar_snapshot() -> str:
+    """
+    Exporta o snapshot da unidade de trabalho atual (pg_export_snapshot)
+    para que outras conexões leiam os mesmos dados com
+    transacao(snapshot=...). O id vale enquanto esta transação estiver aberta.
+    """
+    atual = _transacao_atual.get()
+    if atual is None:
+        raise ValueError("exportar_snapshot() precisa de uma transação aberta (db.transacao).")
+    with atual.conn.cursor() as cur:
+        cur.execute("SELECT pg_export_snapshot();")
+        return cur.fetchone()[0]
+
+@contextmanager
 def get_conn():
-    """Retorna uma nova conexão com o banco de dados."""
-    return psycopg2.connect(DSN)
\ No newline at end of file
+    """
+    Empresta uma conexão do pool.
+
+    Uso: 'with get_conn() as conn:'. Ao sair do bloco a transação é
+    confirmada (ou desfeita, em caso de exceção) e a conexão volta ao pool.
+    Dentro de 'with transacao()' a conexão da unidade de trabalho é
+    reaproveitada e o commit fica para o final da transação.
+    """
+    atual = _transacao_atual.get()
+    if atual is not None:
+        yield atual.conexao_compartilhada
+        return
+
+    pool = get_pool()
+    conn = pool.adquirir()
+    descartar = False
+    try:
+        yield conn
+        if not conn.closed:
+            conn.commit()
+        _contar_transacao("commits")
+    except Exception:
+        _contar_transacao("rollbacks")
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                descartar = True
+        raise
+    finally:
+        pool.devolver(conn, descartar)
@@ -0,0 +1,304 @@
+# arquivo: disponibilidade.py
+# Mapa de disponibilidade de assentos por evento/setor, em bitmaps
+
+import re
+import time
+import threading
+from typing import List, Tuple, Optional, Dict, Iterable
+
+import db
+from db import get_conn
+
+# Segundos até um mapa ser recarregado do banco (vendas feitas por outros
+# processos e mudanças de layout só aparecem depois disso)
+TTL_MAPA = 60.0
+# Duração padrão de uma reserva temporária de assentos
+TEMPO_RESERVA = 300.0
+
+_NUMERO = re.compile(r"(\d+)")
+
+def chave_assento(fileira: str, numero: str) -> Tuple:
+    """
+    Chave de ordenação "natural" de um assento: 'A2' vem antes de 'A10'.
+    Fileira e número são VARCHAR no banco, então a ordem do ORDER BY
+    (alfabética) não serve para saber quais assentos são vizinhos.
+    """
+    def natural(texto: str) -> Tuple:
+        return tuple(int(p) if p.isdigit() else p for p in _NUMERO.split(texto) if p)
+    return (natural(fileira), natural(numero))
+
+
+class MapaSetor:
+    """
+    Situação dos assentos de um setor para um evento.
+
+    Cada assento ocupa uma posição (bit) fixa, na ordem natural de
+    (fileira, numero). Três bitmaps (inteiros Python) guardam:
+      - a_venda:    o assento tem ingresso para o evento
+      - vendidos:   o ingresso do assento já foi vendido
+      - reservados: reserva temporária feita neste processo
+    Livres = a_venda & ~vendidos & ~reservados.
+    """
+
+    def __init__(self, id_evento: int, id_setor: int,
+                 assentos: List[Tuple[int, str, str, Optional[int], bool]]):
+        self.id_evento = id_evento
+        self.id_setor = id_setor
+
+        assentos = sorted(assentos, key=lambda a: chave_assento(a[1], a[2]))
+        # (id_assento, fileira, numero) por posição
+        self.assentos = [(a[0], a[1], a[2]) for a in assentos]
+        self.ingressos: List[Optional[int]] = [a[3] for a in assentos]
+        self.posicao: Dict[int, int] = {a[0]: pos for pos, a in enumerate(assentos)}
+        self.posicao_ingresso: Dict[int, int] = {
+            a[3]: pos for pos, a in enumerate(assentos) if a[3] is not None
+        }
+
+        self.a_venda = 0
+        self.vendidos = 0
+        for pos, a in enumerate(assentos):
+            if a[3] is not None:
+                self.a_venda |= 1 << pos
+            if a[4]:
+                self.vendidos |= 1 << pos
+
+        # Índice de fileiras: (fileira, primeira posição, posição final exclusiva).
+        # 'contiguos' tem o bit i ligado quando os assentos i e i+1 são vizinhos
+        # de verdade (mesma fileira, números consecutivos).
+        self.fileiras: List[Tuple[str, int, int]] = []
+        self.contiguos = 0
+        for pos, (_, fileira, numero) in enumerate(self.assentos):
+            if not self.fileiras or self.fileiras[-1][0] != fileira:
+                self.fileiras.append((fileira, pos, pos + 1))
+            else:
+                self.fileiras[-1] = (fileira, self.fileiras[-1][1], pos + 1)
+                anterior = self.assentos[pos - 1][2]
+                if anterior.isdigit() and numero.isdigit() and int(numero) == int(anterior) + 1:
+                    self.contiguos |= 1 << (pos - 1)
+
+        self._reservas: Dict[int, float] = {}  # posição -> instante de expiração
+        self._lock = threading.Lock()
+
+    # --- Reservas temporárias ---
+
+    def _reservados(self) -> int:
+        agora = time.monotonic()
+        expiradas = [pos for pos, fim in self._reservas.items() if fim <= agora]
+        for pos in expiradas:
+            del self._reservas[pos]
+        mascara = 0
+        for pos in self._reservas:
+            mascara |= 1 << pos
+        return mascara
+
+    def reservar(self, ids_assento: Iterable[int], segundos: float = TEMPO_RESERVA) -> bool:
+        """
+        Reserva os assentos (todos ou nenhum) se estiverem livres.
+        Retorna False se algum deles não estiver livre.
+        """
+        posicoes = [self.posicao[i] for i in ids_assento]
+        with self._lock:
+            livres = self._livres()
+            if any(not (livres >> pos) & 1 for pos in posicoes):
+                return False
+            fim = time.monotonic() + segundos
+            for pos in posicoes:
+                self._reservas[pos] = fim
+            return True
+
+    def liberar(self, ids_assento: Iterable[int]):
+        """Desfaz a reserva temporária dos assentos."""
+        with self._lock:
+            for i in ids_assento:
+                self._reservas.pop(self.posicao[i], None)
+
+    # --- Atualização por vendas ---
+
+    def marcar_vendido(self, id_ingresso: int, vendido: bool = True) -> bool:
+        """Atualiza o bit de vendido do assento do ingresso. False se não for deste mapa."""
+        pos = self.posicao_ingresso.get(id_ingresso)
+        if pos is None:
+            return False
+        with self._lock:
+            if vendido:
+                self.vendidos |= 1 << pos
+            else:
+                self.vendidos &= ~(1 << pos)
+            self._reservas.pop(pos, None)
+        return True
+
+    # --- Consultas ---
+
+    def _livres(self) -> int:
+        return self.a_venda & ~self.vendidos & ~self._reservados()
+
+    def livres(self) -> int:
+        """Bitmap dos assentos livres (bit i = self.assentos[i])."""
+        with self._lock:
+            return self._livres()
+
+    def contagens(self) -> Dict[str, int]:
+        """Quantidades de assentos por situação."""
+        with self._lock:
+            reservados = self._reservados() & self.a_venda & ~self.vendidos
+            vendidos = self.vendidos
+            a_venda = self.a_venda
+        return {
+            "assentos": len(self.assentos),
+            "sem_ingresso": len(self.assentos) - a_venda.bit_count(),
+            "vendidos": vendidos.bit_count(),
+            "reservados": reservados.bit_count(),
+            "livres": (a_venda & ~vendidos & ~reservados).bit_count(),
+        }
+
+    def primeiros_livres(self, n: int) -> List[Tuple[int, str, str, int]]:
+        """Os N primeiros assentos livres: (id_assento, fileira, numero, id_ingresso)."""
+        livres = self.livres()
+        resultado = []
+        while livres and len(resultado) < n:
+            pos = (livres & -livres).bit_length() - 1  # bit menos significativo
+            id_assento, fileira, numero = self.assentos[pos]
+            resultado.append((id_assento, fileira, numero, self.ingressos[pos]))
+            livres &= livres - 1
+        return resultado
+
+
+class ServicoDisponibilidade:
+    """
+    Cache dos MapaSetor de cada evento.
+
+    Um evento é carregado por inteiro (todos os setores do local) com uma
+    única consulta. Vendas e cancelamentos feitos por este processo
+    atualizam os bitmaps depois do commit; o resto (layout, vendas de
+    outros processos) é absorvido pelo recarregamento após 'ttl' segundos.
+    Reservas temporárias sobrevivem ao recarregamento.
+    """
+
+    def __init__(self, ttl: float = TTL_MAPA):
+        self.ttl = ttl
+        self._eventos: Dict[int, Tuple[float, Dict[int, MapaSetor]]] = {}
+        self._lock = threading.Lock()
+        self._carga_lock: Dict[int, threading.Lock] = {}
+        self.acertos = 0
+        self.faltas = 0
+
+    def _carregar_evento(self, id_evento: int) -> Dict[int, MapaSetor]:
+        sql = """
+            SELECT s.id_setor, a.id_assento, a.fileira, a.numero, i.id_ingresso,
+                   EXISTS (SELECT 1 FROM Venda v WHERE v.id_ingresso = i.id_ingresso)
+            FROM Evento e
+            JOIN Setor s ON s.id_local = e.id_local
+            JOIN Assento a ON a.id_setor = s.id_setor
+            LEFT JOIN Ingresso i ON i.id_evento = e.id_evento AND i.id_assento = a.id_assento
+            WHERE e.id_evento = $1;
+        """
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                db.executar_preparado(cur, "disponibilidade_evento", sql, (id_evento,))
+                linhas = cur.fetchall()
+
+        por_setor: Dict[int, list] = {}
+        for id_setor, id_assento, fileira, numero, id_ingresso, vendido in linhas:
+            por_setor.setdefault(id_setor, []).append(
+                (id_assento, fileira, numero, id_ingresso, vendido)
+            )
+        return {id_setor: MapaSetor(id_evento, id_setor, assentos)
+                for id_setor, assentos in por_setor.items()}
+
+    def _em_cache(self, id_evento: int) -> Optional[Dict[int, MapaSetor]]:
+        entrada = self._eventos.get(id_evento)
+        if entrada is not None and time.monotonic() - entrada[0] < self.ttl:
+            return entrada[1]
+        return None
+
+    def mapas_evento(self, id_evento: int) -> Dict[int, MapaSetor]:
+        """Retorna {id_setor: MapaSetor} do evento, carregando se preciso."""
+        with self._lock:
+            mapas = self._em_cache(id_evento)
+            if mapas is not None:
+                self.acertos += 1
+                return mapas
+            carga_lock = self._carga_lock.setdefault(id_evento, threading.Lock())
+
+        # Só uma thread carrega cada evento; as demais esperam o resultado
+        with carga_lock:
+            with self._lock:
+                mapas = self._em_cache(id_evento)
+                if mapas is not None:
+                    self.acertos += 1
+                    return mapas
+                anteriores = self._eventos.get(id_evento, (0.0, {}))[1]
+            novos = self._carregar_evento(id_evento)
+            for id_setor, mapa in novos.items():
+                antigo = anteriores.get(id_setor)
+                if antigo is not None:
+                    with antigo._lock:
+                        for pos, fim in antigo._reservas.items():
+                            nova_pos = mapa.posicao.get(antigo.assentos[pos][0])
+                            if nova_pos is not None:
+                                mapa._reservas[nova_pos] = fim
+            with self._lock:
+                self.faltas += 1
+                self._eventos[id_evento] = (time.monotonic(), novos)
+            return novos
+
+    def mapa(self, id_evento: int, id_setor: int) -> Optional[MapaSetor]:
+        """MapaSetor de um setor (None se o setor não for do local do evento)."""
+        return self.mapas_evento(id_evento).get(id_setor)
+
+    def marcar_vendido(self, id_ingresso: int, vendido: bool = True):
+        """Atualiza o mapa em cache que contém o ingresso (se houver)."""
+        with self._lock:
+            mapas = [m for _, setores in self._eventos.values() for m in setores.values()]
+        for mapa in mapas:
+            if mapa.marcar_vendido(id_ingresso, vendido):
+                break
+
+    def invalidar(self, id_evento: Optional[int] = None):
+        """Força o recarregamento dos mapas de um evento (ou de todos)."""
+        with self._lock:
+            for chave, (_, mapas) in list(self._eventos.items()):
+                if id_evento is None or chave == id_evento:
+                    # Mantém os mapas para preservar as reservas na recarga
+                    self._eventos[chave] = (float("-inf"), mapas)
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {"eventos": len(self._eventos), "acertos": self.acertos, "faltas": self.faltas}
+
+
+servico = ServicoDisponibilidade()
+
+# --- Atalhos usados pela UI e pelos módulos crud_* ---
+
+def contagens(id_evento: int, id_setor: Optional[int] = None) -> Dict[str, int]:
+    """
+    Quantidades (assentos, sem_ingresso, vendidos, reservados, livres) de um
+    setor, ou somadas para todos os setores do evento se 'id_setor' for None.
+    """
+    mapas = servico.mapas_evento(id_evento)
+    if id_setor is not None:
+        mapa = mapas.get(id_setor)
+        mapas = {id_setor: mapa} if mapa is not None else {}
+    total = {"assentos": 0, "sem_ingresso": 0, "vendidos": 0, "reservados": 0, "livres": 0}
+    for mapa in mapas.values():
+        for chave, valor in mapa.contagens().items():
+            total[chave] += valor
+    return total
+
+def primeiros_livres(id_evento: int, id_setor: int, n: int) -> List[Tuple[int, str, str, int]]:
+    """Os N primeiros assentos livres do setor: (id_assento, fileira, numero, id_ingresso)."""
+    mapa = servico.mapa(id_evento, id_setor)
+    return mapa.primeiros_livres(n) if mapa is not None else []
+
+def registrar_venda(id_ingresso: int):
+    """Marca o assento do ingresso como vendido depois do commit."""
+    db.ao_confirmar(lambda: servico.marcar_vendido(id_ingresso, True))
+
+def registrar_cancelamento(id_ingresso: int):
+    """Marca o assento do ingresso como livre de novo depois do commit."""
+    db.ao_confirmar(lambda: servico.marcar_vendido(id_ingresso, False))
+
+def invalidar_evento(id_evento: Optional[int] = None):
+    """Descarta (depois do commit) os mapas de um evento, ou todos."""
+    db.ao_confirmar(lambda: servico.invalidar(id_evento))
@@ -0,0 +1,265 @@
+# arquivo: importador_compradores.py
+# Importação em massa de compradores (CSV/JSONL) com upsert por email
+
+import io
+import os
+import re
+import csv
+import sys
+import json
+from typing import Dict, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from db import get_conn
+
+# Registros por transação (COPY + merge)
+TAMANHO_LOTE_IMPORTACAO = 10000
+# Limites das colunas de Comprador (VARCHAR(100))
+TAMANHO_MAX_NOME = 100
+TAMANHO_MAX_EMAIL = 100
+
+_EMAIL_VALIDO = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+# Formatos aceitos (uma linha por comprador):
+#   CSV com cabeçalho:  nome,email
+#   JSONL:              {"nome": "...", "email": "..."}
+#
+# O progresso é gravado em um arquivo de checkpoint (JSON) depois de cada
+# lote confirmado. Se a importação cair, rodar de novo com o mesmo
+# checkpoint pula os registros já importados. Um lote confirmado cujo
+# checkpoint não chegou a ser gravado é simplesmente importado de novo:
+# o merge é um upsert, então repetir um lote não duplica nada.
+
+
+class ResultadoImportacao(NamedTuple):
+    """
+    Totais de importar_compradores.
+    Os totais incluem a execução retomada do checkpoint; 'rejeitados' lista
+    (número da linha, motivo) só desta execução. 'ids' é o mapa email
+    normalizado -> id_comprador (vazio quando os ids vão para 'saida_ids').
+    """
+    lidos: int
+    inseridos: int
+    atualizados: int
+    inalterados: int
+    rejeitados: List[Tuple[int, str]]
+    ids: Dict[str, int]
+
+
+def normalizar_email(email: Optional[str]) -> str:
+    """Remove espaços e passa para minúsculas; lança ValueError se inválido."""
+    email = (email or "").strip().lower()
+    if not _EMAIL_VALIDO.match(email):
+        raise ValueError(f"Email inválido: '{email}'")
+    if len(email) > TAMANHO_MAX_EMAIL:
+        raise ValueError(f"Email maior que {TAMANHO_MAX_EMAIL} caracteres.")
+    return email
+
+def _normalizar_registro(registro) -> Tuple[str, str]:
+    """Valida um registro lido do arquivo e retorna (nome, email)."""
+    if not isinstance(registro, dict):
+        raise ValueError("Registro deve ter os campos 'nome' e 'email'.")
+    nome = " ".join(str(registro.get("nome") or "").split())
+    if not nome:
+        raise ValueError("Nome é obrigatório.")
+    if len(nome) > TAMANHO_MAX_NOME:
+        raise ValueError(f"Nome maior que {TAMANHO_MAX_NOME} caracteres.")
+    return nome, normalizar_email(registro.get("email"))
+
+def ler_registros(arquivo: TextIO, formato: str) -> Iterator[Tuple[int, object]]:
+    """
+    Lê o arquivo em streaming e gera (número da linha, registro).
+    Linhas JSONL que não são JSON válido geram o registro None (rejeitado).
+    """
+    if formato == "csv":
+        leitor = csv.DictReader(arquivo)
+        if not leitor.fieldnames or not {"nome", "email"} <= set(leitor.fieldnames):
+            raise ValueError("O CSV precisa de um cabeçalho com as colunas 'nome' e 'email'.")
+        for registro in leitor:
+            yield leitor.line_num, registro
+    elif formato == "jsonl":
+        for numero, linha in enumerate(arquivo, start=1):
+            if not linha.strip():
+                continue
+            try:
+                yield numero, json.loads(linha)
+            except ValueError:
+                yield numero, None
+    else:
+        raise ValueError(f"Formato desconhecido: {formato} (use 'csv' ou 'jsonl').")
+
+def _formato_do_arquivo(caminho: str) -> str:
+    """'csv' ou 'jsonl', pela extensão do arquivo."""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == ".csv":
+        return "csv"
+    if extensao in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Extensão não reconhecida: {caminho} (use .csv ou .jsonl).")
+
+# --- Checkpoint ---
+
+def _ler_checkpoint(caminho: Optional[str], arquivo: str) -> dict:
+    """Progresso salvo de uma importação anterior do mesmo arquivo."""
+    vazio = {"arquivo": arquivo, "registros": 0, "inseridos": 0,
+             "atualizados": 0, "inalterados": 0, "rejeitados": 0}
+    if caminho is None or not os.path.exists(caminho):
+        return vazio
+    with open(caminho, encoding="utf-8") as f:
+        estado = json.load(f)
+    if estado.get("arquivo") != arquivo:
+        raise ValueError(f"O checkpoint {caminho} é de outro arquivo: {estado.get('arquivo')}")
+    return {**vazio, **estado}
+
+def _gravar_checkpoint(caminho: Optional[str], estado: dict):
+    """Grava o checkpoint de forma atômica (arquivo temporário + rename)."""
+    if caminho is None:
+        return
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(estado, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+# --- Merge ---
+
+def _importar_lote(lote: Dict[str, str]) -> Tuple[Dict[str, int], int, int]:
+    """
+    Grava um lote {email: nome} em uma transação: COPY para uma tabela
+    temporária e merge em Comprador. Retorna (ids por email, inseridos, atualizados).
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for email, nome in lote.items():
+        escritor.writerow((nome, email))
+    buffer.seek(0)
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS importacao_comprador;")
+            cur.execute("""
+                CREATE TEMP TABLE importacao_comprador (
+                    nome VARCHAR(100) NOT NULL,
+                    email VARCHAR(100) NOT NULL
+                ) ON COMMIT DROP;
+            """)
+            cur.copy_expert(
+                "COPY importacao_comprador (nome, email) FROM STDIN WITH (FORMAT csv);",
+                buffer,
+            )
+            # O merge é pela chave lower(email) (índice único
+            # idx_comprador_email_lower): um email já cadastrado com outra
+            # capitalização é a mesma pessoa e mantém a grafia do cadastro.
+            # Linhas iguais ao cadastro não são regravadas (WHERE do DO UPDATE)
+            cur.execute("""
+                INSERT INTO Comprador (nome, email)
+                SELECT nome, email FROM importacao_comprador
+                ORDER BY email
+                ON CONFLICT ((lower(email))) DO UPDATE
+                SET nome = EXCLUDED.nome
+                WHERE Comprador.nome IS DISTINCT FROM EXCLUDED.nome
+                RETURNING (xmax = 0) AS inserido;
+            """)
+            gravados = [row[0] for row in cur.fetchall()]
+            cur.execute("""
+                SELECT i.email, c.id_comprador
+                FROM importacao_comprador i
+                JOIN Comprador c ON lower(c.email) = i.email;
+            """)
+            ids = dict(cur.fetchall())
+        conn.commit()
+    inseridos = sum(1 for inserido in gravados if inserido)
+    return ids, inseridos, len(gravados) - inseridos
+
+def importar_compradores(caminho: str,
+                         caminho_checkpoint: Optional[str] = None,
+                         tamanho_lote: int = TAMANHO_LOTE_IMPORTACAO,
+                         saida_ids: Optional[TextIO] = None) -> ResultadoImportacao:
+    """
+    Importa os compradores de um arquivo CSV ou JSONL (pela extensão).
+
+    Emails são normalizados (espaços, minúsculas) e repetidos dentro de um
+    lote ficam só com a última ocorrência. Cada lote é um upsert: email novo
+    cria o comprador, email existente atualiza o nome.
+
+    Com 'caminho_checkpoint', o progresso é salvo após cada lote e uma
+    execução anterior interrompida é retomada de onde parou; o checkpoint é
+    removido ao final. Com 'saida_ids', o mapa email -> id_comprador é
+    escrito nesse arquivo (CSV) em vez de ficar na memória.
+    """
+    if tamanho_lote <= 0:
+        raise ValueError("Tamanho do lote deve ser um número positivo.")
+    formato = _formato_do_arquivo(caminho)
+    estado = _ler_checkpoint(caminho_checkpoint, os.path.abspath(caminho))
+    pular = estado["registros"]
+    escritor_ids = csv.writer(saida_ids) if saida_ids is not None else None
+
+    ids: Dict[str, int] = {}
+    rejeitados: List[Tuple[int, str]] = []
+    lote: Dict[str, str] = {}
+    lidos = 0
+
+    def gravar_lote():
+        ids_lote, inseridos, atualizados = _importar_lote(lote)
+        if escritor_ids is not None:
+            escritor_ids.writerows(ids_lote.items())
+            saida_ids.flush()
+        else:
+            ids.update(ids_lote)
+        estado["registros"] = pular + lidos
+        estado["inseridos"] += inseridos
+        estado["atualizados"] += atualizados
+        estado["inalterados"] += len(lote) - inseridos - atualizados
+        _gravar_checkpoint(caminho_checkpoint, estado)
+        lote.clear()
+
+    with open(caminho, encoding="utf-8", newline="") as arquivo:
+        for indice, (linha, registro) in enumerate(ler_registros(arquivo, formato)):
+            if indice < pular:
+                continue
+            lidos += 1
+            try:
+                nome, email = _normalizar_registro(registro)
+            except ValueError as e:
+                rejeitados.append((linha, str(e)))
+                estado["rejeitados"] += 1
+                continue
+            lote.pop(email, None)  # a última ocorrência vence
+            lote[email] = nome
+            if len(lote) >= tamanho_lote:
+                gravar_lote()
+    if lote:
+        gravar_lote()
+    estado["registros"] = pular + lidos
+
+    if caminho_checkpoint is not None and os.path.exists(caminho_checkpoint):
+        os.remove(caminho_checkpoint)
+    return ResultadoImportacao(
+        lidos=estado["registros"],
+        inseridos=estado["inseridos"],
+        atualizados=estado["atualizados"],
+        inalterados=estado["inalterados"],
+        rejeitados=rejeitados,
+        ids=ids,
+    )
+
+# Uso: python importador_compradores.py <arquivo.csv|arquivo.jsonl> [checkpoint.json]
+# O mapa email -> id_comprador é gravado em <arquivo>.ids.csv
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print("Uso: python importador_compradores.py <arquivo.csv|arquivo.jsonl> [checkpoint.json]",
+              file=sys.stderr)
+        sys.exit(2)
+    caminho_arquivo = sys.argv[1]
+    checkpoint = sys.argv[2] if len(sys.argv) == 3 else caminho_arquivo + ".checkpoint.json"
+    # Em uma retomada, o mapa continua no mesmo arquivo (modo append)
+    modo = "a" if os.path.exists(checkpoint) else "w"
+    with open(caminho_arquivo + ".ids.csv", modo, encoding="utf-8", newline="") as saida:
+        resultado = importar_compradores(caminho_arquivo, checkpoint, saida_ids=saida)
+    print(f"Registros lidos: {resultado.lidos}")
+    print(f"Compradores inseridos: {resultado.inseridos}")
+    print(f"Compradores atualizados: {resultado.atualizados}")
+    print(f"Sem alteração: {resultado.inalterados}")
+    print(f"Rejeitados nesta execução: {len(resultado.rejeitados)}")
+    for linha, motivo in resultado.rejeitados[:20]:
+        print(f"  linha {linha}: {motivo}")
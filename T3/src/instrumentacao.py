@@ -0,0 +1,313 @@
+# arquivo: instrumentacao.py
+# Medição dos comandos SQL: contagens, linhas, latência, log de lentos e EXPLAIN
+
+import os
+import re
+import sys
+import time
+import random
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+import psycopg2.extensions
+
+# Limites (ms) dos baldes do histograma de latência; o último balde é +Inf
+BALDES_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Comandos acima deste tempo vão para o log de lentos
+LIMITE_LENTO_MS = 200.0
+# Fração dos SELECTs que recebem EXPLAIN (ANALYZE, BUFFERS); 0 desliga
+TAXA_EXPLAIN = 0.0
+# Quantos registros de lentos / planos ficam guardados em memória
+MAX_REGISTROS = 100
+# Tamanho máximo do SQL copiado para o log
+MAX_SQL_LOG = 500
+
+log_lentos = logging.getLogger("tikevents.sql")
+
+# Desligada, a instrumentação custa só a checagem desta flag por comando.
+# Também pode ser ligada na inicialização com TIKEVENTS_INSTRUMENTACAO=1.
+ativa = os.environ.get("TIKEVENTS_INSTRUMENTACAO", "") not in ("", "0")
+
+_RE_EXECUTE = re.compile(r"^\s*EXECUTE\s+(\w+)", re.IGNORECASE)
+_RE_PREPARE = re.compile(r"^\s*PREPARE\s+(\w+)", re.IGNORECASE)
+_RE_SOMENTE_LEITURA = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+_RE_ESCRITA = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|FOR\s+(NO\s+KEY\s+)?UPDATE|FOR\s+(KEY\s+)?SHARE|nextval|setval)\b",
+    re.IGNORECASE,
+)
+# Literais (strings e números) trocados por '?' no log de lentos: o SQL que
+# chega aqui pode já ter os valores embutidos (ex: VALUES de execute_values,
+# parâmetros %s interpolados pelo psycopg2)
+_RE_LITERAL = re.compile(r"(?:(?<!\w)[EeBbXxNn])?'(?:[^']|'')*'|(?<![\w$.])\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b")
+# Comandos que podem receber EXPLAIN ANALYZE (que executa o comando): só
+# leituras conhecidas, pelo nome do comando preparado ou 'modulo.funcao'
+# de quem chamou cur.execute(). Um SELECT pode chamar uma função que
+# escreve, então comandos fora desta lista nunca são explicados.
+EXPLICAVEIS = {
+    "artistas_listar", "artista_por_id", "artistas_por_ids", "artistas_buscar",
+    "assentos_por_setor", "assento_por_id", "assentos_por_ids",
+    "compradores_listar", "compradores_buscar", "comprador_por_email",
+    "comprador_por_id", "compradores_por_ids",
+    "eventos_listar", "eventos_por_local", "evento_por_id", "eventos_por_ids",
+    "artistas_por_evento", "eventos_por_artista",
+    "ingressos_por_evento", "ingresso_por_id", "ingressos_por_ids",
+    "locais_listar", "local_por_id", "locais_por_ids",
+    "setores_por_local", "setores_listar", "setor_por_id", "setores_por_ids",
+    "vendas_por_comprador", "vendas_por_evento",
+    "vendas_por_comprador_inicio", "vendas_por_comprador_pagina",
+    "vendas_por_evento_inicio", "vendas_por_evento_pagina",
+    "resumo_evento", "resumo_eventos", "venda_por_id", "vendas_por_ids",
+    "disponibilidade_evento",
+    "crud_evento.read_eventos_detalhados", "crud_evento.buscar_eventos",
+}
+# Frames ignorados ao descobrir quem chamou cur.execute()
+_MODULOS_INTERNOS = ("psycopg2", __name__)
+
+
+class EstatisticaComando:
+    """Contadores e histograma de latência de um comando."""
+
+    __slots__ = ("chamadas", "erros", "linhas", "tempo_total_ms", "tempo_max_ms", "baldes")
+
+    def __init__(self):
+        self.chamadas = 0
+        self.erros = 0
+        self.linhas = 0
+        self.tempo_total_ms = 0.0
+        self.tempo_max_ms = 0.0
+        self.baldes = [0] * (len(BALDES_MS) + 1)
+
+    def registrar(self, duracao_ms: float, linhas: int, erro: bool):
+        self.chamadas += 1
+        self.erros += erro
+        self.linhas += linhas
+        self.tempo_total_ms += duracao_ms
+        self.tempo_max_ms = max(self.tempo_max_ms, duracao_ms)
+        for i, limite in enumerate(BALDES_MS):
+            if duracao_ms <= limite:
+                self.baldes[i] += 1
+                return
+        self.baldes[-1] += 1
+
+    def percentil(self, q: float) -> float:
+        """Estimativa do percentil q (0..1) a partir do histograma (em ms)."""
+        if not self.chamadas:
+            return 0.0
+        alvo = q * self.chamadas
+        acumulado = 0
+        for i, quantidade in enumerate(self.baldes):
+            if quantidade and acumulado + quantidade >= alvo:
+                if i == len(BALDES_MS):
+                    return self.tempo_max_ms
+                inicio = BALDES_MS[i - 1] if i else 0.0
+                fim = min(BALDES_MS[i], self.tempo_max_ms)
+                return inicio + (fim - inicio) * (alvo - acumulado) / quantidade
+            acumulado += quantidade
+        return self.tempo_max_ms
+
+    def resumo(self) -> dict:
+        return {
+            "chamadas": self.chamadas,
+            "erros": self.erros,
+            "linhas": self.linhas,
+            "tempo_total_ms": self.tempo_total_ms,
+            "tempo_max_ms": self.tempo_max_ms,
+            "p50_ms": self.percentil(0.50),
+            "p95_ms": self.percentil(0.95),
+            "p99_ms": self.percentil(0.99),
+        }
+
+
+_lock = threading.Lock()
+_comandos: Dict[str, EstatisticaComando] = {}
+_lentos = deque(maxlen=MAX_REGISTROS)
+_planos = deque(maxlen=MAX_REGISTROS)
+
+
+def _nome_do_comando(query) -> str:
+    """
+    Nome usado nas estatísticas: o nome do comando preparado (EXECUTE nome)
+    ou, para SQL avulso, 'modulo.funcao' de quem chamou cur.execute().
+    """
+    texto = _sql_texto(query)
+    encontrado = _RE_EXECUTE.match(texto)
+    if encontrado:
+        return encontrado.group(1)
+    if _RE_PREPARE.match(texto):
+        return "PREPARE"
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get("__name__", "").startswith(_MODULOS_INTERNOS):
+        frame = frame.f_back
+    if frame is None:
+        return "?"
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+def _redigir(params) -> str:
+    """Troca os valores dos parâmetros pelo tipo (e tamanho), sem expor dados."""
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {_redigir_valor(v)}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(_redigir_valor(v) for v in params) + ")"
+
+def _redigir_valor(valor) -> str:
+    if valor is None:
+        return "NULL"
+    if isinstance(valor, (str, bytes, list, tuple)):
+        return f"<{type(valor).__name__}:{len(valor)}>"
+    return f"<{type(valor).__name__}>"
+
+def _sql_texto(query) -> str:
+    return query if isinstance(query, str) else query.decode("utf-8", "replace")
+
+def _pode_explicar(texto: str, nome: str) -> Optional[str]:
+    """Retorna o SQL a explicar se o comando estiver em EXPLICAVEIS; senão None."""
+    if nome not in EXPLICAVEIS:
+        return None
+    encontrado = _RE_EXECUTE.match(texto)
+    if encontrado:
+        import db  # import tardio: db importa este módulo
+        original = db.comandos.sql(nome)
+        if original is None or not _RE_SOMENTE_LEITURA.match(original) or _RE_ESCRITA.search(original):
+            return None
+        return texto
+    if not _RE_SOMENTE_LEITURA.match(texto) or _RE_ESCRITA.search(texto):
+        return None
+    return texto
+
+def _explicar(cursor, query, vars, nome: str):
+    """
+    Roda EXPLAIN (ANALYZE, BUFFERS) em um cursor separado da mesma conexão,
+    dentro de um savepoint: o que o comando fizer é desfeito e uma falha do
+    EXPLAIN não aborta a transação de quem chamou.
+    """
+    texto = _sql_texto(query)
+    sql = _pode_explicar(texto, nome)
+    if sql is None:
+        return
+    with cursor.connection.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+        try:
+            cur.execute("SAVEPOINT instrumentacao_explain;")
+        except psycopg2.Error as e:
+            log_lentos.debug("EXPLAIN de %s falhou: %s", nome, e)
+            return
+        try:
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, vars)
+            plano = "\n".join(linha[0] for linha in cur.fetchall())
+        except psycopg2.Error as e:
+            log_lentos.debug("EXPLAIN de %s falhou: %s", nome, e)
+            cur.execute("ROLLBACK TO SAVEPOINT instrumentacao_explain;")
+            cur.execute("RELEASE SAVEPOINT instrumentacao_explain;")
+            return
+        cur.execute("ROLLBACK TO SAVEPOINT instrumentacao_explain;")
+        cur.execute("RELEASE SAVEPOINT instrumentacao_explain;")
+    with _lock:
+        _planos.append({"comando": nome, "instante": time.time(), "plano": plano})
+
+
+class CursorInstrumentado(psycopg2.extensions.cursor):
+    """
+    Cursor usado pelas conexões do pool (ConexaoTikEvents). Com a
+    instrumentação desligada, execute() só repassa a chamada.
+    """
+
+    def execute(self, query, vars=None):
+        if not ativa:
+            return super().execute(query, vars)
+
+        nome = _nome_do_comando(query)
+        inicio = time.perf_counter()
+        erro = True
+        try:
+            resultado = super().execute(query, vars)
+            erro = False
+            return resultado
+        finally:
+            duracao_ms = (time.perf_counter() - inicio) * 1000.0
+            linhas = max(self.rowcount, 0) if not erro else 0
+            with _lock:
+                estatistica = _comandos.get(nome)
+                if estatistica is None:
+                    estatistica = _comandos[nome] = EstatisticaComando()
+                estatistica.registrar(duracao_ms, linhas, erro)
+            if duracao_ms >= LIMITE_LENTO_MS:
+                _registrar_lento(nome, query, vars, duracao_ms)
+            # Cursores nomeados (streaming) ficam de fora: o EXPLAIN ANALYZE
+            # leria o resultado inteiro de uma vez
+            if (not erro and TAXA_EXPLAIN > 0 and self.name is None
+                    and random.random() < TAXA_EXPLAIN):
+                _explicar(self, query, vars, nome)
+
+def _sem_literais(texto: str) -> str:
+    """SQL em uma linha, com os literais trocados por '?' (veja _RE_LITERAL)."""
+    return " ".join(_RE_LITERAL.sub("?", texto).split())
+
+def _registrar_lento(nome: str, query, vars, duracao_ms: float):
+    sql = _sem_literais(_sql_texto(query))[:MAX_SQL_LOG]
+    params = _redigir(vars)
+    with _lock:
+        _lentos.append({"comando": nome, "instante": time.time(),
+                        "duracao_ms": duracao_ms, "sql": sql, "params": params})
+    log_lentos.warning("Comando lento (%.1f ms) %s: %s params=%s", duracao_ms, nome, sql, params)
+
+
+# --- Controle em tempo de execução ---
+
+def ativar(limite_lento_ms: Optional[float] = None, taxa_explain: Optional[float] = None):
+    """Liga a instrumentação (e, opcionalmente, ajusta os limites)."""
+    global ativa
+    configurar(limite_lento_ms, taxa_explain)
+    ativa = True
+
+def desativar():
+    """Desliga a instrumentação; as estatísticas já coletadas são mantidas."""
+    global ativa
+    ativa = False
+
+def configurar(limite_lento_ms: Optional[float] = None, taxa_explain: Optional[float] = None):
+    """Ajusta o limite do log de lentos e a fração de EXPLAIN (0 a 1)."""
+    global LIMITE_LENTO_MS, TAXA_EXPLAIN
+    if limite_lento_ms is not None:
+        if limite_lento_ms < 0:
+            raise ValueError("Limite de comando lento não pode ser negativo.")
+        LIMITE_LENTO_MS = limite_lento_ms
+    if taxa_explain is not None:
+        if not 0 <= taxa_explain <= 1:
+            raise ValueError("Taxa de EXPLAIN deve estar entre 0 e 1.")
+        TAXA_EXPLAIN = taxa_explain
+
+def estatisticas() -> Dict[str, dict]:
+    """Resumo por comando: chamadas, erros, linhas, tempos e p50/p95/p99 (ms)."""
+    with _lock:
+        return {nome: e.resumo() for nome, e in _comandos.items()}
+
+def histogramas() -> Dict[str, EstatisticaComando]:
+    """Cópia das estatísticas completas (com os baldes), para exportação."""
+    with _lock:
+        copias = {}
+        for nome, e in _comandos.items():
+            copia = EstatisticaComando()
+            for campo in EstatisticaComando.__slots__:
+                valor = getattr(e, campo)
+                setattr(copia, campo, list(valor) if isinstance(valor, list) else valor)
+            copias[nome] = copia
+        return copias
+
+def comandos_lentos() -> List[dict]:
+    """Últimos comandos lentos (SQL e parâmetros já redigidos)."""
+    with _lock:
+        return list(_lentos)
+
+def planos_capturados() -> List[dict]:
+    """Últimos planos capturados pelo EXPLAIN por amostragem."""
+    with _lock:
+        return list(_planos)
+
+def limpar():
+    """Zera as estatísticas e os registros guardados."""
+    with _lock:
+        _comandos.clear()
+        _lentos.clear()
+        _planos.clear()
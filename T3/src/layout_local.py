@@ -0,0 +1,169 @@
+# arquivo: layout_local.py
+# Gera/atualiza os setores e assentos de um local a partir de uma especificação
+
+import io
+import csv
+import sys
+import json
+from typing import List, Dict, Tuple, Iterator, Union
+
+import cache
+import disponibilidade
+from db import get_conn
+
+# Exemplo de especificação (uma entrada por setor):
+#
+# [
+#   {"setor": "Plateia",
+#    "fileiras": "A-T",                 # intervalo de letras/números ou lista
+#    "assentos": [1, 30],               # números de assento (inclusive)
+#    "corredores": [10, 21],            # números que não existem em nenhuma fileira
+#    "pular": ["A-1", "A-30"],          # assentos específicos que não existem
+#    "assentos_por_fileira": {"T": [5, 26]}},   # sobrescreve 'assentos'
+#   {"setor": "Camarote", "fileiras": ["C1", "C2"], "assentos": [1, 8]}
+# ]
+
+
+def _expandir_fileiras(fileiras: Union[str, List[str]]) -> List[str]:
+    """'A-E' -> ['A', ..., 'E']; '1-3' -> ['1', '2', '3']; listas passam direto."""
+    if isinstance(fileiras, list):
+        return [str(f) for f in fileiras]
+    inicio, sep, fim = fileiras.partition("-")
+    if not sep:
+        return [fileiras]
+    if inicio.isdigit() and fim.isdigit():
+        return [str(n) for n in range(int(inicio), int(fim) + 1)]
+    if len(inicio) == 1 and len(fim) == 1 and inicio <= fim:
+        return [chr(c) for c in range(ord(inicio), ord(fim) + 1)]
+    raise ValueError(f"Intervalo de fileiras inválido: {fileiras}")
+
+def expandir_setor(spec: dict) -> Iterator[Tuple[str, str]]:
+    """Gera os (fileira, numero) de um setor da especificação."""
+    if "setor" not in spec or "fileiras" not in spec:
+        raise ValueError("Cada setor precisa de 'setor' e 'fileiras'.")
+    corredores = {int(n) for n in spec.get("corredores", [])}
+    pular = set(spec.get("pular", []))
+    por_fileira = spec.get("assentos_por_fileira", {})
+
+    for fileira in _expandir_fileiras(spec["fileiras"]):
+        intervalo = por_fileira.get(fileira, spec.get("assentos"))
+        if intervalo is None:
+            raise ValueError(f"Setor '{spec['setor']}', fileira {fileira}: faltam os 'assentos'.")
+        inicio, fim = int(intervalo[0]), int(intervalo[1])
+        for numero in range(inicio, fim + 1):
+            if numero in corredores or f"{fileira}-{numero}" in pular:
+                continue
+            if len(fileira) > 10 or len(str(numero)) > 10:
+                raise ValueError(f"Fileira/número maior que 10 caracteres: {fileira}-{numero}")
+            yield fileira, str(numero)
+
+def aplicar_layout(id_local: int, especificacao: List[dict],
+                   remover_excedentes: bool = True) -> Dict[str, int]:
+    """
+    Aplica a especificação ao local em uma única transação:
+      1. cria os setores que ainda não existem;
+      2. carrega todos os assentos da especificação com COPY em uma
+         tabela temporária;
+      3. insere só os assentos novos e (se 'remover_excedentes') remove os
+         assentos desses setores que saíram da especificação.
+    Rodar de novo a mesma especificação não muda nada. Assentos que já
+    têm ingresso nunca são removidos (contados em 'mantidos').
+    Setores que não aparecem na especificação não são tocados.
+    """
+    nomes = [spec.get("setor") for spec in especificacao]
+    if len(set(nomes)) != len(nomes):
+        raise ValueError("Setor repetido na especificação.")
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            # 1. Setores
+            cur.execute("""
+                INSERT INTO Setor (id_local, nome)
+                SELECT %s, nome FROM unnest(%s::varchar[]) AS nome
+                ON CONFLICT (id_local, nome) DO NOTHING;
+            """, (id_local, nomes))
+            setores_criados = cur.rowcount
+            cur.execute("SELECT nome, id_setor FROM Setor WHERE id_local = %s AND nome = ANY(%s);",
+                        (id_local, nomes))
+            id_por_nome = dict(cur.fetchall())
+
+            # 2. COPY dos assentos desejados para a tabela temporária
+            cur.execute("DROP TABLE IF EXISTS layout_assento;")
+            cur.execute("""
+                CREATE TEMP TABLE layout_assento (
+                    id_setor INT NOT NULL,
+                    fileira VARCHAR(10) NOT NULL,
+                    numero VARCHAR(10) NOT NULL
+                ) ON COMMIT DROP;
+            """)
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+            for spec in especificacao:
+                id_setor = id_por_nome[spec["setor"]]
+                for fileira, numero in expandir_setor(spec):
+                    escritor.writerow((id_setor, fileira, numero))
+            buffer.seek(0)
+            cur.copy_expert(
+                "COPY layout_assento (id_setor, fileira, numero) FROM STDIN WITH (FORMAT csv);",
+                buffer,
+            )
+            cur.execute("ANALYZE layout_assento;")
+
+            # 3. Diferença com o que já existe
+            cur.execute("""
+                INSERT INTO Assento (id_setor, fileira, numero)
+                SELECT id_setor, fileira, numero FROM layout_assento
+                ORDER BY id_setor, fileira, numero
+                ON CONFLICT (id_setor, fileira, numero) DO NOTHING;
+            """)
+            inseridos = cur.rowcount
+
+            removidos = mantidos = 0
+            if remover_excedentes:
+                excedentes = """
+                    FROM Assento a
+                    WHERE a.id_setor = ANY(%s)
+                      AND NOT EXISTS (SELECT 1 FROM layout_assento l
+                                      WHERE l.id_setor = a.id_setor
+                                        AND l.fileira = a.fileira
+                                        AND l.numero = a.numero)
+                """
+                ids_setor = list(id_por_nome.values())
+                cur.execute(f"""
+                    DELETE {excedentes}
+                      AND NOT EXISTS (SELECT 1 FROM Ingresso i WHERE i.id_assento = a.id_assento);
+                """, (ids_setor,))
+                removidos = cur.rowcount
+                cur.execute(f"SELECT COUNT(*) {excedentes};", (ids_setor,))
+                mantidos = cur.fetchone()[0]
+        conn.commit()
+
+    if setores_criados:
+        cache.invalidar("setor")
+    if inseridos or removidos:
+        disponibilidade.invalidar_evento()
+    return {
+        "setores_criados": setores_criados,
+        "inseridos": inseridos,
+        "removidos": removidos,
+        "mantidos": mantidos,
+    }
+
+def carregar_especificacao(caminho: str) -> List[dict]:
+    """Lê a especificação de um arquivo JSON (lista de setores)."""
+    with open(caminho, encoding="utf-8") as arquivo:
+        especificacao = json.load(arquivo)
+    if not isinstance(especificacao, list):
+        raise ValueError("A especificação deve ser uma lista de setores.")
+    return especificacao
+
+# Uso: python layout_local.py <id_local> <especificacao.json>
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Uso: python layout_local.py <id_local> <especificacao.json>", file=sys.stderr)
+        sys.exit(2)
+    resultado = aplicar_layout(int(sys.argv[1]), carregar_especificacao(sys.argv[2]))
+    print(f"Setores criados: {resultado['setores_criados']}")
+    print(f"Assentos inseridos: {resultado['inseridos']}")
+    print(f"Assentos removidos: {resultado['removidos']}")
+    print(f"Assentos fora da especificação mantidos (já têm ingresso): {resultado['mantidos']}")
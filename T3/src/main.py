@@ -15,6 +15,12 @@ import crud_evento_artista
 import crud_ingresso
 import crud_venda
 import crud_comprador
+import checkout
+import disponibilidade
+import alocacao
+import cache
+import metricas
+import pagina_evento
 # --- Funções Auxiliares de Input ---
 
 def pause():
@@ -134,6 +140,9 @@ def ui_atualizar_local():
         print("-" * 30)
 
         local_id = input_int("\nDigite o ID do local que deseja atualizar: ")
+        if not crud_local.existe_local(local_id):
+            print("Nenhum local encontrado com esse ID.")
+            return
         
         print("\nDigite os novos valores (deixe em branco para não alterar):")
         
@@ -342,6 +351,28 @@ def ui_deletar_artista():
 
 # --- Sub-Menus (Looping) ---
 
+def ui_buscar_artistas():
+    print("\n--- Buscar Artista ---")
+    try:
+        termo = input_str("Nome (ou parte dele): ")
+        artistas = crud_artista.buscar_artistas(termo)
+        if not artistas:
+            print("Nenhum artista parecido encontrado.")
+            return
+
+        print(f"{'ID':<5} | {'Nome':<30} | Gênero")
+        print("-" * 60)
+        for a in artistas:
+            # (id_artista, nome, genero, similaridade)
+            print(f"{a[0]:<5} | {a[1]:<30} | {a[2] or 'N/D'}")
+
+    except ValueError as e:
+        print(f"Erro de validação: {e}")
+    except Exception as e:
+        print(f"Erro ao buscar artistas: {e}")
+    finally:
+        pause()
+
 def menu_artistas():
     """Sub-menu para Gerenciar Artistas."""
     while True:
@@ -350,9 +381,10 @@ def menu_artistas():
         print("2. Cadastrar Novo Artista")
         print("3. Atualizar Artista")
         print("4. Deletar Artista")
+        print("5. Buscar Artista por Nome")
         print("0. Voltar ao Menu Principal")
         
-        opcao = input_int("Escolha uma opção: ", min_val=0, max_val=4)
+        opcao = input_int("Escolha uma opção: ", min_val=0, max_val=5)
 
         if opcao == 1:
             ui_listar_artistas()
@@ -362,6 +394,8 @@ def menu_artistas():
             ui_atualizar_artista()
         elif opcao == 4:
             ui_deletar_artista()
+        elif opcao == 5:
+            ui_buscar_artistas()
         elif opcao == 0:
             break # Volta para o menu principal
 
@@ -438,23 +472,114 @@ def _selecionar_artista() -> int | None:
 def ui_listar_eventos():
     print("\n--- Lista de Eventos (Ordenados por Data) ---")
     try:
-        eventos = crud_evento.read_todos_eventos()
+        data_inicio = input_date("A partir de (AAAA-MM-DD, opcional): ", optional=True)
+        data_fim = input_date("Até (AAAA-MM-DD, opcional): ", optional=True)
+
+        # Local, lineup e faixa de preço vêm na mesma consulta, página a página
+        eventos = crud_evento.read_eventos_detalhados(data_inicio, data_fim)
         if not eventos:
-            print("Nenhum evento cadastrado.")
+            print("Nenhum evento encontrado.")
             return
-        
-        print(f"{'ID':<5} | {'Data':<12} | {'Horário':<10} | {'ID Local':<8} | Nome")
-        print("-" * 70)
-        for ev in eventos:
-            # (id_evento, nome, data, horario, id_local)
-            horario_str = str(ev[3]) if ev[3] else "N/D"
-            print(f"{ev[0]:<5} | {str(ev[2]):<12} | {horario_str:<10} | {ev[4]:<8} | {ev[1]}")
+
+        while eventos:
+            print(f"\n{'ID':<5} | {'Data':<12} | {'Horário':<10} | {'Local':<20} | {'Preços':<21} | Nome")
+            print("-" * 100)
+            for ev in eventos:
+                horario_str = str(ev.horario) if ev.horario else "N/D"
+                if ev.preco_min is None:
+                    precos_str = "sem ingressos"
+                else:
+                    precos_str = f"R$ {ev.preco_min:.2f} - {ev.preco_max:.2f}"
+                print(f"{ev.id_evento:<5} | {str(ev.data):<12} | {horario_str:<10} | "
+                      f"{ev.nome_local[:20]:<20} | {precos_str:<21} | {ev.nome}")
+                if ev.artistas:
+                    print(f"{'':<5}   Lineup: {', '.join(a[1] for a in ev.artistas)}")
+
+            if len(eventos) < crud_evento.TAMANHO_PAGINA:
+                break
+            if input_str("\nEnter para a próxima página, 'q' para sair: ", optional=True) == 'q':
+                break
+            ultimo = eventos[-1]
+            eventos = crud_evento.read_eventos_detalhados(
+                data_inicio, data_fim, apos=(ultimo.data, ultimo.horario, ultimo.id_evento)
+            )
             
     except Exception as e:
         print(f"Erro ao listar eventos: {e}")
     finally:
         pause()
 
+def ui_buscar_eventos():
+    print("\n--- Buscar Eventos ---")
+    try:
+        termo = input_str("Buscar por (nome, descrição, artista ou local): ")
+        data_inicio = input_date("A partir de (AAAA-MM-DD, opcional): ", optional=True)
+        data_fim = input_date("Até (AAAA-MM-DD, opcional): ", optional=True)
+
+        resultados = crud_evento.buscar_eventos(termo, data_inicio, data_fim)
+        if not resultados:
+            print("Nenhum evento encontrado.")
+            return
+
+        while resultados:
+            print(f"\n{'ID':<5} | {'Data':<12} | {'Horário':<10} | {'Local':<20} | Nome")
+            print("-" * 80)
+            for ev in resultados:
+                # (id_evento, nome, data, horario, nome_local, relevancia)
+                horario_str = str(ev[3]) if ev[3] else "N/D"
+                print(f"{ev[0]:<5} | {str(ev[2]):<12} | {horario_str:<10} | {ev[4][:20]:<20} | {ev[1]}")
+
+            if len(resultados) < crud_evento.TAMANHO_PAGINA:
+                break
+            if input_str("\nEnter para a próxima página, 'q' para sair: ", optional=True) == 'q':
+                break
+            ultimo = resultados[-1]
+            resultados = crud_evento.buscar_eventos(termo, data_inicio, data_fim,
+                                                    apos=(ultimo[5], ultimo[0]))
+
+    except ValueError as e:
+        print(f"Erro de validação: {e}")
+    except Exception as e:
+        print(f"Erro ao buscar eventos: {e}")
+    finally:
+        pause()
+
+def ui_detalhes_evento():
+    evento_id = _selecionar_evento()
+    if evento_id is None:
+        return
+    try:
+        # Lineup, ingressos, setores e vendas em paralelo, do mesmo snapshot
+        pagina = pagina_evento.carregar_pagina_evento(evento_id)
+        if pagina is None:
+            print("Evento não encontrado.")
+            return
+
+        # (id_evento, nome, data, horario, descricao, id_local)
+        ev = pagina.evento
+        horario_str = str(ev[3]) if ev[3] else "N/D"
+        print(f"\n--- {ev[1]} ---")
+        print(f"Data: {ev[2]}  Horário: {horario_str}  Local ID: {ev[5]}")
+        if ev[4]:
+            print(f"Descrição: {ev[4]}")
+
+        print("\nLineup: " + (", ".join(a[1] for a in pagina.artistas) or "(nenhum artista)"))
+        print("Setores do local: " + (", ".join(s[1] for s in pagina.setores) or "(nenhum setor)"))
+
+        # (id_ingresso, preco, id_assento, beneficios, id_ingresso_padrao)
+        vips = sum(1 for i in pagina.ingressos if i[4] is None)
+        print(f"\nIngressos: {len(pagina.ingressos)} ({vips} VIP)")
+
+        # (id_venda, data, nome_comprador, email_comprador, id_ingresso, preco, quantidade)
+        vendidos = sum(v[6] for v in pagina.vendas)
+        receita = sum(v[5] * v[6] for v in pagina.vendas)
+        print(f"Vendas: {len(pagina.vendas)}  Ingressos vendidos: {vendidos}  Receita: R$ {receita:.2f}")
+
+    except Exception as e:
+        print(f"Erro ao carregar o evento: {e}")
+    finally:
+        pause()
+
 def ui_criar_evento():
     print("\n--- Cadastrar Novo Evento ---")
     # Um evento PRECISA de um local
@@ -557,6 +682,30 @@ def ui_associar_artista_evento(evento_id: int):
     finally:
         pause()
 
+def ui_substituir_lineup(evento_id: int):
+    print(f"\n--- Definir Lineup do Evento ID: {evento_id} ---")
+    try:
+        texto = input_str("IDs dos artistas, separados por vírgula (vazio = sem artistas): ",
+                          optional=True)
+        try:
+            ids = [int(parte) for parte in (texto or "").split(",") if parte.strip()]
+        except ValueError:
+            print("Lista inválida. Use apenas números separados por vírgula.")
+            return
+
+        alteracao = crud_evento_artista.substituir_lineup(evento_id, ids)
+        print(f"\nSucesso! Adicionados: {alteracao.adicionados or 'nenhum'} | "
+              f"Removidos: {alteracao.removidos or 'nenhum'}")
+    except ValueError as e:
+        print(f"Erro de validação: {e}")
+    except Exception as e:
+        if "violates foreign key constraint" in str(e):
+            print("\nErro: Algum dos IDs informados não corresponde a um artista cadastrado.")
+        else:
+            print(f"Erro ao definir lineup: {e}")
+    finally:
+        pause()
+
 def menu_gerenciar_artistas_evento():
     print("\n--- Gerenciar Artistas de um Evento ---")
     evento_id = _selecionar_evento()
@@ -569,15 +718,18 @@ def menu_gerenciar_artistas_evento():
         print(f"\n--- 🎤 Gerenciando Artistas [Evento ID: {evento_id}] ---")
         print("1. Listar Artistas do Evento")
         print("2. Adicionar Artista ao Evento")
+        print("3. Definir Lineup Completo (lista de IDs)")
         # TODO: Implementar "Remover Artista"
         print("0. Voltar")
         
-        opcao = input_int("Escolha uma opção: ", min_val=0, max_val=2)
+        opcao = input_int("Escolha uma opção: ", min_val=0, max_val=3)
         
         if opcao == 1:
             ui_listar_artistas_do_evento(evento_id)
         elif opcao == 2:
             ui_associar_artista_evento(evento_id)
+        elif opcao == 3:
+            ui_substituir_lineup(evento_id)
         elif opcao == 0:
             break
 
@@ -623,12 +775,12 @@ def ui_criar_ingresso_evento(evento_id: int):
         
         if tipo == '1':
             beneficios = input_str("Benefícios VIP (opcional): ", optional=True)
-            novo_id = crud_ingresso.create_ingresso_vip(evento_id, preco, id_assento, beneficios)
-            print(f"\nSucesso! Ingresso VIP criado com ID: {novo_id}.")
+            novo = crud_ingresso.create_ingresso_vip(evento_id, preco, id_assento, beneficios)
+            print(f"\nSucesso! Ingresso VIP criado com ID: {novo.id_ingresso}.")
             
         elif tipo == '2':
-            novo_id = crud_ingresso.create_ingresso_padrao(evento_id, preco, id_assento)
-            print(f"\nSucesso! Ingresso Padrão criado com ID: {novo_id}.")
+            novo = crud_ingresso.create_ingresso_padrao(evento_id, preco, id_assento)
+            print(f"\nSucesso! Ingresso Padrão criado com ID: {novo.id_ingresso}.")
         else:
             print("Tipo inválido. Operação cancelada.")
             
@@ -640,6 +792,62 @@ def ui_criar_ingresso_evento(evento_id: int):
     finally:
         pause()
 
+def ui_gerar_ingressos_evento(evento_id: int):
+    print(f"\n--- Gerar Ingressos por Assento para o Evento ID: {evento_id} ---")
+    try:
+        # Descobre o local do evento para listar apenas os seus setores
+        evento = crud_evento.get_evento(evento_id)
+        if evento is None:
+            print("Evento não encontrado.")
+            return
+        local_id = evento[5]
+
+        print("Deixe o setor em branco (0) para gerar para TODOS os setores do local.")
+        setor_id = _selecionar_setor(local_id)
+
+        preco = input_decimal("Preço de cada ingresso (ex: 49.99): ")
+        tipo = input_str("Tipo de ingresso (1: VIP, 2: Padrão): ")
+        if tipo not in ('1', '2'):
+            print("Tipo inválido. Operação cancelada.")
+            return
+        tipo = "VIP" if tipo == '1' else "PADRAO"
+        beneficios = None
+        if tipo == "VIP":
+            beneficios = input_str("Benefícios VIP (opcional): ", optional=True)
+
+        if setor_id is None:
+            criados = crud_ingresso.create_ingressos_local(evento_id, preco, tipo, beneficios)
+        else:
+            criados = crud_ingresso.create_ingressos_setor(evento_id, setor_id, preco, tipo, beneficios)
+        print(f"\nSucesso! {criados} ingresso(s) criado(s) (assentos que já tinham ingresso foram ignorados).")
+
+    except ValueError as e:
+        print(f"Erro de validação: {e}")
+    except Exception as e:
+        print(f"Erro ao gerar ingressos: {e}")
+    finally:
+        pause()
+
+def ui_disponibilidade_evento(evento_id: int):
+    print(f"\n--- Disponibilidade de Assentos do Evento ID: {evento_id} ---")
+    try:
+        mapas = disponibilidade.servico.mapas_evento(evento_id)
+        if not mapas:
+            print("O local deste evento não tem assentos cadastrados.")
+            return
+
+        print(f"{'Setor':<6} | {'Assentos':<8} | {'Livres':<7} | {'Vendidos':<8} | {'Reserv.':<7} | Primeiros livres")
+        print("-" * 80)
+        for setor_id, mapa in sorted(mapas.items()):
+            c = mapa.contagens()
+            primeiros = ", ".join(f"{a[1]}-{a[2]}" for a in mapa.primeiros_livres(5)) or "-"
+            print(f"{setor_id:<6} | {c['assentos']:<8} | {c['livres']:<7} | {c['vendidos']:<8} | {c['reservados']:<7} | {primeiros}")
+
+    except Exception as e:
+        print(f"Erro ao consultar disponibilidade: {e}")
+    finally:
+        pause()
+
 def menu_gerenciar_ingressos_evento():
     print("\n--- Gerenciar Ingressos de um Evento ---")
     evento_id = _selecionar_evento()
@@ -652,15 +860,21 @@ def menu_gerenciar_ingressos_evento():
         print(f"\n--- 🎫 Gerenciando Ingressos [Evento ID: {evento_id}] ---")
         print("1. Listar Ingressos do Evento")
         print("2. Criar Novo Ingresso para o Evento")
+        print("3. Gerar Ingressos para Todos os Assentos (Setor/Local)")
+        print("4. Ver Disponibilidade de Assentos")
         # TODO: Implementar "Deletar Ingresso"
         print("0. Voltar")
         
-        opcao = input_int("Escolha uma opção: ", min_val=0, max_val=2)
+        opcao = input_int("Escolha uma opção: ", min_val=0, max_val=4)
         
         if opcao == 1:
             ui_listar_ingressos_do_evento(evento_id)
         elif opcao == 2:
             ui_criar_ingresso_evento(evento_id)
+        elif opcao == 3:
+            ui_gerar_ingressos_evento(evento_id)
+        elif opcao == 4:
+            ui_disponibilidade_evento(evento_id)
         elif opcao == 0:
             break
 
@@ -679,10 +893,13 @@ def menu_eventos():
         print("\n-- Gestão de Componentes do Evento --")
         print("4. Gerenciar Artistas de um Evento (N:N)")
         print("5. Gerenciar Ingressos de um Evento (Especialização)")
+        print("\n-- Consulta de Eventos --")
+        print("6. Buscar Eventos (nome, artista, local)")
+        print("7. Ver Detalhes de um Evento")
         print("\n----------------------------------")
         print("0. Voltar ao Menu Principal")
         
-        opcao = input_int("Escolha uma opção: ", min_val=0, max_val=5)
+        opcao = input_int("Escolha uma opção: ", min_val=0, max_val=7)
 
         if opcao == 1:
             ui_listar_eventos()
@@ -694,6 +911,10 @@ def menu_eventos():
             menu_gerenciar_artistas_evento()
         elif opcao == 5:
             menu_gerenciar_ingressos_evento()
+        elif opcao == 6:
+            ui_buscar_eventos()
+        elif opcao == 7:
+            ui_detalhes_evento()
         elif opcao == 0:
             break
 
@@ -1048,8 +1269,12 @@ def ui_deletar_comprador():
         print("-" * 30)
 
         comprador_id = input_int("\nDigite o ID do comprador que deseja deletar: ")
+        comprador = crud_comprador.get_comprador(comprador_id)
+        if comprador is None:
+            print("Nenhum comprador encontrado com esse ID.")
+            return
         
-        confirm = input_str(f"Tem certeza que deseja deletar o comprador ID {comprador_id}? (s/n): ").lower()
+        confirm = input_str(f"Tem certeza que deseja deletar o comprador '{comprador[1]}' (ID {comprador_id})? (s/n): ").lower()
         
         if confirm == 's':
             linhas_afetadas = crud_comprador.delete_comprador(comprador_id) 
@@ -1072,6 +1297,34 @@ def ui_deletar_comprador():
 
 # --- Sub-Menus (Looping) ---
 
+def ui_buscar_compradores():
+    print("\n--- Buscar Comprador ---")
+    try:
+        termo = input_str("Nome ou email (ou parte deles): ")
+        compradores = []
+        if "@" in termo:
+            # Email completo: busca exata (sem diferenciar maiúsculas/minúsculas)
+            comprador = crud_comprador.get_comprador_por_email(termo)
+            if comprador:
+                compradores = [comprador]
+        if not compradores:
+            compradores = crud_comprador.buscar_compradores(termo)
+        if not compradores:
+            print("Nenhum comprador parecido encontrado.")
+            return
+
+        print(f"{'ID':<5} | {'Nome':<30} | Email")
+        print("-" * 70)
+        for c in compradores:
+            print(f"{c[0]:<5} | {c[1]:<30} | {c[2]}")
+
+    except ValueError as e:
+        print(f"Erro de validação: {e}")
+    except Exception as e:
+        print(f"Erro ao buscar compradores: {e}")
+    finally:
+        pause()
+
 def menu_compradores():
     """Sub-menu para Gerenciar Compradores."""
     while True:
@@ -1080,9 +1333,10 @@ def menu_compradores():
         print("2. Cadastrar Novo Comprador")
         print("3. Atualizar Comprador")
         print("4. Deletar Comprador")
+        print("5. Buscar Comprador (nome ou email)")
         print("0. Voltar ao Menu Principal")
         
-        opcao = input_int("Escolha uma opção: ", min_val=0, max_val=4)
+        opcao = input_int("Escolha uma opção: ", min_val=0, max_val=5)
 
         if opcao == 1:
             ui_listar_compradores()
@@ -1092,6 +1346,8 @@ def menu_compradores():
             ui_atualizar_comprador()
         elif opcao == 4:
             ui_deletar_comprador()
+        elif opcao == 5:
+            ui_buscar_compradores()
         elif opcao == 0:
             break
 
@@ -1160,7 +1416,8 @@ def _selecionar_ingresso(evento_id: int) -> int | None:
         if ingresso_id == 0 or ingresso_id is None:
             return None
         
-        if ingresso_id not in [i[0] for i in ingressos]:
+        ingresso = crud_ingresso.get_ingresso(ingresso_id)
+        if ingresso is None or ingresso.id_evento != evento_id:
             print("ID de ingresso inválido.")
             return None
             
@@ -1176,38 +1433,41 @@ def ui_realizar_venda():
     print("\n--- 💵 Registrar Nova Venda ---")
     
     try:
+        # As seleções vêm antes da venda: nenhuma transação fica aberta
+        # (nem lock algum preso) enquanto o operador digita.
+
         # Passo 1: Selecionar Comprador
         comprador_id = _selecionar_comprador()
         if comprador_id is None:
             print("Venda cancelada.")
-            pause()
             return
             
         # Passo 2: Selecionar Evento
         evento_id = _selecionar_evento() # Reutiliza helper do menu de eventos
         if evento_id is None:
             print("Venda cancelada.")
-            pause()
             return
             
         # Passo 3: Selecionar Ingresso (daquele evento)
         ingresso_id = _selecionar_ingresso(evento_id)
         if ingresso_id is None:
             print("Venda cancelada.")
-            pause()
             return
             
         # Passo 4: Informar Quantidade
         quantidade = input_int("Digite a quantidade: ", min_val=1)
         if quantidade is None:
             print("Venda cancelada.")
-            pause()
             return
             
         # Passo 5: Obter data e criar a venda
         data_venda = date.today()
         
-        novo_id = crud_venda.create_venda(data_venda, quantidade, ingresso_id, comprador_id)
+        # O checkout abre a própria transação (com repetição em caso de
+        # conflito), trava o ingresso e impede venda duplicada/acima da capacidade
+        novo_id = checkout.realizar_checkout(
+            comprador_id, [(ingresso_id, quantidade)], data_venda
+        )[0]
         
         print(f"\nSucesso! Venda registrada com ID: {novo_id} (Data: {data_venda}).")
         
@@ -1219,6 +1479,39 @@ def ui_realizar_venda():
         pause()
 
 
+def ui_venda_grupo():
+    print("\n--- 👥 Venda em Grupo (Assentos Juntos) ---")
+    try:
+        comprador_id = _selecionar_comprador()
+        if comprador_id is None:
+            print("Venda cancelada.")
+            return
+
+        evento_id = _selecionar_evento()
+        if evento_id is None:
+            print("Venda cancelada.")
+            return
+
+        quantidade = input_int("Quantos assentos juntos? ", min_val=1)
+        preferencia = input_str("IDs dos setores em ordem de preferência, separados por vírgula (opcional): ",
+                                optional=True)
+        setores = None
+        if preferencia:
+            setores = [int(p) for p in preferencia.replace(' ', '').split(',') if p]
+
+        bloco, vendas = alocacao.alocar_grupo(evento_id, comprador_id, quantidade, setores)
+        numeros = ", ".join(a[1] for a in bloco.assentos)
+        print(f"\nSucesso! Setor {bloco.id_setor}, fileira {bloco.fileira}, assentos {numeros}.")
+        print(f"Vendas registradas: {', '.join(str(v) for v in vendas)}")
+
+    except ValueError as e:
+        print(f"Erro de validação: {e}")
+    except Exception as e:
+        print(f"Erro ao registrar venda em grupo: {e}")
+    finally:
+        pause()
+
+
 # --- Sub-Menus (Looping) ---
 
 def menu_vendas():
@@ -1226,13 +1519,16 @@ def menu_vendas():
     while True:
         print("\n--- 💸 Realizar Venda ---")
         print("1. Registrar Nova Venda")
+        print("2. Venda em Grupo (Melhores Assentos Juntos)")
         # TODO: Implementar "Cancelar Venda" (ui_deletar_venda)
         print("0. Voltar ao Menu Principal")
         
-        opcao = input_int("Escolha uma opção: ", min_val=0, max_val=1)
+        opcao = input_int("Escolha uma opção: ", min_val=0, max_val=2)
 
         if opcao == 1:
             ui_realizar_venda()
+        elif opcao == 2:
+            ui_venda_grupo()
         elif opcao == 0:
             break
 
@@ -1276,6 +1572,39 @@ def ui_relatorio_vendas_por_comprador():
         pause()
 
 
+def ui_relatorio_resumo_eventos():
+    print("\n--- Relatório: Resumo de Vendas por Evento ---")
+    try:
+        # Lê a tabela de resumo (mantida por triggers), sem varrer as vendas
+        resumos = crud_venda.read_resumo_eventos()
+        if not resumos:
+            print("Nenhum evento cadastrado.")
+            return
+
+        print(f"{'ID':<5} | {'Data':<12} | {'Evento':<30} | {'Vendidos':<8} | {'Receita':<14} | Última venda")
+        print("-" * 95)
+        for r in resumos:
+            # (id_evento, nome, data, ingressos_vendidos, receita_bruta, ultima_venda)
+            receita_str = f"R$ {r[4]:.2f}"
+            ultima_str = str(r[5]) if r[5] else "N/D"
+            print(f"{r[0]:<5} | {str(r[2]):<12} | {r[1]:<30} | {r[3]:<8} | {receita_str:<14} | {ultima_str}")
+
+    except Exception as e:
+        print(f"Erro ao gerar relatório: {e}")
+    finally:
+        pause()
+
+def ui_reconciliar_resumo():
+    print("\n--- Reconstruir Resumo de Vendas ---")
+    try:
+        eventos = crud_venda.reconciliar_resumo_vendas()
+        print(f"\nSucesso! Resumo reconstruído ({eventos} evento(s) com vendas).")
+    except Exception as e:
+        print(f"Erro ao reconstruir resumo: {e}")
+    finally:
+        pause()
+
+
 # --- Sub-Menus (Looping) ---
 
 def menu_relatorios():
@@ -1283,12 +1612,18 @@ def menu_relatorios():
     while True:
         print("\n--- 📊 Relatórios do Sistema ---")
         print("1. Histórico de Vendas por Comprador (Consulta 3 Tabelas)")
+        print("2. Resumo de Vendas por Evento")
+        print("3. Reconstruir Resumo de Vendas (Reconciliação)")
         print("0. Voltar ao Menu Principal")
         
-        opcao = input_int("Escolha uma opção: ", min_val=0, max_val=1)
+        opcao = input_int("Escolha uma opção: ", min_val=0, max_val=3)
 
         if opcao == 1:
             ui_relatorio_vendas_por_comprador()
+        elif opcao == 2:
+            ui_relatorio_resumo_eventos()
+        elif opcao == 3:
+            ui_reconciliar_resumo()
         elif opcao == 0:
             break
 
@@ -1333,8 +1668,9 @@ def main_menu():
 if __name__ == "__main__":
     # 1. Verifica a conexão com o banco de dados antes de tudo
     try:
-        conn = db.get_conn()
-        conn.close()
+        # Abre o pool de conexões (e a primeira conexão) já na inicialização
+        with db.get_conn():
+            pass
         print("Conexão com o banco de dados estabelecida com sucesso.")
     except Exception as e:
         print(f"Erro fatal: Não foi possível conectar ao banco de dados.", file=sys.stderr)
@@ -1342,5 +1678,14 @@ if __name__ == "__main__":
         print("\nVerifique se o PostgreSQL está rodando e se a DSN em 'db.py' está correta.")
         sys.exit(1) # Encerra o programa se não puder conectar
 
-    # 2. Inicia o menu principal
-    main_menu()
\ No newline at end of file
+    # 2. Escuta as alterações feitas por outros processos (invalida o cache)
+    cache.iniciar_escuta()
+    # Exportação de métricas (TIKEVENTS_METRICAS_PORTA ou TIKEVENTS_METRICAS_ARQUIVO)
+    metricas.iniciar_pelo_ambiente()
+
+    # 3. Inicia o menu principal
+    try:
+        main_menu()
+    finally:
+        cache.parar_escuta()
+        db.fechar_pool()
\ No newline at end of file
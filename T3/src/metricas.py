@@ -0,0 +1,282 @@
+# arquivo: metricas.py
+# Métricas da camada de dados no formato texto do Prometheus
+
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import db
+import cache
+import instrumentacao
+import disponibilidade
+
+# Porta padrão do endpoint HTTP (/metrics)
+PORTA_METRICAS = 9108
+# Intervalo (s) da gravação periódica para o textfile collector
+INTERVALO_ARQUIVO = 15.0
+# Baldes (s) do histograma de latência do checkout
+BALDES_CHECKOUT = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Baldes (s) do histograma de latência das requisições do serviço HTTP
+BALDES_HTTP = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+TIPO_CONTEUDO = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _rotulos(pares: Iterable[Tuple[str, object]]) -> str:
+    texto = ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares)
+    return "{" + texto + "}" if texto else ""
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    """Contador monotônico, com rótulos opcionais."""
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        # Sem rótulos, a série existe (com 0) desde o início
+        self._valores: Dict[Tuple, float] = {} if rotulos else {(): 0}
+        self._lock = threading.Lock()
+
+    def inc(self, valor: float = 1, **rotulos):
+        chave = tuple(rotulos[r] for r in self.rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def linhas(self) -> List[str]:
+        with self._lock:
+            valores = sorted(self._valores.items())
+        saida = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        for chave, valor in valores:
+            saida.append(f"{self.nome}{_rotulos(zip(self.rotulos, chave))} {_numero(valor)}")
+        return saida
+
+
+class Histograma:
+    """Histograma com baldes fixos (em segundos), com rótulos opcionais."""
+
+    def __init__(self, nome: str, ajuda: str, baldes: Tuple[float, ...],
+                 rotulos: Tuple[str, ...] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.baldes = baldes
+        self.rotulos = rotulos
+        self._series: Dict[Tuple, list] = {}   # chave -> [contagens por balde, soma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, **rotulos):
+        chave = tuple(rotulos[r] for r in self.rotulos)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * len(self.baldes), 0.0, 0]
+            for i, limite in enumerate(self.baldes):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    def linhas(self) -> List[str]:
+        with self._lock:
+            series = sorted((chave, (list(s[0]), s[1], s[2])) for chave, s in self._series.items())
+        saida = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        for chave, (contagens, soma, total) in series:
+            saida.extend(_linhas_histograma(self.nome, list(zip(self.rotulos, chave)),
+                                            self.baldes, contagens, soma, total))
+        return saida
+
+def _linhas_histograma(nome: str, rotulos: List[Tuple[str, object]], baldes: Iterable[float],
+                       contagens: List[int], soma: float, total: int) -> List[str]:
+    """Linhas _bucket (acumuladas), _sum e _count de uma série."""
+    saida = []
+    acumulado = 0
+    for limite, quantidade in zip(baldes, contagens):
+        acumulado += quantidade
+        saida.append(f"{nome}_bucket{_rotulos(rotulos + [('le', _numero(float(limite)))])} {acumulado}")
+    saida.append(f"{nome}_bucket{_rotulos(rotulos + [('le', '+Inf')])} {total}")
+    saida.append(f"{nome}_sum{_rotulos(rotulos)} {_numero(soma)}")
+    saida.append(f"{nome}_count{_rotulos(rotulos)} {total}")
+    return saida
+
+
+# --- Métricas alimentadas pelos módulos da aplicação ---
+
+vendas = Contador("tikevents_vendas_total", "Vendas confirmadas.")
+ingressos_vendidos = Contador("tikevents_ingressos_vendidos_total",
+                              "Ingressos vendidos (soma das quantidades) em vendas confirmadas.")
+checkout_duracao = Histograma("tikevents_checkout_duracao_segundos",
+                              "Duração de checkout.realizar_checkout, por resultado.",
+                              BALDES_CHECKOUT, ("resultado",))
+checkout_repeticoes = Contador("tikevents_checkout_repeticoes_total",
+                               "Checkouts repetidos por conflito transitório.")
+http_requisicoes = Contador("tikevents_http_requisicoes_total",
+                            "Requisições atendidas pelo serviço (servico.py), por rota e status.",
+                            ("rota", "status"))
+http_duracao = Histograma("tikevents_http_duracao_segundos",
+                          "Duração das requisições do serviço, por rota.",
+                          BALDES_HTTP, ("rota",))
+http_recusadas = Contador("tikevents_http_recusadas_total",
+                          "Requisições recusadas com 503 antes de executar, por motivo.",
+                          ("motivo",))
+
+_METRICAS = [vendas, ingressos_vendidos, checkout_duracao, checkout_repeticoes,
+             http_requisicoes, http_duracao, http_recusadas]
+
+def registrar_vendas(quantidade_vendas: int, quantidade_ingressos: int):
+    """Conta vendas depois que a transação for confirmada."""
+    def contar():
+        vendas.inc(quantidade_vendas)
+        ingressos_vendidos.inc(quantidade_ingressos)
+    db.ao_confirmar(contar)
+
+
+# --- Métricas lidas dos outros módulos na hora da coleta ---
+
+def _gauge(nome: str, ajuda: str, valores: List[Tuple[List[Tuple[str, object]], float]],
+           tipo: str = "gauge") -> List[str]:
+    saida = [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+    for rotulos, valor in valores:
+        saida.append(f"{nome}{_rotulos(rotulos)} {_numero(valor)}")
+    return saida
+
+def _linhas_pool() -> List[str]:
+    if not db.pool_aberto():
+        return []
+    e = db.estatisticas_pool()
+    return (
+        _gauge("tikevents_pool_conexoes", "Conexões abertas no pool, por estado.",
+               [([("estado", "em_uso")], e["em_uso"]), ([("estado", "livres")], e["livres"])])
+        + _gauge("tikevents_pool_maximo", "Limite de conexões do pool.", [([], e["maximo"])])
+        + _gauge("tikevents_pool_checkouts_total", "Conexões entregues pelo pool.",
+                 [([], e["checkouts"])], "counter")
+        + _gauge("tikevents_pool_esperas_total", "Pedidos que esperaram por uma conexão livre.",
+                 [([], e["esperas"])], "counter")
+        + _gauge("tikevents_pool_timeouts_total",
+                 "Pedidos que desistiram por falta de conexão (pool esgotado).",
+                 [([], e["timeouts"])], "counter")
+        + _gauge("tikevents_pool_conexoes_criadas_total", "Conexões abertas pelo pool.",
+                 [([], e["criadas"])], "counter")
+        + _gauge("tikevents_pool_conexoes_descartadas_total", "Conexões fechadas/descartadas.",
+                 [([], e["descartadas"])], "counter")
+    )
+
+def _linhas_transacoes() -> List[str]:
+    e = db.estatisticas_transacoes()
+    return _gauge("tikevents_transacoes_total", "Transações encerradas, por resultado.",
+                  [([("resultado", "commit")], e["commits"]),
+                   ([("resultado", "rollback")], e["rollbacks"])], "counter")
+
+def _linhas_caches() -> List[str]:
+    fontes = {
+        "referencia": cache.estatisticas(),
+        "disponibilidade": disponibilidade.servico.estatisticas(),
+        "comandos_preparados": db.estatisticas_preparados(),
+    }
+    return (
+        _gauge("tikevents_cache_acertos_total", "Acertos de cache, por cache.",
+               [([("cache", nome)], e["acertos"]) for nome, e in fontes.items()], "counter")
+        + _gauge("tikevents_cache_faltas_total", "Faltas de cache, por cache.",
+                 [([("cache", nome)], e["faltas"]) for nome, e in fontes.items()], "counter")
+        + _gauge("tikevents_cache_entradas", "Entradas no cache de dados de referência.",
+                 [([("cache", "referencia")], fontes["referencia"]["entradas"])])
+    )
+
+def _linhas_sql() -> List[str]:
+    comandos = instrumentacao.histogramas()
+    if not comandos:
+        return []
+    nome = "tikevents_sql_duracao_segundos"
+    saida = [f"# HELP {nome} Latência dos comandos SQL (instrumentacao.py), por comando.",
+             f"# TYPE {nome} histogram"]
+    baldes = [limite / 1000.0 for limite in instrumentacao.BALDES_MS]
+    for comando, e in sorted(comandos.items()):
+        saida.extend(_linhas_histograma(nome, [("comando", comando)], baldes,
+                                        e.baldes[:-1], e.tempo_total_ms / 1000.0, e.chamadas))
+    saida += _gauge("tikevents_sql_linhas_total", "Linhas retornadas/afetadas, por comando.",
+                    [([("comando", c)], e.linhas) for c, e in sorted(comandos.items())], "counter")
+    saida += _gauge("tikevents_sql_erros_total", "Comandos que falharam, por comando.",
+                    [([("comando", c)], e.erros) for c, e in sorted(comandos.items())], "counter")
+    return saida
+
+def texto() -> str:
+    """Todas as métricas no formato texto de exposição do Prometheus."""
+    linhas = []
+    for metrica in _METRICAS:
+        linhas.extend(metrica.linhas())
+    linhas += _linhas_pool()
+    linhas += _linhas_transacoes()
+    linhas += _linhas_caches()
+    linhas += _linhas_sql()
+    return "\n".join(linhas) + "\n"
+
+
+# --- Exportação ---
+
+class _ManipuladorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = texto().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", TIPO_CONTEUDO)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass  # Sem log por requisição (o Prometheus coleta a cada poucos segundos)
+
+def servir(porta: int = PORTA_METRICAS, endereco: str = "") -> ThreadingHTTPServer:
+    """Serve GET /metrics em uma thread de fundo. Retorna o servidor (use .shutdown())."""
+    servidor = ThreadingHTTPServer((endereco, porta), _ManipuladorMetricas)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+    return servidor
+
+def gravar_arquivo(caminho: str):
+    """Grava as métricas para o textfile collector do node_exporter (troca atômica)."""
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(texto())
+    os.replace(temporario, caminho)
+
+def gravar_periodicamente(caminho: str, intervalo: float = INTERVALO_ARQUIVO) -> threading.Event:
+    """Grava o arquivo a cada 'intervalo' segundos. Retorna um Event para parar."""
+    parar = threading.Event()
+
+    def laco():
+        while not parar.is_set():
+            try:
+                gravar_arquivo(caminho)
+            except OSError as e:
+                print(f"Erro ao gravar métricas em {caminho}: {e}", file=sys.stderr)
+            parar.wait(intervalo)
+
+    threading.Thread(target=laco, name="metricas-arquivo", daemon=True).start()
+    return parar
+
+def iniciar_pelo_ambiente() -> Optional[object]:
+    """
+    Liga a exportação conforme as variáveis de ambiente:
+    TIKEVENTS_METRICAS_PORTA (endpoint HTTP) ou TIKEVENTS_METRICAS_ARQUIVO
+    (textfile collector). Sem nenhuma delas, não faz nada.
+    """
+    porta = os.environ.get("TIKEVENTS_METRICAS_PORTA")
+    if porta:
+        return servir(int(porta))
+    arquivo = os.environ.get("TIKEVENTS_METRICAS_ARQUIVO")
+    if arquivo:
+        return gravar_periodicamente(arquivo)
+    return None
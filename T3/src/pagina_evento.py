@@ -0,0 +1,125 @@
+# arquivo: pagina_evento.py
+# Carrega, em paralelo e de um mesmo snapshot, os dados da tela de detalhe de um evento
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, NamedTuple, Optional, Tuple
+
+from psycopg2.pool import PoolError
+
+import db
+import crud_evento
+import crud_evento_artista
+import crud_ingresso
+import crud_setor
+import crud_venda
+
+
+class PaginaEvento(NamedTuple):
+    """Dados da tela de detalhe de um evento, todos lidos do mesmo snapshot."""
+    evento: Tuple          # (id_evento, nome, data, horario, descricao, id_local)
+    artistas: List[Tuple]  # read_artistas_por_evento: (id_artista, nome, genero)
+    ingressos: List[Tuple] # read_ingressos_por_evento
+    setores: List[Tuple]   # read_setores_por_local (local do evento): (id_setor, nome)
+    vendas: List[Tuple]    # read_vendas_por_evento
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# Limite de conexões extras usadas ao mesmo tempo por todas as páginas
+# (limitar_conexoes_extras); None: só o que estiver livre no pool
+_extras: Optional[threading.BoundedSemaphore] = None
+
+def _obter_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(db.get_pool().maximo,
+                                               thread_name_prefix="pagina-evento")
+    return _executor
+
+def _no_snapshot(snapshot: str, funcao, argumento):
+    with db.transacao(somente_leitura=True, snapshot=snapshot):
+        return funcao(argumento)
+
+def _conexoes_disponiveis() -> int:
+    """Conexões que o pool entregaria agora sem esperar (livres + a abrir)."""
+    e = db.estatisticas_pool()
+    return e["livres"] + e["maximo"] - e["abertas"]
+
+def limitar_conexoes_extras(quantidade: Optional[int]):
+    """
+    Limita as conexões (além da principal de cada página) usadas ao mesmo
+    tempo pelas consultas paralelas de todas as páginas em carregamento;
+    as consultas que passarem do limite rodam na conexão principal.
+    None tira o limite.
+    """
+    global _extras
+    if quantidade is not None and quantidade < 0:
+        raise ValueError("Quantidade de conexões extras não pode ser negativa.")
+    _extras = threading.BoundedSemaphore(quantidade) if quantidade is not None else None
+
+def _reservar_extras(quantidade: int, limite: Optional[threading.BoundedSemaphore]) -> int:
+    """Reserva até 'quantidade' conexões extras sem esperar; retorna quantas conseguiu."""
+    if limite is None:
+        return quantidade
+    reservadas = 0
+    while reservadas < quantidade and limite.acquire(blocking=False):
+        reservadas += 1
+    return reservadas
+
+def carregar_pagina_evento(id_evento: int) -> Optional[PaginaEvento]:
+    """
+    Lê evento, lineup, ingressos, setores do local e vendas de um evento.
+    Retorna None se o evento não existir.
+
+    A transação principal (REPEATABLE READ, somente leitura) lê o evento e
+    exporta seu snapshot; as outras consultas rodam ao mesmo tempo em
+    conexões do pool que importam esse snapshot, então tudo reflete o
+    mesmo instante e o tempo total é o da consulta mais lenta, não a soma.
+    As vendas (a maior consulta) ficam na conexão principal. Sem conexões
+    livres no pool (ou acima de limitar_conexoes_extras), as consultas
+    restantes rodam na conexão principal.
+    """
+    with db.transacao(isolamento="REPEATABLE READ", somente_leitura=True):
+        evento = crud_evento.get_evento(id_evento)
+        if evento is None:
+            return None
+
+        consultas = [
+            (crud_evento_artista.read_artistas_por_evento, id_evento),
+            (crud_ingresso.read_ingressos_por_evento, id_evento),
+            (crud_setor.read_setores_por_local, evento[5]),
+            (crud_venda.read_vendas_por_evento, id_evento),
+        ]
+        limite = _extras
+        reservadas = _reservar_extras(
+            max(0, min(len(consultas) - 1, _conexoes_disponiveis())), limite)
+        paralelas = consultas[:reservadas]
+        futuros = []
+        try:
+            if paralelas:
+                snapshot = db.exportar_snapshot()
+                executor = _obter_executor()
+                futuros = [executor.submit(_no_snapshot, snapshot, funcao, argumento)
+                           for funcao, argumento in paralelas]
+            try:
+                locais = [funcao(argumento) for funcao, argumento in consultas[len(paralelas):]]
+                resultados = []
+                for futuro, (funcao, argumento) in zip(futuros, paralelas):
+                    try:
+                        resultados.append(futuro.result())
+                    except PoolError:
+                        # O pool esgotou entre a checagem e o pedido: lê aqui mesmo
+                        resultados.append(funcao(argumento))
+            except BaseException:
+                # O snapshot só pode ser importado enquanto esta transação estiver aberta
+                wait(futuros)
+                raise
+        finally:
+            if limite is not None:
+                for _ in range(reservadas):
+                    limite.release()
+
+    return PaginaEvento(evento, *resultados, *locais)
@@ -0,0 +1,776 @@
+# arquivo: servico.py
+# Serviço HTTP/JSON com as operações dos módulos crud_* e do checkout
+
+import re
+import sys
+import json
+import time
+import base64
+import signal
+import socket
+import logging
+import threading
+from datetime import date, time as hora
+from decimal import Decimal, InvalidOperation
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import psycopg2
+from psycopg2 import errors
+from psycopg2.pool import PoolError
+
+import db
+import cache
+import metricas
+import checkout
+import alocacao
+import disponibilidade
+import pagina_evento
+import crud_local
+import crud_setor
+import crud_artista
+import crud_comprador
+import crud_evento
+import crud_evento_artista
+import crud_ingresso
+import crud_venda
+
+# Porta padrão do serviço
+PORTA_SERVICO = 8080
+# Requisições executadas ao mesmo tempo; cada uma usa no máximo uma conexão
+TRABALHADORES = db.POOL_MAX
+# Conexões extras para as consultas paralelas de GET /eventos/{id}/pagina,
+# somadas por todas as páginas em carregamento. O pool é recriado com
+# TRABALHADORES + CONEXOES_PAGINA conexões, então ninguém espera por conexão
+CONEXOES_PAGINA = 3
+# Requisições aceitas aguardando um trabalhador; além disso a resposta é 503
+FILA_MAX = 4 * TRABALHADORES
+# Requisição que esperou mais que isto na fila é recusada (503) sem executar
+ESPERA_FILA_MAX = 2.0
+# Tempo máximo (s) para ler a requisição e escrever a resposta
+TIMEOUT_SOCKET = 10.0
+# statement_timeout (ms) das conexões do serviço: comando mais lento vira 504
+TIMEOUT_COMANDO_MS = 5000
+# Espera (s) por uma conexão livre do pool antes de responder 503
+ESPERA_CONEXAO = 1.0
+# Tamanho máximo do corpo JSON aceito
+TAMANHO_MAX_CORPO = 1024 * 1024
+
+log = logging.getLogger("tikevents.servico")
+
+# Colunas das tuplas retornadas pelos módulos crud_*, para montar os objetos JSON
+CAMPOS_LOCAL = ("id_local", "nome", "endereco", "capacidade")
+CAMPOS_SETOR = ("id_setor", "nome", "id_local")
+CAMPOS_SETOR_LOCAL = ("id_setor", "nome")
+CAMPOS_ARTISTA = ("id_artista", "nome", "genero")
+CAMPOS_ARTISTA_BUSCA = CAMPOS_ARTISTA + ("similaridade",)
+CAMPOS_COMPRADOR = ("id_comprador", "nome", "email")
+CAMPOS_COMPRADOR_BUSCA = CAMPOS_COMPRADOR + ("similaridade",)
+CAMPOS_EVENTO = ("id_evento", "nome", "data", "horario", "descricao", "id_local")
+CAMPOS_EVENTO_ARTISTA = ("id_evento", "nome", "data")
+CAMPOS_EVENTO_BUSCA = ("id_evento", "nome", "data", "horario", "nome_local", "relevancia")
+CAMPOS_INGRESSO_EVENTO = ("id_ingresso", "preco", "id_assento", "beneficios", "id_ingresso_padrao")
+CAMPOS_VENDA = ("id_venda", "data", "quantidade", "id_ingresso", "id_comprador")
+CAMPOS_VENDA_EVENTO = ("id_venda", "data", "nome_comprador", "email_comprador",
+                       "id_ingresso", "preco", "quantidade")
+CAMPOS_VENDA_COMPRADOR = ("id_venda", "data", "nome_evento", "preco", "quantidade", "total")
+CAMPOS_RESUMO = ("ingressos_vendidos", "receita_bruta", "ultima_venda")
+
+
+class ErroHttp(Exception):
+    """Erro com status HTTP próprio (ex: 404 para registro inexistente)."""
+
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+
+class Requisicao(NamedTuple):
+    """Parâmetros de consulta (?a=1) e corpo JSON de uma requisição."""
+    consulta: Dict[str, str]
+    corpo: Dict[str, Any]
+
+
+# --- Conversão de parâmetros ---
+
+def _inteiro(valor, nome: str) -> int:
+    """Aceita int ou texto só com dígitos (sem truncar 2.7 ou "2.7")."""
+    if isinstance(valor, int) and not isinstance(valor, bool):
+        return valor
+    if isinstance(valor, str) and re.fullmatch(r"\s*-?\d+\s*", valor):
+        return int(valor)
+    raise ErroHttp(400, f"'{nome}' deve ser um número inteiro.")
+
+def _decimal(valor, nome: str) -> Decimal:
+    try:
+        return Decimal(str(valor))
+    except InvalidOperation:
+        raise ErroHttp(400, f"'{nome}' deve ser um número decimal.")
+
+def _data(valor, nome: str) -> date:
+    try:
+        return date.fromisoformat(str(valor))
+    except ValueError:
+        raise ErroHttp(400, f"'{nome}' deve ser uma data AAAA-MM-DD.")
+
+def _horario(valor, nome: str) -> hora:
+    try:
+        return hora.fromisoformat(str(valor))
+    except ValueError:
+        raise ErroHttp(400, f"'{nome}' deve ser um horário HH:MM[:SS].")
+
+def _real(valor, nome: str) -> float:
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        raise ErroHttp(400, f"'{nome}' deve ser um número.")
+
+def _texto(valor, nome: str) -> str:
+    if not isinstance(valor, str):
+        raise ErroHttp(400, f"'{nome}' deve ser um texto.")
+    return valor
+
+def _campo(fonte: Dict[str, Any], nome: str, conversor: Callable, obrigatorio: bool = False):
+    """Lê e converte um campo; ausente (ou null) retorna None, ou 400 se obrigatório."""
+    valor = fonte.get(nome)
+    if valor is None:
+        if obrigatorio:
+            raise ErroHttp(400, f"Campo obrigatório: '{nome}'.")
+        return None
+    return conversor(valor, nome)
+
+def _lista_inteiros(valor, nome: str) -> List[int]:
+    if not isinstance(valor, list):
+        raise ErroHttp(400, f"'{nome}' deve ser uma lista.")
+    return [_inteiro(v, nome) for v in valor]
+
+def _limite(req: Requisicao, padrao: int) -> int:
+    limite = _campo(req.consulta, "limite", _inteiro)
+    return padrao if limite is None else limite
+
+# O cursor de paginação vai para o cliente como texto opaco (JSON em base64)
+# e volta no parâmetro ?apos=. 'proximo' é None na última página.
+
+def _cursor(valores: Optional[Tuple]) -> Optional[str]:
+    if valores is None:
+        return None
+    texto = json.dumps(valores, default=_json_padrao)
+    return base64.urlsafe_b64encode(texto.encode("utf-8")).decode("ascii")
+
+def _ler_cursor(req: Requisicao, conversores: Tuple[Callable, ...]) -> Optional[Tuple]:
+    token = req.consulta.get("apos")
+    if not token:
+        return None
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except ValueError:
+        raise ErroHttp(400, "Cursor 'apos' inválido.")
+    if not isinstance(valores, list) or len(valores) != len(conversores):
+        raise ErroHttp(400, "Cursor 'apos' inválido.")
+    return tuple(None if v is None else conv(v, "apos") for conv, v in zip(conversores, valores))
+
+def _pagina(itens: List, limite: int, cursor_do_ultimo: Callable) -> Dict[str, Any]:
+    proximo = cursor_do_ultimo(itens[-1]) if len(itens) == limite else None
+    return {"itens": itens, "proximo": _cursor(proximo)}
+
+
+# --- Conversão das respostas ---
+
+def _json_padrao(valor):
+    if isinstance(valor, (date, hora)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)  # Texto, para não perder precisão em valores monetários
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+def _objeto(campos: Tuple[str, ...], linha: Optional[Tuple], entidade: str) -> Dict[str, Any]:
+    if linha is None:
+        raise ErroHttp(404, f"{entidade} não encontrado.")
+    return dict(zip(campos, linha))
+
+def _objetos(campos: Tuple[str, ...], linhas: List[Tuple]) -> List[Dict[str, Any]]:
+    return [dict(zip(campos, linha)) for linha in linhas]
+
+def _alterados(linhas: int, entidade: str) -> Dict[str, int]:
+    if linhas == 0:
+        raise ErroHttp(404, f"{entidade} não encontrado.")
+    return {"alterados": linhas}
+
+def _evento_detalhado(evento: crud_evento.EventoDetalhado) -> Dict[str, Any]:
+    dados = evento._asdict()
+    dados["artistas"] = _objetos(CAMPOS_ARTISTA, evento.artistas)
+    return dados
+
+
+# --- Rotas ---
+
+class Rota(NamedTuple):
+    metodo: str
+    modelo: str        # ex: "/locais/{id}" (também o rótulo das métricas)
+    padrao: "re.Pattern"
+    funcao: Callable
+    status: int
+
+_ROTAS: List[Rota] = []
+
+def rota(metodo: str, modelo: str, status: int = 200):
+    """Registra a função como tratadora de 'metodo modelo'; {x} casa um inteiro."""
+    padrao = re.compile("^" + re.sub(r"\{\w+\}", r"(\\d+)", modelo) + "$")
+    def decorador(funcao):
+        _ROTAS.append(Rota(metodo, modelo, padrao, funcao, status))
+        return funcao
+    return decorador
+
+def _encontrar_rota(metodo: str, caminho: str) -> Tuple[Rota, Tuple[int, ...]]:
+    metodo_errado = False
+    for r in _ROTAS:
+        encontrado = r.padrao.match(caminho)
+        if encontrado:
+            if r.metodo == metodo:
+                return r, tuple(int(g) for g in encontrado.groups())
+            metodo_errado = True
+    if metodo_errado:
+        raise ErroHttp(405, f"Método {metodo} não permitido em {caminho}.")
+    raise ErroHttp(404, f"Rota não encontrada: {caminho}")
+
+
+@rota("GET", "/saude")
+def _saude(req):
+    return {"status": "ok"}
+
+@rota("GET", "/metrics")
+def _metricas(req):
+    return metricas.texto()
+
+# Locais e setores
+
+@rota("GET", "/locais")
+def _listar_locais(req):
+    return _objetos(CAMPOS_LOCAL, crud_local.read_locais())
+
+@rota("GET", "/locais/{id}")
+def _obter_local(req, id_local):
+    return _objeto(CAMPOS_LOCAL, crud_local.get_local(id_local), "Local")
+
+@rota("POST", "/locais", status=201)
+def _criar_local(req):
+    c = req.corpo
+    return {"id_local": crud_local.create_local(
+        _campo(c, "nome", _texto, True), _campo(c, "capacidade", _inteiro, True),
+        _campo(c, "endereco", _texto))}
+
+@rota("PUT", "/locais/{id}")
+def _atualizar_local(req, id_local):
+    c = req.corpo
+    return _alterados(crud_local.update_local(
+        id_local, _campo(c, "nome", _texto), _campo(c, "endereco", _texto),
+        _campo(c, "capacidade", _inteiro)), "Local")
+
+@rota("DELETE", "/locais/{id}")
+def _deletar_local(req, id_local):
+    return _alterados(crud_local.delete_local(id_local), "Local")
+
+@rota("GET", "/locais/{id}/setores")
+def _setores_do_local(req, id_local):
+    return _objetos(CAMPOS_SETOR_LOCAL, crud_setor.read_setores_por_local(id_local))
+
+@rota("GET", "/setores/{id}")
+def _obter_setor(req, id_setor):
+    return _objeto(CAMPOS_SETOR, crud_setor.get_setor(id_setor), "Setor")
+
+@rota("POST", "/setores", status=201)
+def _criar_setor(req):
+    c = req.corpo
+    return {"id_setor": crud_setor.create_setor(
+        _campo(c, "nome", _texto, True), _campo(c, "id_local", _inteiro, True))}
+
+@rota("PUT", "/setores/{id}")
+def _atualizar_setor(req, id_setor):
+    c = req.corpo
+    return _alterados(crud_setor.update_setor(
+        id_setor, _campo(c, "nome", _texto), _campo(c, "id_local", _inteiro)), "Setor")
+
+@rota("DELETE", "/setores/{id}")
+def _deletar_setor(req, id_setor):
+    return _alterados(crud_setor.delete_setor(id_setor), "Setor")
+
+# Artistas
+
+@rota("GET", "/artistas")
+def _listar_artistas(req):
+    termo = req.consulta.get("busca")
+    if termo is not None:
+        return _objetos(CAMPOS_ARTISTA_BUSCA, crud_artista.buscar_artistas(
+            termo, _limite(req, crud_artista.LIMITE_BUSCA)))
+    return _objetos(CAMPOS_ARTISTA, crud_artista.read_artistas())
+
+@rota("GET", "/artistas/{id}")
+def _obter_artista(req, id_artista):
+    return _objeto(CAMPOS_ARTISTA, crud_artista.get_artista(id_artista), "Artista")
+
+@rota("GET", "/artistas/{id}/eventos")
+def _eventos_do_artista(req, id_artista):
+    return _objetos(CAMPOS_EVENTO_ARTISTA, crud_evento_artista.read_eventos_por_artista(id_artista))
+
+@rota("POST", "/artistas", status=201)
+def _criar_artista(req):
+    c = req.corpo
+    return {"id_artista": crud_artista.create_artista(
+        _campo(c, "nome", _texto, True), _campo(c, "genero", _texto))}
+
+@rota("PUT", "/artistas/{id}")
+def _atualizar_artista(req, id_artista):
+    c = req.corpo
+    return _alterados(crud_artista.update_artista(
+        id_artista, _campo(c, "nome", _texto), _campo(c, "genero", _texto)), "Artista")
+
+@rota("DELETE", "/artistas/{id}")
+def _deletar_artista(req, id_artista):
+    return _alterados(crud_artista.delete_artista(id_artista), "Artista")
+
+# Compradores (sem listagem completa: busca por nome/email ou email exato)
+
+@rota("GET", "/compradores")
+def _buscar_compradores(req):
+    email = req.consulta.get("email")
+    if email is not None:
+        comprador = crud_comprador.get_comprador_por_email(email)
+        return _objetos(CAMPOS_COMPRADOR, [comprador] if comprador else [])
+    termo = req.consulta.get("busca")
+    if termo is None:
+        raise ErroHttp(400, "Informe ?busca= ou ?email=.")
+    return _objetos(CAMPOS_COMPRADOR_BUSCA, crud_comprador.buscar_compradores(
+        termo, _limite(req, crud_comprador.LIMITE_BUSCA)))
+
+@rota("GET", "/compradores/{id}")
+def _obter_comprador(req, id_comprador):
+    return _objeto(CAMPOS_COMPRADOR, crud_comprador.get_comprador(id_comprador), "Comprador")
+
+@rota("POST", "/compradores", status=201)
+def _criar_comprador(req):
+    c = req.corpo
+    return {"id_comprador": crud_comprador.create_comprador(
+        _campo(c, "nome", _texto, True), _campo(c, "email", _texto, True))}
+
+@rota("PUT", "/compradores/{id}")
+def _atualizar_comprador(req, id_comprador):
+    c = req.corpo
+    return _alterados(crud_comprador.update_comprador(
+        id_comprador, _campo(c, "nome", _texto), _campo(c, "email", _texto)), "Comprador")
+
+@rota("DELETE", "/compradores/{id}")
+def _deletar_comprador(req, id_comprador):
+    return _alterados(crud_comprador.delete_comprador(id_comprador), "Comprador")
+
+@rota("GET", "/compradores/{id}/vendas")
+def _vendas_do_comprador(req, id_comprador):
+    limite = _limite(req, crud_venda.TAMANHO_PAGINA)
+    vendas = crud_venda.read_vendas_por_comprador_paginado(
+        id_comprador, _ler_cursor(req, (_data, _inteiro)), limite)
+    return _pagina(_objetos(CAMPOS_VENDA_COMPRADOR, vendas), limite,
+                   lambda v: (v["data"], v["id_venda"]))
+
+# Eventos
+
+@rota("GET", "/eventos")
+def _listar_eventos(req):
+    data_inicio = _campo(req.consulta, "data_inicio", _data)
+    data_fim = _campo(req.consulta, "data_fim", _data)
+    limite = _limite(req, crud_evento.TAMANHO_PAGINA)
+    termo = req.consulta.get("busca")
+    if termo is not None:
+        eventos = crud_evento.buscar_eventos(termo, data_inicio, data_fim,
+                                             _ler_cursor(req, (_real, _inteiro)), limite)
+        return _pagina(_objetos(CAMPOS_EVENTO_BUSCA, eventos), limite,
+                       lambda e: (e["relevancia"], e["id_evento"]))
+    eventos = crud_evento.read_eventos_detalhados(
+        data_inicio, data_fim, _ler_cursor(req, (_data, _horario, _inteiro)), limite)
+    return _pagina([_evento_detalhado(e) for e in eventos], limite,
+                   lambda e: (e["data"], e["horario"], e["id_evento"]))
+
+@rota("GET", "/eventos/{id}")
+def _obter_evento(req, id_evento):
+    return _objeto(CAMPOS_EVENTO, crud_evento.get_evento(id_evento), "Evento")
+
+@rota("GET", "/eventos/{id}/pagina")
+def _pagina_do_evento(req, id_evento):
+    pagina = pagina_evento.carregar_pagina_evento(id_evento)
+    if pagina is None:
+        raise ErroHttp(404, "Evento não encontrado.")
+    return {
+        "evento": dict(zip(CAMPOS_EVENTO, pagina.evento)),
+        "artistas": _objetos(CAMPOS_ARTISTA, pagina.artistas),
+        "ingressos": _objetos(CAMPOS_INGRESSO_EVENTO, pagina.ingressos),
+        "setores": _objetos(CAMPOS_SETOR_LOCAL, pagina.setores),
+        "vendas": _objetos(CAMPOS_VENDA_EVENTO, pagina.vendas),
+    }
+
+@rota("POST", "/eventos", status=201)
+def _criar_evento(req):
+    c = req.corpo
+    return {"id_evento": crud_evento.create_evento(
+        _campo(c, "nome", _texto, True), _campo(c, "data", _data, True),
+        _campo(c, "id_local", _inteiro, True), _campo(c, "horario", _horario),
+        _campo(c, "descricao", _texto))}
+
+@rota("PUT", "/eventos/{id}")
+def _atualizar_evento(req, id_evento):
+    c = req.corpo
+    return _alterados(crud_evento.update_evento(
+        id_evento, _campo(c, "nome", _texto), _campo(c, "data", _data),
+        _campo(c, "horario", _horario), _campo(c, "descricao", _texto),
+        _campo(c, "id_local", _inteiro)), "Evento")
+
+@rota("DELETE", "/eventos/{id}")
+def _deletar_evento(req, id_evento):
+    return _alterados(crud_evento.delete_evento(id_evento), "Evento")
+
+@rota("GET", "/eventos/{id}/artistas")
+def _lineup(req, id_evento):
+    return _objetos(CAMPOS_ARTISTA, crud_evento_artista.read_artistas_por_evento(id_evento))
+
+@rota("PUT", "/eventos/{id}/artistas")
+def _substituir_lineup(req, id_evento):
+    ids = _campo(req.corpo, "artistas", _lista_inteiros, True)
+    return crud_evento_artista.substituir_lineup(id_evento, ids)._asdict()
+
+@rota("GET", "/eventos/{id}/ingressos")
+def _ingressos_do_evento(req, id_evento):
+    return _objetos(CAMPOS_INGRESSO_EVENTO, crud_ingresso.read_ingressos_por_evento(id_evento))
+
+@rota("POST", "/eventos/{id}/ingressos", status=201)
+def _criar_ingresso(req, id_evento):
+    c = req.corpo
+    tipo = (_campo(c, "tipo", _texto) or "PADRAO").upper()
+    preco = _campo(c, "preco", _decimal, True)
+    id_assento = _campo(c, "id_assento", _inteiro)
+    if tipo == "VIP":
+        ingresso = crud_ingresso.create_ingresso_vip(id_evento, preco, id_assento,
+                                                     _campo(c, "beneficios", _texto))
+    elif tipo == "PADRAO":
+        ingresso = crud_ingresso.create_ingresso_padrao(id_evento, preco, id_assento)
+    else:
+        raise ErroHttp(400, "'tipo' deve ser VIP ou PADRAO.")
+    return ingresso._asdict()
+
+@rota("GET", "/eventos/{id}/disponibilidade")
+def _disponibilidade(req, id_evento):
+    return disponibilidade.contagens(id_evento, _campo(req.consulta, "setor", _inteiro))
+
+@rota("GET", "/eventos/{id}/vendas")
+def _vendas_do_evento(req, id_evento):
+    limite = _limite(req, crud_venda.TAMANHO_PAGINA)
+    vendas = crud_venda.read_vendas_por_evento_paginado(
+        id_evento, _ler_cursor(req, (_data, _inteiro)), limite)
+    return _pagina(_objetos(CAMPOS_VENDA_EVENTO, vendas), limite,
+                   lambda v: (v["data"], v["id_venda"]))
+
+@rota("GET", "/eventos/{id}/resumo")
+def _resumo_do_evento(req, id_evento):
+    return dict(zip(CAMPOS_RESUMO, crud_venda.read_resumo_evento(id_evento)))
+
+@rota("POST", "/eventos/{id}/grupos", status=201)
+def _comprar_grupo(req, id_evento):
+    c = req.corpo
+    setores = _campo(c, "setores", _lista_inteiros)
+    bloco, vendas = alocacao.alocar_grupo(
+        id_evento, _campo(c, "id_comprador", _inteiro, True),
+        _campo(c, "quantidade", _inteiro, True), setores, _campo(c, "data", _data))
+    assentos = [{"id_assento": a, "numero": n, "id_ingresso": i} for a, n, i in bloco.assentos]
+    return {"id_setor": bloco.id_setor, "fileira": bloco.fileira,
+            "assentos": assentos, "vendas": vendas}
+
+# Ingressos, vendas e checkout
+
+@rota("GET", "/ingressos/{id}")
+def _obter_ingresso(req, id_ingresso):
+    ingresso = crud_ingresso.get_ingresso(id_ingresso)
+    if ingresso is None:
+        raise ErroHttp(404, "Ingresso não encontrado.")
+    return ingresso._asdict()
+
+@rota("DELETE", "/ingressos/{id}")
+def _deletar_ingresso(req, id_ingresso):
+    return _alterados(crud_ingresso.delete_ingresso(id_ingresso), "Ingresso")
+
+@rota("GET", "/vendas/{id}")
+def _obter_venda(req, id_venda):
+    return _objeto(CAMPOS_VENDA, crud_venda.get_venda(id_venda), "Venda")
+
+@rota("DELETE", "/vendas/{id}")
+def _cancelar_venda(req, id_venda):
+    return _alterados(crud_venda.delete_venda(id_venda), "Venda")
+
+@rota("POST", "/vendas/lote", status=201)
+def _vendas_em_lote(req):
+    itens = req.corpo.get("vendas")
+    if not isinstance(itens, list) or not all(isinstance(v, dict) for v in itens):
+        raise ErroHttp(400, "'vendas' deve ser uma lista de objetos.")
+    vendas = [(_campo(v, "data", _data) or date.today(), _campo(v, "quantidade", _inteiro, True),
+               _campo(v, "id_ingresso", _inteiro, True), _campo(v, "id_comprador", _inteiro, True))
+              for v in itens]
+    # Cada (comprador, data) vira um checkout: as mesmas checagens de assento
+    # já vendido e de capacidade da venda pelo site, tudo ou nada por grupo.
+    # Um grupo recusado não desfaz os outros; suas posições vão para 'falhas'.
+    ids: List[Optional[int]] = [None] * len(vendas)
+    falhas: List[Tuple[int, str]] = []
+    grupos: Dict[Tuple[int, date], List[int]] = {}
+    for pos, (data_venda, quantidade, _, id_comprador) in enumerate(vendas):
+        if quantidade <= 0:
+            falhas.append((pos, "Quantidade deve ser um número positivo."))
+        else:
+            grupos.setdefault((id_comprador, data_venda), []).append(pos)
+    for (id_comprador, data_venda), posicoes in grupos.items():
+        try:
+            novos = checkout.realizar_checkout(
+                id_comprador, [(vendas[p][2], vendas[p][1]) for p in posicoes], data_venda)
+        except (ValueError, psycopg2.Error) as e:
+            falhas.extend((p, _status_do_erro(e)[1]) for p in posicoes)
+            continue
+        # Um id por ingresso, em ordem crescente de id_ingresso (linhas do
+        # mesmo ingresso no grupo viram uma venda só, com a soma)
+        por_ingresso = dict(zip(sorted({vendas[p][2] for p in posicoes}), novos))
+        for p in posicoes:
+            ids[p] = por_ingresso[vendas[p][2]]
+    falhas.sort()
+    return {"ids": ids, "falhas": [{"posicao": p, "motivo": m} for p, m in falhas]}
+
+def _quantidade_do_item(item: Dict[str, Any]) -> int:
+    """Quantidade de um item do checkout: 1 se ausente, 400 se não for positiva."""
+    quantidade = _campo(item, "quantidade", _inteiro)
+    if quantidade is None:
+        return 1
+    if quantidade <= 0:
+        raise ErroHttp(400, "'quantidade' deve ser um número positivo.")
+    return quantidade
+
+@rota("POST", "/checkout", status=201)
+def _checkout(req):
+    c = req.corpo
+    itens = c.get("itens")
+    if not isinstance(itens, list) or not all(isinstance(i, dict) for i in itens):
+        raise ErroHttp(400, "'itens' deve ser uma lista de {id_ingresso, quantidade}.")
+    pares = [(_campo(i, "id_ingresso", _inteiro, True), _quantidade_do_item(i)) for i in itens]
+    ids = checkout.realizar_checkout(_campo(c, "id_comprador", _inteiro, True), pares,
+                                     _campo(c, "data", _data))
+    return {"vendas": ids}
+
+
+# --- Erros ---
+
+_ERROS_TEMPORARIOS = (PoolError, errors.LockNotAvailable, errors.SerializationFailure,
+                      errors.DeadlockDetected, psycopg2.OperationalError)
+
+def _status_do_erro(erro: Exception) -> Tuple[int, str]:
+    """Status HTTP e mensagem para uma exceção lançada pela camada de dados."""
+    if isinstance(erro, ErroHttp):
+        return erro.status, erro.mensagem
+    if isinstance(erro, checkout.IngressoIndisponivelError):
+        return 409, str(erro)
+    if isinstance(erro, ValueError):
+        return 400, str(erro)
+    if isinstance(erro, errors.QueryCanceled):
+        return 504, "O comando excedeu o tempo limite."
+    if isinstance(erro, psycopg2.DataError):
+        return 400, (erro.diag.message_primary or "Valor inválido.")
+    if isinstance(erro, psycopg2.IntegrityError):
+        return 409, (erro.diag.message_primary or "Violação de integridade.")
+    if isinstance(erro, _ERROS_TEMPORARIOS):
+        return 503, "Serviço temporariamente sobrecarregado; tente novamente."
+    log.exception("Erro não tratado")
+    return 500, "Erro interno."
+
+
+# --- HTTP ---
+
+class ManipuladorTikEvents(BaseHTTPRequestHandler):
+    """
+    Trata uma requisição (já em uma thread do pool de trabalhadores).
+    HTTP/1.0: uma requisição por conexão, para que um cliente com conexão
+    ociosa nunca prenda um trabalhador.
+    """
+
+    server_version = "TikEvents/1.0"
+    timeout = TIMEOUT_SOCKET
+
+    def do_GET(self):
+        self._despachar("GET")
+
+    def do_POST(self):
+        self._despachar("POST")
+
+    def do_PUT(self):
+        self._despachar("PUT")
+
+    def do_DELETE(self):
+        self._despachar("DELETE")
+
+    def _ler_corpo(self) -> Dict[str, Any]:
+        tamanho = _inteiro(self.headers.get("Content-Length") or 0, "Content-Length")
+        if tamanho > TAMANHO_MAX_CORPO:
+            raise ErroHttp(413, f"Corpo maior que {TAMANHO_MAX_CORPO} bytes.")
+        if tamanho <= 0:
+            return {}
+        try:
+            corpo = json.loads(self.rfile.read(tamanho))
+        except ValueError:
+            raise ErroHttp(400, "Corpo não é um JSON válido.")
+        if not isinstance(corpo, dict):
+            raise ErroHttp(400, "O corpo deve ser um objeto JSON.")
+        return corpo
+
+    def _despachar(self, metodo: str):
+        inicio = time.perf_counter()
+        caminho, _, consulta = self.path.partition("?")
+        modelo = "desconhecida"
+        try:
+            r, args = _encontrar_rota(metodo, caminho)
+            modelo = r.modelo
+            parametros = {k: v[-1] for k, v in parse_qs(consulta).items()}
+            resposta = r.funcao(Requisicao(parametros, self._ler_corpo()), *args)
+            status = r.status
+        except Exception as e:
+            status, mensagem = _status_do_erro(e)
+            resposta = {"erro": mensagem}
+        try:
+            self._responder(status, resposta)
+        finally:
+            metricas.http_requisicoes.inc(rota=f"{metodo} {modelo}", status=str(status))
+            metricas.http_duracao.observar(time.perf_counter() - inicio, rota=f"{metodo} {modelo}")
+
+    def _responder(self, status: int, resposta):
+        if isinstance(resposta, str):
+            corpo = resposta.encode("utf-8")
+            tipo = metricas.TIPO_CONTEUDO
+        else:
+            corpo = json.dumps(resposta, default=_json_padrao, ensure_ascii=False).encode("utf-8")
+            tipo = "application/json; charset=utf-8"
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        if status == 503:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        log.debug("%s " + formato, self.address_string(), *args)
+
+
+def _resposta_sobrecarga() -> bytes:
+    corpo = json.dumps({"erro": "Serviço sobrecarregado; tente novamente."},
+                       ensure_ascii=False).encode("utf-8")
+    return (b"HTTP/1.0 503 Service Unavailable\r\n"
+            b"Content-Type: application/json; charset=utf-8\r\n"
+            b"Retry-After: 1\r\n"
+            + f"Content-Length: {len(corpo)}\r\n\r\n".encode("ascii") + corpo)
+
+# Montada uma vez: com a fila cheia, recusar tem que custar o mínimo
+_RESPOSTA_SOBRECARGA = _resposta_sobrecarga()
+
+class ServidorTikEvents(HTTPServer):
+    """
+    Servidor HTTP com um pool fixo de 'trabalhadores' threads e uma fila de
+    no máximo 'fila_max' conexões aceitas. Com a fila cheia, ou se a
+    requisição esperou mais que ESPERA_FILA_MAX, a resposta é 503 na hora
+    (sem tocar no banco), em vez de acumular clientes esperando.
+
+    O socket usa SO_REUSEPORT (quando disponível): vários processos
+    'python servico.py' na mesma porta dividem as conexões entre si.
+    """
+
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def __init__(self, endereco: Tuple[str, int], trabalhadores: int = TRABALHADORES,
+                 fila_max: int = FILA_MAX, espera_fila_max: float = ESPERA_FILA_MAX):
+        if trabalhadores <= 0 or fila_max < 0:
+            raise ValueError("Trabalhadores deve ser positivo e a fila não pode ser negativa.")
+        super().__init__(endereco, ManipuladorTikEvents)
+        self.espera_fila_max = espera_fila_max
+        self._trabalhadores = ThreadPoolExecutor(trabalhadores, thread_name_prefix="servico")
+        self._vagas = threading.BoundedSemaphore(trabalhadores + fila_max)
+
+    def server_bind(self):
+        if hasattr(socket, "SO_REUSEPORT"):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def process_request(self, request, client_address):
+        if not self._vagas.acquire(blocking=False):
+            self._recusar(request, "fila_cheia")
+            return
+        try:
+            self._trabalhadores.submit(self._atender, request, client_address, time.monotonic())
+        except RuntimeError:  # servidor encerrando
+            self._vagas.release()
+            self.shutdown_request(request)
+
+    def _atender(self, request, client_address, aceita_em: float):
+        try:
+            if time.monotonic() - aceita_em > self.espera_fila_max:
+                self._recusar(request, "espera_fila")
+                return
+            self.finish_request(request, client_address)
+            self.shutdown_request(request)
+        except Exception:
+            self.handle_error(request, client_address)
+            self.shutdown_request(request)
+        finally:
+            self._vagas.release()
+
+    def _recusar(self, request, motivo: str):
+        metricas.http_recusadas.inc(motivo=motivo)
+        try:
+            request.settimeout(1.0)
+            request.sendall(_RESPOSTA_SOBRECARGA)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._trabalhadores.shutdown(wait=True)
+
+
+def _dsn_do_servico(timeout_comando_ms: int) -> str:
+    """DSN do pool com statement_timeout (0 desliga)."""
+    if timeout_comando_ms <= 0:
+        return db.DSN
+    return f"{db.DSN} options='-c statement_timeout={int(timeout_comando_ms)}'"
+
+def criar_servidor(porta: int = PORTA_SERVICO, endereco: str = "",
+                   trabalhadores: int = TRABALHADORES, fila_max: int = FILA_MAX,
+                   timeout_comando_ms: int = TIMEOUT_COMANDO_MS,
+                   conexoes_pagina: int = CONEXOES_PAGINA) -> ServidorTikEvents:
+    """
+    Recria o pool de conexões com 'trabalhadores' + 'conexoes_pagina'
+    conexões (e o statement_timeout), limita a essas conexões extras as
+    consultas paralelas da página de evento e retorna o servidor pronto
+    para serve_forever().
+    """
+    db.configurar_pool(minimo=min(db.POOL_MIN, trabalhadores),
+                       maximo=trabalhadores + conexoes_pagina,
+                       espera=ESPERA_CONEXAO, dsn=_dsn_do_servico(timeout_comando_ms))
+    pagina_evento.limitar_conexoes_extras(conexoes_pagina)
+    return ServidorTikEvents((endereco, porta), trabalhadores, fila_max)
+
+# Uso: python servico.py [porta]
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    servidor = criar_servidor(int(sys.argv[1]) if len(sys.argv) > 1 else PORTA_SERVICO)
+    cache.iniciar_escuta()
+    # SIGTERM encerra como Ctrl+C: termina as requisições em andamento e fecha o pool
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    log.info("Servindo em %s:%s", *servidor.server_address[:2])
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        cache.parar_escuta()
+        db.fechar_pool()
@@ -0,0 +1,36 @@
+-- =====================================================
+-- Migração de um banco TikEvents já existente
+-- =====================================================
+-- schema.sql cria o banco do zero (tabelas vazias). Em um banco criado
+-- antes das colunas e tabelas derivadas abaixo, rode este script uma vez,
+-- depois de criar as funções e os triggers novos de schema.sql.
+BEGIN;
+-- O resumo é reconstruído no fim; os UPDATEs abaixo não passam por ele
+ALTER TABLE Venda DISABLE TRIGGER trg_venda_resumo_upd;
+-- Venda.id_evento (cópia de Ingresso.id_evento)
+ALTER TABLE Venda ADD COLUMN IF NOT EXISTS id_evento INT;
+UPDATE Venda v SET id_evento = i.id_evento
+FROM Ingresso i
+WHERE i.id_ingresso = v.id_ingresso AND v.id_evento IS DISTINCT FROM i.id_evento;
+ALTER TABLE Venda ALTER COLUMN id_evento SET NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_venda_evento_data ON Venda(id_evento, data, id_venda);
+DROP INDEX IF EXISTS idx_venda_comprador;
+-- Venda.numerado (ingresso de assento marcado) e a unicidade da venda de
+-- assento; falha se o banco já tiver um assento vendido duas vezes
+ALTER TABLE Venda ADD COLUMN IF NOT EXISTS numerado BOOLEAN NOT NULL DEFAULT false;
+UPDATE Venda v SET numerado = true
+FROM Ingresso i
+WHERE i.id_ingresso = v.id_ingresso AND i.id_assento IS NOT NULL AND NOT v.numerado;
+ALTER TABLE Venda ADD CONSTRAINT ck_venda_numerado_quantidade CHECK (NOT numerado OR quantidade = 1);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_venda_ingresso_numerado ON Venda(id_ingresso) WHERE numerado;
+ALTER TABLE Venda ENABLE TRIGGER trg_venda_resumo_upd;
+-- Evento_Vendas_Resumo: a data da última venda saiu do resumo
+ALTER TABLE Evento_Vendas_Resumo DROP COLUMN IF EXISTS ultima_venda;
+DROP FUNCTION IF EXISTS resumo_vendas_ultima(INT[]);
+-- Evento_Vendas_Resumo.cota (capacidade repartida entre as fatias,
+-- preenchida por resumo_vendas_reconstruir abaixo)
+ALTER TABLE Evento_Vendas_Resumo ADD COLUMN IF NOT EXISTS cota BIGINT NOT NULL DEFAULT 0;
+COMMIT;
+-- Preenche o resumo com as vendas já existentes (também serve para
+-- reconciliar o resumo depois de uma carga feita sem os triggers)
+SELECT resumo_vendas_reconstruir();
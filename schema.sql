@@ -75,12 +75,381 @@ CREATE TABLE Venda (
  data DATE NOT NULL,
  quantidade INT NOT NULL CHECK (quantidade > 0),
  id_ingresso INT NOT NULL REFERENCES Ingresso(id_ingresso),
- id_comprador INT NOT NULL REFERENCES Comprador(id_comprador)
+ id_comprador INT NOT NULL REFERENCES Comprador(id_comprador),
+ id_evento INT NOT NULL, -- cópia de Ingresso.id_evento (trigger trg_venda_evento)
+ numerado BOOLEAN NOT NULL DEFAULT false, -- Ingresso.id_assento IS NOT NULL (idem)
+ CONSTRAINT ck_venda_numerado_quantidade CHECK (NOT numerado OR quantidade = 1)
 );
 -- Índices para otimização
 CREATE INDEX idx_evento_data ON Evento(data);
 CREATE INDEX idx_evento_local ON Evento(id_local);
 CREATE INDEX idx_ingresso_evento ON Ingresso(id_evento);
 CREATE INDEX idx_venda_data ON Venda(data);
-CREATE INDEX idx_venda_comprador ON Venda(id_comprador);
-CREATE INDEX idx_comprador_email ON Comprador(email);
\ No newline at end of file
+CREATE INDEX idx_comprador_email ON Comprador(email);
+-- Paginação por (data, id_venda) do histórico de vendas
+CREATE INDEX idx_venda_comprador_data ON Venda(id_comprador, data DESC, id_venda DESC);
+CREATE INDEX idx_venda_ingresso_data ON Venda(id_ingresso, data, id_venda);
+CREATE INDEX idx_venda_evento_data ON Venda(id_evento, data, id_venda);
+-- Listagem paginada de eventos por (data, horario, id_evento); sem horário = fim do dia
+CREATE INDEX idx_evento_data_horario ON Evento(data, COALESCE(horario, TIME '24:00'), id_evento);
+-- Checagem "assento já tem ingresso?" (layout_local.py, remoção de assentos)
+CREATE INDEX idx_ingresso_assento ON Ingresso(id_assento);
+-- Um ingresso de assento marcado é vendido no máximo uma vez, por qualquer
+-- caminho (checkout, crud_venda, lote): Venda.numerado + índice único parcial
+CREATE UNIQUE INDEX uq_venda_ingresso_numerado ON Venda(id_ingresso) WHERE numerado;
+-- Venda.id_evento e Venda.numerado vêm sempre do ingresso vendido, e um
+-- ingresso que já tem vendas não muda de evento: as vendas de um evento
+-- ficam em ordem (data, id_venda) no índice idx_venda_evento_data, sem
+-- juntar com Ingresso.
+CREATE OR REPLACE FUNCTION venda_evento() RETURNS trigger AS $$
+BEGIN
+ SELECT id_evento, id_assento IS NOT NULL INTO NEW.id_evento, NEW.numerado
+ FROM Ingresso WHERE id_ingresso = NEW.id_ingresso;
+ RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER trg_venda_evento BEFORE INSERT OR UPDATE OF id_ingresso, id_evento, numerado ON Venda
+ FOR EACH ROW EXECUTE FUNCTION venda_evento();
+-- Ingresso que ganha ou perde o assento: as vendas dele acompanham (um
+-- ingresso de pista com mais de uma venda não vira assento marcado)
+CREATE OR REPLACE FUNCTION ingresso_venda_numerado() RETURNS trigger AS $$
+BEGIN
+ UPDATE Venda SET numerado = NEW.id_assento IS NOT NULL
+ WHERE id_ingresso = NEW.id_ingresso;
+ RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER trg_ingresso_venda_numerado AFTER UPDATE OF id_assento ON Ingresso
+ FOR EACH ROW WHEN ((OLD.id_assento IS NULL) <> (NEW.id_assento IS NULL))
+ EXECUTE FUNCTION ingresso_venda_numerado();
+CREATE OR REPLACE FUNCTION ingresso_evento_fixo() RETURNS trigger AS $$
+BEGIN
+ IF EXISTS (SELECT 1 FROM Venda WHERE id_ingresso = OLD.id_ingresso) THEN
+  RAISE EXCEPTION 'Ingresso % já tem vendas e não pode mudar de evento.', OLD.id_ingresso
+   USING ERRCODE = 'restrict_violation';
+ END IF;
+ RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER trg_ingresso_evento_fixo BEFORE UPDATE OF id_evento ON Ingresso
+ FOR EACH ROW WHEN (OLD.id_evento IS DISTINCT FROM NEW.id_evento)
+ EXECUTE FUNCTION ingresso_evento_fixo();
+-- =====================================================
+-- Resumo de vendas por evento (mantido por triggers)
+-- =====================================================
+-- Cada evento tem até 8 linhas ("fatias"); cada sessão soma suas vendas
+-- na fatia pg_backend_pid() % 8, então vendas simultâneas do mesmo evento
+-- não disputam uma única linha. O total do evento é a soma das fatias
+-- (crud_venda.read_resumo_evento). Cada comando em Venda só altera a fatia
+-- da própria sessão; a data da última venda não fica no resumo, é lida de
+-- idx_venda_evento_data (MAX(data) do evento).
+--
+-- Capacidade: a capacidade do local é repartida entre as fatias do evento
+-- (cota; soma das cotas = capacidade). Uma venda só soma na fatia da sessão
+-- se couber na cota dela (UPDATE condicional, sem lock no Evento); senão,
+-- resumo_vendas_cotas trava as 8 fatias do evento, confere a capacidade
+-- livre do evento inteiro e reparte de novo o que sobra. Venda acima da
+-- capacidade -> check_violation (constraint 'evento_capacidade').
+CREATE TABLE Evento_Vendas_Resumo (
+ id_evento INT NOT NULL REFERENCES Evento(id_evento) ON DELETE CASCADE,
+ fatia SMALLINT NOT NULL CHECK (fatia BETWEEN 0 AND 7),
+ ingressos_vendidos BIGINT NOT NULL DEFAULT 0,
+ receita_bruta NUMERIC(14,2) NOT NULL DEFAULT 0,
+ cota BIGINT NOT NULL DEFAULT 0,
+ PRIMARY KEY (id_evento, fatia)
+);
+CREATE OR REPLACE FUNCTION resumo_vendas_fatia() RETURNS SMALLINT AS $$
+ SELECT (pg_backend_pid() % 8)::SMALLINT;
+$$ LANGUAGE sql STABLE;
+-- Trava as 8 fatias do evento (em ordem), soma a venda (q ingressos,
+-- 'receita') na fatia f se couber na capacidade livre do evento e reparte
+-- a capacidade que sobra entre as fatias. Sem venda (q = 0), só reparte
+-- (ex: mudança de capacidade do local).
+CREATE OR REPLACE FUNCTION resumo_vendas_cotas(ev INT, f SMALLINT DEFAULT 0,
+                                               q BIGINT DEFAULT 0,
+                                               receita NUMERIC DEFAULT 0) RETURNS void AS $$
+DECLARE
+ capacidade BIGINT;
+ vendidos BIGINT;
+ sobra BIGINT;
+BEGIN
+ INSERT INTO Evento_Vendas_Resumo (id_evento, fatia)
+ SELECT ev, s FROM generate_series(0, 7) s
+ ON CONFLICT DO NOTHING;
+ PERFORM 1 FROM Evento_Vendas_Resumo
+ WHERE id_evento = ev
+ ORDER BY fatia
+ FOR UPDATE;
+ SELECT l.capacidade INTO capacidade
+ FROM Evento e
+ JOIN Local l ON l.id_local = e.id_local
+ WHERE e.id_evento = ev;
+ SELECT SUM(ingressos_vendidos) INTO vendidos
+ FROM Evento_Vendas_Resumo WHERE id_evento = ev;
+ IF q > 0 AND vendidos + q > capacidade THEN
+  RAISE EXCEPTION 'Evento % esgotado: restam % lugar(es), pedido de %.',
+   ev, GREATEST(capacidade - vendidos, 0), q
+   USING ERRCODE = 'check_violation', CONSTRAINT = 'evento_capacidade';
+ END IF;
+ sobra := GREATEST(capacidade - vendidos - q, 0);
+ UPDATE Evento_Vendas_Resumo
+ SET ingressos_vendidos = ingressos_vendidos + CASE WHEN fatia = f THEN q ELSE 0 END,
+     receita_bruta = receita_bruta + CASE WHEN fatia = f THEN receita ELSE 0 END,
+     cota = ingressos_vendidos + CASE WHEN fatia = f THEN q ELSE 0 END
+            + sobra / 8 + CASE WHEN fatia < sobra % 8 THEN 1 ELSE 0 END
+ WHERE id_evento = ev;
+END;
+$$ LANGUAGE plpgsql;
+-- Aplica as vendas inseridas/alteradas/removidas por um comando inteiro
+-- (uma atualização por evento, mesmo em inserções em lote, sempre em
+-- ordem crescente de id_evento). Remoções só devolvem lugares à fatia da
+-- sessão; inclusões passam pela cota da fatia (veja acima).
+CREATE OR REPLACE FUNCTION resumo_vendas_aplicar() RETURNS trigger AS $$
+DECLARE
+ ev INT;
+ q BIGINT;
+ receita NUMERIC;
+BEGIN
+ IF TG_OP IN ('UPDATE', 'DELETE') THEN
+  INSERT INTO Evento_Vendas_Resumo AS r (id_evento, fatia, ingressos_vendidos, receita_bruta)
+  SELECT a.id_evento, resumo_vendas_fatia(), -SUM(a.quantidade), -SUM(a.quantidade * i.preco)
+  FROM antigas a
+  JOIN Ingresso i ON i.id_ingresso = a.id_ingresso
+  GROUP BY a.id_evento
+  ORDER BY a.id_evento
+  ON CONFLICT (id_evento, fatia) DO UPDATE
+  SET ingressos_vendidos = r.ingressos_vendidos + EXCLUDED.ingressos_vendidos,
+      receita_bruta = r.receita_bruta + EXCLUDED.receita_bruta;
+ END IF;
+ IF TG_OP IN ('INSERT', 'UPDATE') THEN
+  FOR ev, q, receita IN
+   SELECT n.id_evento, SUM(n.quantidade), SUM(n.quantidade * i.preco)
+   FROM novas n
+   JOIN Ingresso i ON i.id_ingresso = n.id_ingresso
+   GROUP BY n.id_evento
+   ORDER BY n.id_evento
+  LOOP
+   UPDATE Evento_Vendas_Resumo
+   SET ingressos_vendidos = ingressos_vendidos + q,
+       receita_bruta = receita_bruta + receita
+   WHERE id_evento = ev
+     AND fatia = resumo_vendas_fatia()
+     AND ingressos_vendidos + q <= cota;
+   IF NOT FOUND THEN
+    PERFORM resumo_vendas_cotas(ev, resumo_vendas_fatia(), q, receita);
+   END IF;
+  END LOOP;
+ END IF;
+ RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER trg_venda_resumo_ins AFTER INSERT ON Venda
+ REFERENCING NEW TABLE AS novas
+ FOR EACH STATEMENT EXECUTE FUNCTION resumo_vendas_aplicar();
+CREATE TRIGGER trg_venda_resumo_upd AFTER UPDATE OF id_ingresso, quantidade, id_evento ON Venda
+ REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+ FOR EACH STATEMENT EXECUTE FUNCTION resumo_vendas_aplicar();
+CREATE TRIGGER trg_venda_resumo_del AFTER DELETE ON Venda
+ REFERENCING OLD TABLE AS antigas
+ FOR EACH STATEMENT EXECUTE FUNCTION resumo_vendas_aplicar();
+-- Mudança de preço de um ingresso já vendido (um ingresso com vendas não
+-- muda de evento, veja trg_ingresso_evento_fixo)
+CREATE OR REPLACE FUNCTION resumo_vendas_ingresso() RETURNS trigger AS $$
+DECLARE
+ vendidos BIGINT;
+BEGIN
+ SELECT COALESCE(SUM(quantidade), 0) INTO vendidos
+ FROM Venda WHERE id_ingresso = NEW.id_ingresso;
+ IF vendidos > 0 THEN
+  INSERT INTO Evento_Vendas_Resumo AS r (id_evento, fatia, receita_bruta)
+  VALUES (NEW.id_evento, resumo_vendas_fatia(), vendidos * (NEW.preco - OLD.preco))
+  ON CONFLICT (id_evento, fatia) DO UPDATE
+  SET receita_bruta = r.receita_bruta + EXCLUDED.receita_bruta;
+ END IF;
+ RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER trg_ingresso_resumo AFTER UPDATE OF preco ON Ingresso
+ FOR EACH ROW WHEN (OLD.preco IS DISTINCT FROM NEW.preco)
+ EXECUTE FUNCTION resumo_vendas_ingresso();
+-- Mudança de capacidade do local (ou de local do evento): reparte de novo
+-- as cotas dos eventos afetados que já têm fatias
+CREATE OR REPLACE FUNCTION resumo_vendas_capacidade() RETURNS trigger AS $$
+DECLARE
+ ev INT;
+BEGIN
+ IF TG_TABLE_NAME = 'local' THEN
+  FOR ev IN
+   SELECT DISTINCT r.id_evento
+   FROM Evento_Vendas_Resumo r
+   JOIN Evento e ON e.id_evento = r.id_evento
+   WHERE e.id_local = NEW.id_local
+   ORDER BY r.id_evento
+  LOOP
+   PERFORM resumo_vendas_cotas(ev);
+  END LOOP;
+ ELSE
+  PERFORM resumo_vendas_cotas(NEW.id_evento);
+ END IF;
+ RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER trg_local_resumo_capacidade AFTER UPDATE OF capacidade ON Local
+ FOR EACH ROW WHEN (OLD.capacidade IS DISTINCT FROM NEW.capacidade)
+ EXECUTE FUNCTION resumo_vendas_capacidade();
+CREATE TRIGGER trg_evento_resumo_capacidade AFTER UPDATE OF id_local ON Evento
+ FOR EACH ROW WHEN (OLD.id_local IS DISTINCT FROM NEW.id_local)
+ EXECUTE FUNCTION resumo_vendas_capacidade();
+-- Reconstrói o resumo a partir das vendas (reconciliação): as vendas de
+-- cada evento ficam na fatia 0 e a capacidade livre é repartida de novo
+CREATE OR REPLACE FUNCTION resumo_vendas_reconstruir() RETURNS INT AS $$
+DECLARE
+ eventos INT;
+ ev INT;
+BEGIN
+ LOCK TABLE Evento_Vendas_Resumo IN EXCLUSIVE MODE;
+ DELETE FROM Evento_Vendas_Resumo;
+ INSERT INTO Evento_Vendas_Resumo (id_evento, fatia, ingressos_vendidos, receita_bruta)
+ SELECT v.id_evento, 0, SUM(v.quantidade), SUM(v.quantidade * i.preco)
+ FROM Venda v
+ JOIN Ingresso i ON i.id_ingresso = v.id_ingresso
+ GROUP BY v.id_evento;
+ GET DIAGNOSTICS eventos = ROW_COUNT;
+ FOR ev IN SELECT id_evento FROM Evento_Vendas_Resumo ORDER BY id_evento LOOP
+  PERFORM resumo_vendas_cotas(ev);
+ END LOOP;
+ RETURN eventos;
+END;
+$$ LANGUAGE plpgsql;
+-- =====================================================
+-- Invalidação do cache de dados de referência (cache.py)
+-- =====================================================
+-- Avisa no canal 'tikevents_cache' a tabela e a chave da linha alterada.
+-- O NOTIFY só é entregue aos ouvintes após o COMMIT, e avisos iguais na
+-- mesma transação são entregues uma única vez.
+CREATE OR REPLACE FUNCTION cache_notificar() RETURNS trigger AS $$
+DECLARE
+ linha JSONB;
+BEGIN
+ IF TG_OP = 'DELETE' THEN
+  linha := to_jsonb(OLD);
+ ELSE
+  linha := to_jsonb(NEW);
+ END IF;
+ PERFORM pg_notify('tikevents_cache',
+                   json_build_object('tabela', TG_TABLE_NAME,
+                                     'chave', linha -> TG_ARGV[0])::text);
+ -- Mudança de chave (ex.: setor movido de local): avisa a chave antiga também
+ IF TG_OP = 'UPDATE' AND to_jsonb(OLD) -> TG_ARGV[0] IS DISTINCT FROM linha -> TG_ARGV[0] THEN
+  PERFORM pg_notify('tikevents_cache',
+                    json_build_object('tabela', TG_TABLE_NAME,
+                                      'chave', to_jsonb(OLD) -> TG_ARGV[0])::text);
+ END IF;
+ RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER trg_local_cache AFTER INSERT OR UPDATE OR DELETE ON Local
+ FOR EACH ROW EXECUTE FUNCTION cache_notificar('id_local');
+-- Setores são lidos por local, então a chave avisada é o id_local
+CREATE TRIGGER trg_setor_cache AFTER INSERT OR UPDATE OR DELETE ON Setor
+ FOR EACH ROW EXECUTE FUNCTION cache_notificar('id_local');
+CREATE TRIGGER trg_artista_cache AFTER INSERT OR UPDATE OR DELETE ON Artista
+ FOR EACH ROW EXECUTE FUNCTION cache_notificar('id_artista');
+CREATE TRIGGER trg_evento_cache AFTER INSERT OR UPDATE OR DELETE ON Evento
+ FOR EACH ROW EXECUTE FUNCTION cache_notificar('id_evento');
+CREATE TRIGGER trg_evento_artista_cache AFTER INSERT OR UPDATE OR DELETE ON Evento_Artista
+ FOR EACH ROW EXECUTE FUNCTION cache_notificar('id_evento');
+-- =====================================================
+-- Busca textual de eventos (mantida por triggers)
+-- =====================================================
+-- Documento de busca: nome do evento (peso A), artistas (B), nome do
+-- local (C) e descrição (D), na configuração 'portuguese'.
+ALTER TABLE Evento ADD COLUMN busca TSVECTOR;
+CREATE OR REPLACE FUNCTION evento_busca_documento(p_id_evento INT, p_nome TEXT,
+                                                  p_descricao TEXT, p_id_local INT)
+RETURNS TSVECTOR AS $$
+ SELECT setweight(to_tsvector('portuguese', COALESCE(p_nome, '')), 'A')
+     || setweight(to_tsvector('portuguese', COALESCE(
+            (SELECT string_agg(a.nome, ' ')
+             FROM Evento_Artista ea
+             JOIN Artista a ON a.id_artista = ea.id_artista
+             WHERE ea.id_evento = p_id_evento), '')), 'B')
+     || setweight(to_tsvector('portuguese', COALESCE(
+            (SELECT l.nome FROM Local l WHERE l.id_local = p_id_local), '')), 'C')
+     || setweight(to_tsvector('portuguese', COALESCE(p_descricao, '')), 'D');
+$$ LANGUAGE sql STABLE;
+-- Recalcula o documento dos eventos informados
+CREATE OR REPLACE FUNCTION evento_busca_recalcular(p_eventos INT[]) RETURNS VOID AS $$
+ UPDATE Evento e
+ SET busca = evento_busca_documento(e.id_evento, e.nome, e.descricao, e.id_local)
+ WHERE e.id_evento = ANY(p_eventos);
+$$ LANGUAGE sql;
+-- Evento: calcula o documento na própria linha (antes de gravar)
+CREATE OR REPLACE FUNCTION evento_busca_evento() RETURNS trigger AS $$
+BEGIN
+ NEW.busca := evento_busca_documento(NEW.id_evento, NEW.nome, NEW.descricao, NEW.id_local);
+ RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER trg_evento_busca BEFORE INSERT OR UPDATE OF nome, descricao, id_local ON Evento
+ FOR EACH ROW EXECUTE FUNCTION evento_busca_evento();
+-- Lineup alterado: recalcula uma vez cada evento afetado pelo comando
+-- inteiro (tabelas de transição), mesmo quando o comando altera vários artistas
+CREATE OR REPLACE FUNCTION evento_busca_lineup() RETURNS trigger AS $$
+BEGIN
+ IF TG_OP = 'INSERT' THEN
+  PERFORM evento_busca_recalcular(ARRAY(SELECT DISTINCT id_evento FROM novas));
+ ELSIF TG_OP = 'DELETE' THEN
+  PERFORM evento_busca_recalcular(ARRAY(SELECT DISTINCT id_evento FROM antigas));
+ ELSE
+  PERFORM evento_busca_recalcular(ARRAY(SELECT id_evento FROM novas
+                                        UNION
+                                        SELECT id_evento FROM antigas));
+ END IF;
+ RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER trg_evento_artista_busca_ins AFTER INSERT ON Evento_Artista
+ REFERENCING NEW TABLE AS novas
+ FOR EACH STATEMENT EXECUTE FUNCTION evento_busca_lineup();
+CREATE TRIGGER trg_evento_artista_busca_upd AFTER UPDATE ON Evento_Artista
+ REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+ FOR EACH STATEMENT EXECUTE FUNCTION evento_busca_lineup();
+CREATE TRIGGER trg_evento_artista_busca_del AFTER DELETE ON Evento_Artista
+ REFERENCING OLD TABLE AS antigas
+ FOR EACH STATEMENT EXECUTE FUNCTION evento_busca_lineup();
+-- Artista ou Local renomeado: recalcula os eventos em que aparecem
+CREATE OR REPLACE FUNCTION evento_busca_artista() RETURNS trigger AS $$
+BEGIN
+ PERFORM evento_busca_recalcular(ARRAY(
+  SELECT ea.id_evento FROM Evento_Artista ea WHERE ea.id_artista = NEW.id_artista));
+ RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER trg_artista_busca AFTER UPDATE OF nome ON Artista
+ FOR EACH ROW WHEN (OLD.nome IS DISTINCT FROM NEW.nome)
+ EXECUTE FUNCTION evento_busca_artista();
+CREATE OR REPLACE FUNCTION evento_busca_local() RETURNS trigger AS $$
+BEGIN
+ PERFORM evento_busca_recalcular(ARRAY(
+  SELECT e.id_evento FROM Evento e WHERE e.id_local = NEW.id_local));
+ RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER trg_local_busca AFTER UPDATE OF nome ON Local
+ FOR EACH ROW WHEN (OLD.nome IS DISTINCT FROM NEW.nome)
+ EXECUTE FUNCTION evento_busca_local();
+-- Preenche os eventos já existentes e cria os índices
+UPDATE Evento SET busca = evento_busca_documento(id_evento, nome, descricao, id_local);
+CREATE INDEX idx_evento_busca ON Evento USING GIN (busca);
+CREATE INDEX idx_evento_artista_artista ON Evento_Artista(id_artista);
+-- =====================================================
+-- Busca aproximada (trigramas) de artistas e compradores
+-- =====================================================
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX idx_artista_nome_trgm ON Artista USING GIN (nome gin_trgm_ops);
+CREATE INDEX idx_comprador_nome_trgm ON Comprador USING GIN (nome gin_trgm_ops);
+CREATE INDEX idx_comprador_email_trgm ON Comprador USING GIN (email gin_trgm_ops);
+-- Email único sem diferenciar maiúsculas/minúsculas: busca exata e
+-- chave do upsert da importação (ON CONFLICT (lower(email)))
+CREATE UNIQUE INDEX idx_comprador_email_lower ON Comprador (lower(email));